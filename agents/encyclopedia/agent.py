@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import argparse
 import hashlib
@@ -15,6 +16,12 @@ try:
 except Exception:  # pragma: no cover
 	OpenAI = None  # type: ignore
 
+# Pages are written through the shared atomic writer in scripts/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+from atomic_write import write_text  # noqa: E402
+# Page slugs come from the same function the build scripts match pages with
+from image_manifest import slugify  # noqa: E402
+
 INDEX_FILE = ".index/theory_index.json"
 
 
@@ -106,10 +113,6 @@ def retrieve(cfg: Dict[str, Any], query: str, k: int) -> List[Dict[str, Any]]:
 	return [{"text": index["chunks"][i], "score": float(sim[i])} for i in order]
 
 
-def slugify(title: str) -> str:
-	return title.lower().replace(" ", "-").replace("/", "-")
-
-
 # Stable anchors for encyclopedia categories (used by breadcrumbs)
 CATEGORY_ANCHORS: Dict[str, str] = {
 	"Recognition Physics Fundamentals": "fundamentals",
@@ -148,6 +151,18 @@ def load_rs_facts() -> Dict[str, Any]:
 	return {}
 
 
+def load_hero_svgs() -> Dict[str, str]:
+	"""slug -> content-hashed hero SVG URL written by scripts/generate_hero_svgs.py."""
+	try:
+		p = Path(__file__).resolve().parents[2] / "assets" / "data" / "encyclopedia-heroes.json"
+		if p.exists():
+			with open(p, "r", encoding="utf-8") as f:
+				return json.load(f)
+	except Exception:
+		pass
+	return {}
+
+
 def load_policy_for(category: str) -> Dict[str, Any]:
 	try:
 		p = Path(__file__).parent / "policies" / "cosmology.json"
@@ -271,8 +286,9 @@ def sanitize_and_wrap(html_body: str, task: Dict[str, Any]) -> str:
 			None,
 		)
 		if hero_image is not None:
-			# Default src falls back to slug.svg under assets
-			default_src = f"/assets/images/encyclopedia/{slugify(title)}.svg"
+			# Default src is the generated hero SVG, else slug.svg under assets
+			slug = slugify(title)
+			default_src = load_hero_svgs().get(slug) or f"/assets/images/encyclopedia/{slug}.svg"
 			src = hero_image.get("src") or default_src
 			alt = hero_image.get("alt") or title
 			caption = hero_image.get("caption", "")
@@ -422,8 +438,7 @@ def write_page(out_dir: Path, slug: str, html_body: str) -> None:
 </body>
 </html>
 """
-	with open(path, "w", encoding="utf-8") as f:
-		f.write(page)
+	write_text(path, page)
 
 
 def main():
@@ -157,9 +157,28 @@ document.addEventListener("DOMContentLoaded", function() {
         }
     }
 
+    function onIncludeReady(placeholderId) {
+        if (placeholderId === 'header-placeholder') {
+            setupHeaderEventListeners();
+            // Inject sitewide banner only after header is present to avoid race conditions
+            const base = getBasePath();
+            const bannerTarget = document.getElementById('sitewide-banner-placeholder');
+            // Inlined with the header at build time: nothing to fetch
+            if (bannerTarget && !bannerTarget.hasAttribute('data-include-hash')) {
+                fetchAndInject(base + '_includes/banner.html', 'sitewide-banner-placeholder');
+            }
+        }
+    }
+
     function fetchAndInject(url, placeholderId) {
         const placeholder = document.getElementById(placeholderId);
         if (placeholder) {
+            // Already inlined at build time (scripts/expand_includes.py): no fetch needed
+            if (placeholder.hasAttribute('data-include-hash')) {
+                // Only the header needs wiring (its event listeners); nothing is fetched
+                if (placeholderId === 'header-placeholder') setupHeaderEventListeners();
+                return;
+            }
             // Bust caches aggressively to avoid stale includes
             const cacheBustedUrl = `${url}${url.includes('?') ? '&' : '?'}v=${Date.now()}`;
             fetch(cacheBustedUrl, { cache: 'no-store' })
@@ -173,15 +192,7 @@ document.addEventListener("DOMContentLoaded", function() {
                     placeholder.innerHTML = data;
                     // Ensure any scripts inside the included HTML execute
                     executeScripts(placeholder);
-                    if (placeholderId === 'header-placeholder') {
-                        setupHeaderEventListeners();
-                        // Inject sitewide banner only after header is present to avoid race conditions
-                        const base = getBasePath();
-                        const bannerTarget = document.getElementById('sitewide-banner-placeholder');
-                        if (bannerTarget) {
-                            fetchAndInject(base + '_includes/banner.html', 'sitewide-banner-placeholder');
-                        }
-                    }
+                    onIncludeReady(placeholderId);
                 })
                 .catch(error => {
                     console.error(`Error fetching ${url}:`, error);
@@ -222,8 +233,12 @@ document.addEventListener("DOMContentLoaded", function() {
     // Footer can be injected immediately
     fetchAndInject(basePath + '_includes/footer.html', 'footer-placeholder');
     
+    // Pages whose math was rendered to SVG at build time (scripts/prerender_math.py)
+    // need neither MathJax nor the typeset polling below
+    const needsMathJax = !document.documentElement.hasAttribute('data-math-prerendered');
+
     // MathJax loader (guarded). Use both $...$ and \(...\) like RH paper; include $$ and \[\] for display.
-    if (!document.getElementById('MathJax-script')) {
+    if (needsMathJax && !document.getElementById('MathJax-script')) {
         window.MathJax = {
             tex: {
                 inlineMath: [['$', '$'], ['\\(', '\\)']],
@@ -265,7 +280,8 @@ document.addEventListener("DOMContentLoaded", function() {
         } catch(_) {}
     }
 
-    // Robust typeset trigger akin to RH page
+    // Robust typeset trigger akin to RH page; gives up after ~15s if MathJax never loads
+    let typesetAttempts = 0;
     function typesetWhenReady(){
         try {
             wrapMathNotesWithDelimiters();
@@ -280,8 +296,8 @@ document.addEventListener("DOMContentLoaded", function() {
                 });
                 return;
             }
-            setTimeout(typesetWhenReady, 250);
+            if (++typesetAttempts < 60) setTimeout(typesetWhenReady, 250);
         } catch(_) {}
     }
-    typesetWhenReady();
+    if (needsMathJax) typesetWhenReady();
 });
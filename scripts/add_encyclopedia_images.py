@@ -1,10 +1,28 @@
 #!/usr/bin/env python3
+import argparse
+import difflib
 import json
+import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, List, Tuple
 
+from atomic_write import sync_dirs, write_text
+from image_manifest import ImageManifest, normalize_images
 
-def build_img_tag(src: str, alt: str, fallback1: str = "", fallback2: str = "") -> str:
+
+# Figures sit in the ~800px reading column and shrink to the viewport on mobile
+IMG_SIZES = "(max-width: 800px) 100vw, 800px"
+
+
+def build_srcset(variants: list, mime: str) -> str:
+    return ", ".join(f"{v['src']} {v['width']}w" for v in variants if v.get("type") == mime)
+
+
+def build_img_tag(src: str, alt: str, fallback1: str = "", fallback2: str = "",
+                  width: int = 0, height: int = 0, srcset: str = "") -> str:
     onerror = ""
     if fallback1 or fallback2:
         if fallback1 and fallback2:
@@ -15,10 +33,40 @@ def build_img_tag(src: str, alt: str, fallback1: str = "", fallback2: str = "")
         elif fallback1:
             onerror = "this.onerror=null;this.src='" + fallback1 + "';"
     onerr_attr = (" onerror=\"" + onerror + "\"") if onerror else ""
+    size_attr = f' width="{width}" height="{height}"' if width and height else ""
+    srcset_attr = f' srcset="{srcset}" sizes="{IMG_SIZES}"' if srcset else ""
     return (
-        '<img src="' + src + '" alt="' + alt + '" loading="lazy" decoding="async"' + onerr_attr + ' />'
+        '<img src="' + src + '"' + srcset_attr + ' alt="' + alt + '"' + size_attr
+        + ' loading="lazy" decoding="async"' + onerr_attr + ' />'
     )
 
+
+def source_mime(src: str) -> str:
+    ext = src.rsplit(".", 1)[-1].lower()
+    return "image/jpeg" if ext in ("jpg", "jpeg") else f"image/{ext}"
+
+
+def wrap_picture(imeta: dict, img_tag: str) -> str:
+    """Wrap the <img> in <picture> with a WebP source when optimized variants exist."""
+    webp_srcset = build_srcset(imeta.get("variants") or [], "image/webp")
+    if not webp_srcset:
+        return img_tag
+    return (
+        '<picture>'
+        f'<source type="image/webp" srcset="{webp_srcset}" sizes="{IMG_SIZES}" />'
+        + img_tag +
+        '</picture>'
+    )
+
+
+def build_picture(imeta: dict, src: str, alt: str, fallback1: str = "", fallback2: str = "") -> str:
+    img_tag = build_img_tag(
+        src, alt, fallback1, fallback2,
+        width=imeta.get("width", 0), height=imeta.get("height", 0),
+        srcset=build_srcset(imeta.get("variants") or [], source_mime(src)),
+    )
+    return wrap_picture(imeta, img_tag)
+
 FIGURE_TEMPLATE = (
     '<figure class="concept-visual">'
     '{img_tag}'
@@ -36,101 +84,208 @@ def build_caption(caption: str, credit: str, license_str: str) -> str:
     return f"<figcaption>{' • '.join(parts)}</figcaption>"
 
 
-def insert_hero_figure(html: str, figure_html: str) -> str:
-    # Skip if a concept-visual figure already exists
-    if 'figure class="concept-visual"' in html:
-        return html
-    sentinel = '<div class="template-reading">'
-    idx = html.find(sentinel)
-    if idx == -1:
-        return html  # unexpected shape; don't modify
-    return html[:idx] + figure_html + html[idx:]
-
-
-def insert_after_heading(html: str, heading_text: str, figure_html: str) -> str:
-    import re
-    # Insert figure immediately after the first matching <h2>Heading</h2>
-    pattern = re.compile(rf"(<h2[^>]*>\s*{re.escape(heading_text)}\s*</h2>)", re.IGNORECASE)
-    m = pattern.search(html)
-    if not m:
+HERO_SENTINEL = '<div class="template-reading">'
+FIGURE_MARKER = '<figure class="concept-visual"'
+DEFAULT_HEADING = "How It Works"
+
+# One pass finds the hero sentinel and every <h2> with its (trimmed) text
+ANCHOR_RE = re.compile(
+    re.escape(HERO_SENTINEL) + r"|<h2[^>]*>\s*(.*?)\s*</h2>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def scan_anchors(html: str) -> Tuple[int, Dict[str, int]]:
+    """Return the hero sentinel offset (-1 if absent) and heading text -> end offset."""
+    hero_at = -1
+    headings: Dict[str, int] = {}
+    for m in ANCHOR_RE.finditer(html):
+        if m.group(1) is None:
+            if hero_at == -1:
+                hero_at = m.start()
+        else:
+            # First matching heading wins, as before
+            headings.setdefault(m.group(1).lower(), m.end())
+    return hero_at, headings
+
+
+@lru_cache(maxsize=1)
+def hero_svgs() -> Dict[str, str]:
+    # slug -> hashed hero SVG written by generate_hero_svgs.py
+    path = Path(__file__).resolve().parents[1] / "assets" / "data" / "encyclopedia-heroes.json"
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_figure(slug: str, imeta: dict) -> str:
+    src = imeta.get("src") or hero_svgs().get(slug) or f"/assets/images/encyclopedia/{slug}.svg"
+    alt = imeta.get("alt") or slug.replace("-", " ").title()
+    cap_html = build_caption(imeta.get("caption", ""), imeta.get("credit", ""), imeta.get("license", ""))
+    img_tag = build_picture(imeta, src, alt, imeta.get("fallback_src", ""), imeta.get("fallback2_src", ""))
+    return FIGURE_TEMPLATE.format(img_tag=img_tag, cap_html=cap_html)
+
+
+def plan_insertions(html: str, slug: str, images: list) -> List[Tuple[int, str]]:
+    """Resolve every placement for a page against a single anchor scan."""
+    hero_at, headings = scan_anchors(html)
+    has_figure = FIGURE_MARKER in html
+    taken = set()
+    insertions = []
+    for imeta in images:
+        placement = (imeta.get("placement") or "after_heading").lower()
+        if placement == "hero":
+            # Skip if a concept-visual figure already exists or the page has an unexpected shape
+            if has_figure or hero_at == -1:
+                continue
+            pos = hero_at
+        else:
+            heading = imeta.get("heading") if placement == "after_heading" else None
+            pos = headings.get((heading or DEFAULT_HEADING).lower(), -1)
+            if pos == -1:
+                continue
+            # Skip if there's already a figure immediately after this heading
+            if FIGURE_MARKER in html[pos:pos + 100]:
+                continue
+        if pos in taken:
+            continue
+        taken.add(pos)
+        insertions.append((pos, build_figure(slug, imeta)))
+        # The page now has a figure: a later hero is skipped, as when each insertion was applied in turn
+        has_figure = True
+    return insertions
+
+
+# An existing manifest image: a bare <img> or the <picture> build_picture() made
+IMAGE_RE = re.compile(r"<picture>(?:(?!</picture>).)*?</picture>|<img\b[^>]*>", re.IGNORECASE | re.DOTALL)
+IMG_TAG_RE = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+SRC_ATTR_RE = re.compile(r'<img\b[^>]*?\ssrc="([^"]*)"', re.IGNORECASE)
+# Attributes upgrade_images() owns; everything else on the tag is kept
+SIZING_ATTR_RE = re.compile(r'\s(?:srcset|sizes|width|height)="[^"]*"', re.IGNORECASE)
+
+
+def upgrade_img_tag(img_tag: str, imeta: dict) -> str:
+    """Set srcset/sizes/width/height on an existing <img>, keeping its other attributes."""
+    img_tag = SIZING_ATTR_RE.sub("", img_tag)
+    srcset = build_srcset(imeta.get("variants") or [], source_mime(imeta["src"]))
+    attrs = f' srcset="{srcset}" sizes="{IMG_SIZES}"' if srcset else ""
+    if imeta.get("width") and imeta.get("height"):
+        attrs += f' width="{imeta["width"]}" height="{imeta["height"]}"'
+    at = SRC_ATTR_RE.match(img_tag).end()
+    return img_tag[:at] + attrs + img_tag[at:]
+
+
+def upgrade_images(html: str, images: list) -> str:
+    """Rewrite images already on the page into <picture>/srcset with intrinsic dimensions.
+
+    Figures placed before the optimize stage recorded variants (or by an
+    older version of this script) are left out by plan_insertions, which
+    never touches an existing figure; this brings every <img> whose src is
+    one of the page's manifest images up to date. Only srcset, sizes,
+    width and height are set on the page's own tag, so its alt, class,
+    style, loading and data-* attributes survive. Images with no variants
+    or dimensions recorded are left alone.
+    """
+    by_src = {imeta["src"]: imeta for imeta in images
+              if imeta.get("src") and (imeta.get("variants") or (imeta.get("width") and imeta.get("height")))}
+    if not by_src:
         return html
-    insert_at = m.end()
-    # Check if there's already a figure immediately after this heading
-    check_portion = html[insert_at:insert_at + 100]
-    if '<figure class="concept-visual"' in check_portion:
-        return html  # Skip, already has a figure
-    return html[:insert_at] + figure_html + html[insert_at:]
+
+    def replace(m: re.Match) -> str:
+        img = IMG_TAG_RE.search(m.group(0))
+        src = SRC_ATTR_RE.match(img.group(0)) if img else None
+        imeta = by_src.get(src.group(1)) if src else None
+        if imeta is None:
+            return m.group(0)
+        return wrap_picture(imeta, upgrade_img_tag(img.group(0), imeta))
+
+    return IMAGE_RE.sub(replace, html)
+
+
+def splice(html: str, insertions: List[Tuple[int, str]]) -> str:
+    parts = []
+    last = 0
+    for pos, fragment in sorted(insertions, key=lambda item: item[0]):
+        parts.append(html[last:pos])
+        parts.append(fragment)
+        last = pos
+    parts.append(html[last:])
+    return "".join(parts)
+
+
+def inject_page(job: Tuple[str, str, list, bool]) -> Tuple[str, str, str]:
+    """Worker: read one page, apply all of its placements, write (or diff) once."""
+    slug, page_path, images, dry_run = job
+    path = Path(page_path)
+    if not path.exists():
+        return slug, "missing", ""
+    try:
+        html = path.read_text(encoding="utf-8")
+        new_html = upgrade_images(splice(html, plan_insertions(html, slug, images)), images)
+        if new_html == html:
+            return slug, "unchanged", ""
+        if dry_run:
+            diff = difflib.unified_diff(
+                html.splitlines(keepends=True),
+                new_html.splitlines(keepends=True),
+                fromfile=f"a/encyclopedia/{slug}.html",
+                tofile=f"b/encyclopedia/{slug}.html",
+            )
+            return slug, "updated", "".join(diff)
+        write_text(path, new_html, sync_dir=False)
+        return slug, "updated", ""
+    except Exception as e:
+        return slug, "error", str(e)
 
 
 def main():
-    if len(sys.argv) > 1:
-        manifest_path = Path(sys.argv[1])
-    else:
-        manifest_path = Path("assets/data/encyclopedia-images.json")
+    ap = argparse.ArgumentParser(description="Inject manifest figures into encyclopedia pages")
+    ap.add_argument("manifest", nargs="?", default="", help="legacy JSON manifest (default: indexed store)")
+    ap.add_argument("--dry-run", action="store_true", help="print a unified diff instead of writing")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
     root = Path(__file__).resolve().parents[1]
     enc_dir = root / "encyclopedia"
 
-    if not manifest_path.exists():
-        print(f"Manifest not found: {manifest_path}")
-        sys.exit(1)
+    if args.manifest:
+        manifest_path = Path(args.manifest)
+        if not manifest_path.exists():
+            print(f"Manifest not found: {manifest_path}")
+            sys.exit(1)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            entries = [(slug, normalize_images(meta)) for slug, meta in json.load(f).items()]
+    else:
+        entries = list(ImageManifest.load().items())
 
-    with open(manifest_path, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
+    jobs = [
+        (slug, str(enc_dir / f"{slug}.html"), images, args.dry_run)
+        for slug, images in entries
+    ]
 
     updated = 0
-    for slug, meta in manifest.items():
-        page_path = enc_dir / f"{slug}.html"
-        if not page_path.exists():
-            print(f"Skip missing page: {slug}")
-            continue
-        try:
-            html = page_path.read_text(encoding="utf-8")
-
-            # Support two formats: single image object, or {"images": [...]}
-            images = []
-            if isinstance(meta, dict) and "images" in meta and isinstance(meta["images"], list):
-                images = meta["images"]
-            else:
-                images = [meta]
-
-            changed = False
-            for imeta in images:
-                src = imeta.get("src") or f"/assets/images/encyclopedia/{slug}.svg"
-                alt = imeta.get("alt") or slug.replace("-", " ").title()
-                caption = imeta.get("caption", "")
-                credit = imeta.get("credit", "")
-                license_str = imeta.get("license", "")
-                cap_html = build_caption(caption, credit, license_str)
-                fallback1 = imeta.get("fallback_src", "")
-                fallback2 = imeta.get("fallback2_src", "")
-                img_tag = build_img_tag(src, alt, fallback1, fallback2)
-                figure_html = FIGURE_TEMPLATE.format(img_tag=img_tag, cap_html=cap_html)
-                placement = (imeta.get("placement") or "after_heading").lower()
-                if placement == "hero":
-                    new_html = insert_hero_figure(html, figure_html)
-                elif placement == "after_heading":
-                    heading = imeta.get("heading") or "How It Works"
-                    new_html = insert_after_heading(html, heading, figure_html)
-                else:
-                    # default to after_heading How It Works
-                    new_html = insert_after_heading(html, "How It Works", figure_html)
-                if new_html != html:
-                    html = new_html
-                    changed = True
-
-            if changed:
-                page_path.write_text(html, encoding="utf-8")
+    with ProcessPoolExecutor(max_workers=args.workers or None) as pool:
+        # map() keeps results in manifest order for readable output
+        for slug, status, detail in pool.map(inject_page, jobs, chunksize=16):
+            if status == "missing":
+                print(f"Skip missing page: {slug}")
+            elif status == "error":
+                print(f"Error updating {slug}: {detail}")
+            elif status == "updated":
                 updated += 1
-                print(f"Updated: {slug}")
+                if args.dry_run:
+                    sys.stdout.write(detail)
+                else:
+                    print(f"Updated: {slug}")
             else:
                 print(f"No changes for: {slug}")
-        except Exception as e:
-            print(f"Error updating {slug}: {e}")
 
-    print(f"Done. Pages updated: {updated}")
+    if updated and not args.dry_run:
+        sync_dirs([enc_dir])
+    verb = "would be updated" if args.dry_run else "updated"
+    print(f"Done. Pages {verb}: {updated}")
 
 
 if __name__ == "__main__":
     main()
-
-
@@ -2,82 +2,93 @@
 """
 SAFER version of template application script
 This version is more careful about preserving content
+
+All class updates are made in one regex pass per file, and files are
+processed in parallel (see file_transform.py). Each file that actually
+changes is backed up just before it is written, into the deduplicated
+backup store (see backup_store.py).
 """
 
+import argparse
 import os
 import re
+import sys
 from pathlib import Path
-import shutil
-from datetime import datetime
 
-# Create backup directory
-BACKUP_DIR = f"backups/template-rollout-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+from backup_store import backup_file, new_run_id, rel_path, write_run
+from file_transform import SkipFile, run_transform
+
+# Old stylesheet links are dropped with their whole line
+OLD_CSS_RE = re.compile(
+    r'^[^\n]*<link[^>\n]+href="[^"\n]*(?:academic-style\.css|encyclopedia\.css)[^"\n]*"[^>\n]*>[^\n]*(?:\n|$)',
+    re.MULTILINE,
+)
+TEMPLATE_CSS_LINK = '  <link rel="stylesheet" href="/assets/css/site-template.css">\n'
+
+# Add template- prefix to avoid conflicts
+SECTION_UPDATES = {
+    # Hero sections
+    'hero': 'template-hero template-hero-framed',
+    'cosmic-hero': 'template-hero template-hero-framed',
+    # Content sections
+    'content-section': 'template-section',
+    'page-section': 'template-section',
+}
+CLASS_UPDATES = {
+    # Hero content
+    'hero-content': 'template-hero-content',
+    'hero-title': 'template-hero-title',
+    'hero-lead': 'template-hero-lead',
+    # Containers
+    'wrapper': 'template-container',
+    'content-wrapper': 'template-container',
+    'container': 'template-container',
+    # Titles
+    'section-title': 'template-section-title',
+    'page-title': 'template-section-title',
+    # Content blocks
+    'content-block': 'template-reading',
+    'reading': 'template-reading',
+}
+# Body class: <body> and <body class="academic-page"> both become template-page
+BODY_UPDATE = '<body class="template-page">'
 
-def create_backup(file_path):
-    """Create a backup of the file before modifying"""
-    backup_path = Path(BACKUP_DIR) / file_path.relative_to('.')
-    backup_path.parent.mkdir(parents=True, exist_ok=True)
-    shutil.copy2(file_path, backup_path)
-    return backup_path
+# All class updates in one pass; no replacement is matched by another pattern,
+# so this gives the same result as applying them one after another
+CLASS_RE = re.compile(
+    r'<section\s+class="(' + '|'.join(map(re.escape, SECTION_UPDATES)) + r')">'
+    r'|class="(' + '|'.join(map(re.escape, CLASS_UPDATES)) + r')"'
+    r'|<body(?: class="academic-page")?>'
+)
 
-def update_css_links_safely(content, filename):
+def replace_class(m):
+    if m.group(1):
+        return f'<section class="{SECTION_UPDATES[m.group(1)]}">'
+    if m.group(2):
+        return f'class="{CLASS_UPDATES[m.group(2)]}"'
+    return BODY_UPDATE
+
+def update_css_links_safely(content):
     """Safely update CSS links without breaking content"""
-    lines = content.split('\n')
-    new_lines = []
-    template_css_added = False
-    
-    for line in lines:
-        # Keep main.css but remove other old CSS files
-        if re.search(r'<link[^>]+href="[^"]*(?:academic-style\.css|encyclopedia\.css)[^"]*"[^>]*>', line):
-            continue
-        
-        # Add template CSS after main.css and before </head>
-        if '</head>' in line and not template_css_added and 'site-template.css' not in content:
-            new_lines.append('  <link rel="stylesheet" href="/assets/css/site-template.css">')
-            template_css_added = True
-        
-        new_lines.append(line)
-    
-    return '\n'.join(new_lines)
-
-def apply_class_updates(content):
-    """Apply class updates more safely"""
-    # Add template- prefix to avoid conflicts
-    updates = [
-        # Hero sections
-        (r'<section\s+class="hero">', '<section class="template-hero template-hero-framed">'),
-        (r'<section\s+class="cosmic-hero">', '<section class="template-hero template-hero-framed">'),
-        (r'class="hero-content"', 'class="template-hero-content"'),
-        (r'class="hero-title"', 'class="template-hero-title"'),
-        (r'class="hero-lead"', 'class="template-hero-lead"'),
-        
-        # Content sections
-        (r'<section\s+class="content-section">', '<section class="template-section">'),
-        (r'<section\s+class="page-section">', '<section class="template-section">'),
-        
-        # Containers
-        (r'class="wrapper"', 'class="template-container"'),
-        (r'class="content-wrapper"', 'class="template-container"'),
-        (r'class="container"', 'class="template-container"'),
-        
-        # Titles
-        (r'class="section-title"', 'class="template-section-title"'),
-        (r'class="page-title"', 'class="template-section-title"'),
-        
-        # Content blocks
-        (r'class="content-block"', 'class="template-reading"'),
-        (r'class="reading"', 'class="template-reading"'),
-        
-        # Body class
-        (r'<body class="academic-page">', '<body class="template-page">'),
-        (r'<body>', '<body class="template-page">'),
-    ]
-    
-    for old, new in updates:
-        content = re.sub(old, new, content)
-    
+    add_template_css = 'site-template.css' not in content
+
+    # Keep main.css but remove other old CSS files
+    if 'academic-style.css' in content or 'encyclopedia.css' in content:
+        content = OLD_CSS_RE.sub('', content)
+
+    # Add template CSS on its own line before </head>
+    if add_template_css:
+        head_at = content.find('</head>')
+        if head_at != -1:
+            line_start = content.rfind('\n', 0, head_at) + 1
+            content = content[:line_start] + TEMPLATE_CSS_LINK + content[line_start:]
+
     return content
 
+def apply_template(content):
+    """Apply the CSS link updates, then every class update in one pass"""
+    return CLASS_RE.sub(replace_class, update_css_links_safely(content))
+
 def should_skip_file(file_path):
     """Skip certain files that shouldn't be modified"""
     skip_patterns = [
@@ -89,54 +100,52 @@ def should_skip_file(file_path):
     
     return any(pattern in str(file_path) for pattern in skip_patterns)
 
-def process_file_safely(file_path):
-    """Process a file with safety checks"""
+def process_file_safely(file_path, original_content):
+    """Transform one file with safety checks (runs in a worker process)"""
     if should_skip_file(file_path):
-        print(f"⏭️  Skipped (template file): {file_path}")
-        return False
-    
-    try:
-        # Read original content
-        with open(file_path, 'r', encoding='utf-8') as f:
-            original_content = f.read()
-        
-        # Verify we have actual content
-        if len(original_content) < 100 or '<body' not in original_content:
-            print(f"⚠️  Skipped (too small or no body): {file_path}")
-            return False
-        
-        # Create backup
-        backup_path = create_backup(file_path)
-        
-        # Apply changes
-        content = original_content
-        content = update_css_links_safely(content, file_path.name)
-        content = apply_class_updates(content)
-        
-        # Safety check: ensure content wasn't truncated
-        if len(content) < len(original_content) * 0.9:  # Lost more than 10%
-            print(f"❌ ERROR: Content would be truncated! Skipping {file_path}")
-            return False
-        
-        # Write changes
-        if content != original_content:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            print(f"✅ Updated: {file_path}")
-            return True
-        else:
-            print(f"  No changes: {file_path}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Error processing {file_path}: {e}")
-        return False
+        raise SkipFile("⏭️  Skipped (template file)")
+
+    # Verify we have actual content
+    if len(original_content) < 100 or '<body' not in original_content:
+        raise SkipFile("⚠️  Skipped (too small or no body)")
+
+    # Apply changes
+    content = apply_template(original_content)
+
+    # Safety check: ensure content wasn't truncated
+    if len(content) < len(original_content) * 0.9:  # Lost more than 10%
+        raise ValueError("Content would be truncated!")
+
+    return content
+
+# path -> blob sha1 of the pre-run content, for the backup run manifest
+backed_up = {}
+
+def report(file_path, status, detail):
+    if status == "updated":
+        backed_up[rel_path(file_path)] = detail
+        print(f"✅ Updated: {file_path}")
+    elif status == "unchanged":
+        print(f"  No changes: {file_path}")
+    elif status == "skipped":
+        print(f"{detail}: {file_path}")
+    else:
+        print(f"❌ Error processing {file_path}: {detail}")
 
 def main():
     """Main function"""
-    # Create backup directory
-    Path(BACKUP_DIR).mkdir(parents=True, exist_ok=True)
-    print(f"📁 Created backup directory: {BACKUP_DIR}\n")
+    ap = argparse.ArgumentParser(description="Apply the site template classes and CSS to all pages")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
+    # Backups are indexed by repo-relative path, so every page must be inside the repo
+    try:
+        rel_path(Path.cwd())
+    except ValueError:
+        print("Run from the repository root (or a directory inside it)")
+        sys.exit(1)
+
+    run_id = new_run_id("template-rollout")
     
     # Find HTML files
     html_files = []
@@ -150,11 +159,17 @@ def main():
     
     print(f"Found {len(html_files)} HTML files\n")
     
-    # Process files
-    updated_count = 0
-    for file_path in sorted(html_files):
-        if process_file_safely(file_path):
-            updated_count += 1
+    # Process files in parallel; changed files are backed up right before writing
+    counts = run_transform(
+        sorted(html_files),
+        process_file_safely,
+        report=report,
+        before_write=backup_file,
+        workers=args.workers,
+    )
+    updated_count = counts["updated"]
+    if backed_up:
+        write_run(run_id, backed_up)
     
     # Summary
     print(f"\n{'='*60}")
@@ -162,9 +177,12 @@ def main():
     print(f"  Total files: {len(html_files)}")
     print(f"  Updated: {updated_count}")
     print(f"  Skipped/No changes: {len(html_files) - updated_count}")
-    print(f"\nBackups saved to: {BACKUP_DIR}")
-    print(f"\nTo restore a file:")
-    print(f"  cp {BACKUP_DIR}/path/to/file.html path/to/file.html")
+    if backed_up:
+        print(f"\nBackup run: {run_id} ({len(backed_up)} files)")
+        print("\nTo restore:")
+        print(f"  python3 scripts/backup_store.py restore {run_id} [path/to/file.html ...]")
+    else:
+        print("\nNo files changed; no backup run recorded")
 
 if __name__ == "__main__":
     main()
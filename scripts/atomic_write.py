@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Atomic, fsync-safe file writes shared by every script that rewrites pages.
+
+write_text()/write_bytes() write to a temp file in the destination's
+directory, fsync it and rename it over the destination, so an interrupted
+run leaves either the old page or the new one, never a truncated one. If
+the destination already holds exactly these bytes nothing is written and
+the mtime is left alone (the incremental build in build_site.py relies on
+that).
+
+The rename is made durable by fsyncing the directory. Bulk rewrites pass
+sync_dir=False and call sync_dirs() once at the end, so each directory is
+synced once per run instead of once per file. Worker processes can do the
+same and leave the directory sync to the parent.
+"""
+import os
+import stat
+import tempfile
+from pathlib import Path
+from typing import Iterable, Union
+
+PathLike = Union[str, Path]
+
+# mkstemp creates 0600 files; new files get the usual umask-derived mode
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+def write_bytes(path: PathLike, data: bytes, sync_dir: bool = True) -> bool:
+    """Atomically replace path with data; returns False if it already matched."""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+    else:
+        if st.st_size == len(data) and path.read_bytes() == data:
+            return False
+        mode = stat.S_IMODE(st.st_mode)
+
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    if sync_dir:
+        sync_dirs([path.parent])
+    return True
+
+
+def write_text(path: PathLike, text: str, encoding: str = "utf-8", sync_dir: bool = True) -> bool:
+    """Text counterpart of write_bytes()."""
+    return write_bytes(path, text.encode(encoding), sync_dir=sync_dir)
+
+
+def sync_dirs(dirs: Iterable[PathLike]) -> None:
+    """fsync each distinct directory once so completed renames survive a crash."""
+    for d in sorted({str(d) for d in dirs}):
+        try:
+            fd = os.open(d, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.fsync(fd)
+        except OSError:
+            # Not supported for directories on every platform/filesystem
+            pass
+        finally:
+            os.close(fd)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Content-addressed backup store for scripts that rewrite pages in place.
+
+Layout under backups/:
+
+  objects/ab/cdef...        file bytes, named by their sha1 (one blob per distinct content)
+  runs/<run-id>.json        {"run": id, "created": iso time, "files": {path: sha1}}
+
+A blob is written only the first time its bytes are seen, so backing up the
+same unchanged page on every run costs nothing. Callers back up a file just
+before overwriting it (see the before_write hook in file_transform.py) and
+record the run manifest once at the end.
+
+CLI (from repo root):
+  python3 scripts/backup_store.py list
+  python3 scripts/backup_store.py show RUN
+  python3 scripts/backup_store.py restore RUN [PATH ...] [--dry-run]
+  python3 scripts/backup_store.py prune [--keep N] [--max-age-days D]
+  python3 scripts/backup_store.py import-legacy [--delete]   # ingest backups/template-rollout-*/
+"""
+import argparse
+import hashlib
+import json
+import shutil
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from atomic_write import sync_dirs, write_bytes, write_text
+
+ROOT = Path(__file__).resolve().parents[1]
+BACKUP_ROOT = ROOT / "backups"
+OBJECTS_DIR = BACKUP_ROOT / "objects"
+RUNS_DIR = BACKUP_ROOT / "runs"
+LEGACY_GLOB = "template-rollout-*"
+RUN_TIME_FORMAT = "%Y%m%d-%H%M%S"
+# Run ids carry microseconds, so rollouts started in the same second differ
+RUN_ID_FORMAT = RUN_TIME_FORMAT + "-%f"
+
+# Retention: runs beyond the newest DEFAULT_KEEP are dropped by prune
+DEFAULT_KEEP = 10
+
+
+def blob_path(digest: str) -> Path:
+    return OBJECTS_DIR / digest[:2] / digest[2:]
+
+
+def put_bytes(data: bytes) -> str:
+    """Store bytes once; returns their sha1. Safe to call from parallel workers."""
+    digest = hashlib.sha1(data).hexdigest()
+    path = blob_path(digest)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_bytes(path, data)
+    return digest
+
+
+def backup_file(path: Path) -> str:
+    """Back up a file's current bytes; returns the blob sha1."""
+    return put_bytes(Path(path).read_bytes())
+
+
+def rel_path(path: Path) -> str:
+    """Repo-relative posix path; raises ValueError for paths outside the repo."""
+    resolved = Path(path).resolve()
+    try:
+        return resolved.relative_to(ROOT).as_posix()
+    except ValueError:
+        raise ValueError(f"{path} is outside the repository ({ROOT})") from None
+
+
+def new_run_id(label: str) -> str:
+    return f"{label}-{datetime.now().strftime(RUN_ID_FORMAT)}"
+
+
+def write_run(run_id: str, files: Dict[str, str], created: Optional[datetime] = None,
+              overwrite: bool = False) -> Path:
+    """Record a run's index; an existing run is never replaced unless overwrite is set."""
+    RUNS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RUNS_DIR / f"{run_id}.json"
+    if path.exists() and not overwrite:
+        raise FileExistsError(f"Backup run already exists: {run_id}")
+    run = {
+        "run": run_id,
+        "created": (created or datetime.now()).isoformat(timespec="seconds"),
+        "files": dict(sorted(files.items())),
+    }
+    write_text(path, json.dumps(run, indent=2))
+    return path
+
+
+def load_run(run_id: str) -> dict:
+    path = RUNS_DIR / f"{run_id}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"No such backup run: {run_id}")
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_runs() -> List[dict]:
+    """All runs, oldest first."""
+    runs = []
+    for path in RUNS_DIR.glob("*.json"):
+        with path.open("r", encoding="utf-8") as f:
+            runs.append(json.load(f))
+    return sorted(runs, key=lambda r: (r["created"], r["run"]))
+
+
+def restore(run_id: str, paths: Optional[List[str]] = None, dry_run: bool = False) -> Tuple[int, int]:
+    """Put files back as they were before the run; returns (restored, already current)."""
+    files = load_run(run_id)["files"]
+    if paths:
+        wanted = {rel_path(p) for p in paths}
+        missing = wanted - set(files)
+        if missing:
+            raise KeyError(f"Not in run {run_id}: {', '.join(sorted(missing))}")
+        files = {rel: h for rel, h in files.items() if rel in wanted}
+    restored = current = 0
+    restored_dirs = set()
+    for rel, digest in files.items():
+        dest = ROOT / rel
+        data = blob_path(digest).read_bytes()
+        if dest.exists() and dest.stat().st_size == len(data) and dest.read_bytes() == data:
+            current += 1
+            continue
+        restored += 1
+        print(f"restore: {rel}")
+        if dry_run:
+            continue
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        write_bytes(dest, data, sync_dir=False)
+        restored_dirs.add(dest.parent)
+    sync_dirs(restored_dirs)
+    return restored, current
+
+
+def prune(keep: int = DEFAULT_KEEP, max_age_days: Optional[int] = None) -> Tuple[int, int]:
+    """Drop runs beyond the newest `keep` (and older than max_age_days, if given;
+    the newest run is always kept), then delete blobs no remaining run uses.
+    Returns (runs removed, blobs removed)."""
+    runs = list_runs()
+    drop = {r["run"] for r in runs[:-max(keep, 1)]}
+    if max_age_days is not None:
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat(timespec="seconds")
+        drop.update(r["run"] for r in runs[:-1] if r["created"] < cutoff)
+    for run_id in drop:
+        (RUNS_DIR / f"{run_id}.json").unlink()
+
+    live = {h for run in runs if run["run"] not in drop for h in run["files"].values()}
+    blobs = 0
+    for path in OBJECTS_DIR.glob("*/*"):
+        if path.parent.name + path.name not in live:
+            path.unlink()
+            blobs += 1
+    return len(drop), blobs
+
+
+def import_legacy(delete: bool = False) -> List[Tuple[str, int, int]]:
+    """Turn backups/template-rollout-*/ copies into runs; returns (run, files, new blobs)."""
+    imported = []
+    for legacy in sorted(BACKUP_ROOT.glob(LEGACY_GLOB)):
+        if not legacy.is_dir():
+            continue
+        files = {}
+        new_blobs = 0
+        for path in sorted(p for p in legacy.rglob("*") if p.is_file()):
+            data = path.read_bytes()
+            new_blobs += not blob_path(hashlib.sha1(data).hexdigest()).exists()
+            files[path.relative_to(legacy).as_posix()] = put_bytes(data)
+        try:
+            created = datetime.strptime(legacy.name.split("-", 2)[-1], RUN_TIME_FORMAT)
+        except ValueError:
+            created = datetime.fromtimestamp(legacy.stat().st_mtime)
+        # Importing the same directory again records the same run
+        write_run(legacy.name, files, created, overwrite=True)
+        if delete:
+            shutil.rmtree(legacy)
+        imported.append((legacy.name, len(files), new_blobs))
+    return imported
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Content-addressed page backups")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="list backup runs")
+    sub.add_parser("show", help="list the files in a run").add_argument("run")
+    p = sub.add_parser("restore", help="restore files from a run")
+    p.add_argument("run")
+    p.add_argument("paths", nargs="*", help="only these files (default: all files in the run)")
+    p.add_argument("--dry-run", action="store_true", help="list files that would be restored")
+    p = sub.add_parser("prune", help="apply the retention policy and delete unused blobs")
+    p.add_argument("--keep", type=int, default=DEFAULT_KEEP, help=f"newest runs to keep (default: {DEFAULT_KEEP})")
+    p.add_argument("--max-age-days", type=int, default=None, help="also drop runs older than this")
+    p = sub.add_parser("import-legacy", help=f"ingest backups/{LEGACY_GLOB} directories")
+    p.add_argument("--delete", action="store_true", help="remove each directory once imported")
+    args = ap.parse_args()
+
+    if args.cmd == "list":
+        for run in list_runs():
+            print(f"{run['run']}  {run['created']}  {len(run['files'])} files")
+    elif args.cmd == "show":
+        for rel, digest in load_run(args.run)["files"].items():
+            print(f"{digest[:12]}  {rel}")
+    elif args.cmd == "restore":
+        try:
+            restored, current = restore(args.run, args.paths, dry_run=args.dry_run)
+        except (FileNotFoundError, KeyError, ValueError) as e:
+            print(e.args[0])
+            return 1
+        verb = "would be restored" if args.dry_run else "restored"
+        print(f"Done. {restored} files {verb}, {current} already current")
+    elif args.cmd == "prune":
+        runs, blobs = prune(args.keep, args.max_age_days)
+        print(f"Done. Removed {runs} runs and {blobs} unused blobs")
+    elif args.cmd == "import-legacy":
+        for run_id, count, new_blobs in import_legacy(args.delete):
+            print(f"Imported {run_id}: {count} files, {new_blobs} new blobs")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Incremental site build over a persistent dependency graph.
+
+Every page is a node that is rebuilt in place by the site-wide page
+transforms, in order:
+
+  normalize - shared placeholders and main.js loader (normalize_header.py)
+  includes  - inline the _includes/ fragments (expand_includes.py)
+  images    - insert manifest figures, encyclopedia pages only
+              (add_encyclopedia_images.py)
+  assets    - point CSS/JS references at fingerprinted URLs
+              (fingerprint_assets.py; uses the last asset manifest written)
+  css       - swap a page family's stylesheet links for inlined critical CSS
+              plus the deferred bundle (bundle_css.py)
+  math      - replace encyclopedia TeX with cached SVG and drop client
+              MathJax (prerender_math.py); expressions new to the cache
+              are rendered in one batch before the pages are built
+
+Each node records the content hash of the page as last built and a key
+over its inputs: the _includes fragments, the asset manifest, the CSS
+bundles, the page's image manifest entries, its hero SVG, its task JSON
+entry and, for encyclopedia pages, the math cache (so rendering new
+expressions rebuilds those pages once). A node is rebuilt only when its own
+bytes or one of its inputs changed; pages whose mtime/size still
+match the graph are not even read, so a no-op build is a tree walk plus a
+stat per page. Dirty nodes are rebuilt in a process pool. The graph lives
+in .build/site-graph.json.
+
+Remote fetching, dedupe and optimization of images stay in
+image_pipeline.py; this build picks up whatever the manifest says.
+
+Run from repo root:
+  python3 scripts/build_site.py              # rebuild dirty pages
+  python3 scripts/build_site.py --dry-run    # list dirty pages and why
+  python3 scripts/build_site.py --force      # rebuild everything
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import add_encyclopedia_images as injector
+from atomic_write import sync_dirs, write_text
+from bundle_css import apply_bundle, build_bundles
+from expand_includes import expand, load_fragments
+from fingerprint_assets import load_manifest, page_dir_url, rewrite
+from image_manifest import TASKS_GLOB, ImageManifest, task_slug
+from normalize_header import normalize_text, should_skip
+from prerender_math import CACHE_FILE as MATH_CACHE_FILE, find_math, load_cache, math_key, prerender, render_batch
+
+ROOT = Path(__file__).resolve().parents[1]
+ENC_DIR = ROOT / "encyclopedia"
+GRAPH_FILE = ROOT / ".build" / "site-graph.json"
+
+# Bump when a transform changes so every node is rebuilt once
+BUILD_VERSION = 4
+
+# Directories never holding pages (see should_skip); pruned during the walk
+SKIP_DIRS = {".git", ".build", "node_modules", "_includes", "tools", "scripts", "assets", "backups"}
+
+
+def digest(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def stat_key(path: Path) -> List[int]:
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def find_pages() -> List[Path]:
+    pages = []
+    for root, dirs, files in os.walk(ROOT):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            if name.endswith(".html"):
+                path = Path(root) / name
+                if not should_skip(path):
+                    pages.append(path)
+    return pages
+
+
+def load_tasks() -> Dict[str, dict]:
+    tasks: Dict[str, dict] = {}
+    for path in sorted(glob.glob(str(ROOT / TASKS_GLOB))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            continue
+        for task in data if isinstance(data, list) else []:
+            if isinstance(task, dict) and task.get("title"):
+                tasks.setdefault(task_slug(task), task)
+    return tasks
+
+
+# Math cache as loaded by this worker process (see math_cache)
+_MATH: Optional[dict] = None
+
+
+def math_cache() -> dict:
+    """The math cache, read once per worker; the build renders into it before the pool starts."""
+    global _MATH
+    if _MATH is None:
+        _MATH = load_cache()
+    return _MATH
+
+
+def build_page(job: Tuple[str, Dict[str, Tuple[str, str]], Dict[str, str], Dict[str, Dict[str, str]], Optional[list], bool]
+               ) -> Tuple[str, str, List[int], str]:
+    """Worker: run every transform over one page and write it once.
+
+    Returns (path, 'updated'|'unchanged'|'error: ...', stat key, content hash).
+    """
+    path_str, fragments, assets, bundles, images, math = job
+    path = Path(path_str)
+    try:
+        html = path.read_text(encoding="utf-8", errors="ignore")
+        new_html = expand(normalize_text(html), fragments)
+        if images:
+            new_html = injector.splice(new_html, injector.plan_insertions(new_html, path.stem, images))
+            new_html = injector.upgrade_images(new_html, images)
+        new_html = rewrite(new_html, page_dir_url(path), assets)
+        new_html = apply_bundle(new_html, path, bundles)
+        if math:
+            cache = math_cache()
+            new_html = prerender(new_html, cache["items"], cache["styles"])
+        status = "unchanged"
+        if new_html != html:
+            write_text(path, new_html, sync_dir=False)
+            status = "updated"
+        return path_str, status, stat_key(path), file_digest(path)
+    except Exception as e:
+        return path_str, f"error: {e}", [], ""
+
+
+class SiteGraph:
+    def __init__(self, force: bool = False):
+        self.force = force
+        graph = {}
+        if GRAPH_FILE.exists():
+            with GRAPH_FILE.open("r", encoding="utf-8") as f:
+                graph = json.load(f)
+        if graph.get("version") != BUILD_VERSION:
+            graph = {}
+        self.nodes: Dict[str, dict] = graph.get("nodes", {})
+        self.changed = not graph
+
+        self.fragments = load_fragments()
+        self.assets = load_manifest()
+        self.bundles = build_bundles()
+        self.store = ImageManifest.load()
+        self.tasks = load_tasks()
+        self.heroes = injector.hero_svgs()
+        self.math_key = file_digest(MATH_CACHE_FILE) if MATH_CACHE_FILE.exists() else ""
+        # Inputs every page shares
+        self.shared_key = digest({pid: h for pid, (_text, h) in self.fragments.items()}, self.assets, self.bundles)
+
+    def images(self, path: Path) -> Optional[list]:
+        if path.parent != ENC_DIR or path.stem not in self.store:
+            return None
+        return self.store.images(path.stem)
+
+    def deps_key(self, path: Path) -> str:
+        if path.parent != ENC_DIR:
+            return self.shared_key
+        slug = path.stem
+        return digest(self.shared_key, self.images(path), self.heroes.get(slug), self.tasks.get(slug), self.math_key)
+
+    def dirty_reason(self, rel: str, path: Path, deps: str) -> Optional[str]:
+        if self.force:
+            return "forced"
+        node = self.nodes.get(rel)
+        if node is None:
+            return "new"
+        if node["deps"] != deps:
+            return "inputs"
+        stat = stat_key(path)
+        if node["stat"] == stat:
+            return None
+        # Touched (checkout, copy) but possibly identical: confirm by hash
+        if node["hash"] != file_digest(path):
+            return "source"
+        node["stat"] = stat
+        self.changed = True
+        return None
+
+    def plan(self) -> List[Tuple[str, Path, str, str]]:
+        """Return (rel, path, deps key, reason) for every dirty node."""
+        pages = find_pages()
+        live = set()
+        dirty = []
+        for path in pages:
+            rel = path.relative_to(ROOT).as_posix()
+            live.add(rel)
+            deps = self.deps_key(path)
+            reason = self.dirty_reason(rel, path, deps)
+            if reason:
+                dirty.append((rel, path, deps, reason))
+        for rel in set(self.nodes) - live:
+            del self.nodes[rel]
+            self.changed = True
+        self.total = len(pages)
+        return dirty
+
+    def render_math(self, dirty: List[Tuple[str, Path, str, str]]) -> bool:
+        """Render math on dirty encyclopedia pages that the cache lacks; True if the cache grew."""
+        cache = load_cache()
+        missing: Dict[str, Tuple[bool, str]] = {}
+        for _rel, path, _deps, _reason in dirty:
+            if path.parent != ENC_DIR:
+                continue
+            for display, tex in find_math(path.read_text(encoding="utf-8", errors="ignore")):
+                key = math_key(display, tex)
+                if key not in cache["items"]:
+                    missing[key] = (display, tex)
+        if not missing:
+            return False
+        print(f"math: rendering {len(missing)} new expressions")
+        result = render_batch(list(missing.values()))
+        if result is None:
+            return False
+        cache["styles"], markup = result
+        cache["items"].update(zip(missing, markup))
+        MATH_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        write_text(MATH_CACHE_FILE, json.dumps(cache, separators=(",", ":"), sort_keys=True))
+        self.math_key = file_digest(MATH_CACHE_FILE)
+        return True
+
+    def build(self, dirty: List[Tuple[str, Path, str, str]], workers: int = 0) -> int:
+        deps_by_path = {str(path): (rel, deps) for rel, path, deps, _reason in dirty}
+        jobs = [(str(path), self.fragments, self.assets, self.bundles, self.images(path), path.parent == ENC_DIR)
+                for _rel, path, _deps, _reason in dirty]
+        updated = 0
+        updated_dirs = set()
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            for path_str, status, stat, content_hash in pool.map(build_page, jobs, chunksize=16):
+                rel, deps = deps_by_path[path_str]
+                if status.startswith("error"):
+                    print(f"{status}: {rel}")
+                    self.nodes.pop(rel, None)
+                    continue
+                if status == "updated":
+                    updated += 1
+                    updated_dirs.add(Path(path_str).parent)
+                    print(f"updated: {rel}")
+                self.nodes[rel] = {"stat": stat, "hash": content_hash, "deps": deps}
+        sync_dirs(updated_dirs)
+        self.changed = self.changed or bool(jobs)
+        return updated
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        GRAPH_FILE.parent.mkdir(parents=True, exist_ok=True)
+        write_text(GRAPH_FILE, json.dumps({"version": BUILD_VERSION, "nodes": self.nodes},
+                                          separators=(",", ":"), sort_keys=True))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Incremental page build over a dependency graph")
+    ap.add_argument("--dry-run", action="store_true", help="list dirty pages and why, write nothing")
+    ap.add_argument("--force", action="store_true", help="rebuild every page")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    graph = SiteGraph(force=args.force)
+    dirty = graph.plan()
+
+    if args.dry_run:
+        for rel, _path, _deps, reason in dirty:
+            print(f"{reason}: {rel}")
+        print(f"Dry run: {len(dirty)} of {graph.total} pages dirty")
+        return 0
+
+    # New expressions change the math cache, and with it every encyclopedia page's inputs
+    if graph.render_math(dirty):
+        dirty = graph.plan()
+    updated = graph.build(dirty, workers=args.workers) if dirty else 0
+    graph.save()
+    elapsed = time.perf_counter() - start
+    print(f"Done. {graph.total} pages, {len(dirty)} rebuilt, {updated} updated in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Bundle, minify and split the stylesheets of a page family into critical + deferred CSS.
+
+Encyclopedia pages link four render-blocking stylesheets (main.css,
+site-template.css, encyclopedia.css, /style.css). For each family in
+FAMILIES this script:
+
+  - concatenates the family's stylesheets in link order (hoisting @import /
+    @charset to the top, where CSS requires them) and minifies the result
+    into /assets/bundles/<family>.<hash>.css
+  - extracts the critical subset: rules whose selectors only involve the
+    above-the-fold template (site header and banner, breadcrumbs, hero,
+    reading column, first figure) and base typography, minus interaction
+    states such as :hover and ::before/::after decorations, with only the
+    custom properties those rules use; it should fit the ~14KB first round
+    trip (a warning is printed if it does not)
+  - replaces the family's <link> tags on every matching page with the
+    critical CSS inlined in a <style> block plus an async preload of the full
+    bundle (with a <noscript> fallback)
+
+Only pages whose stylesheet links are exactly the family's list are
+rewritten, so one-off pages keep their own CSS. The replaced block is
+delimited by <!-- css-bundle:NAME --> ... <!-- /css-bundle --> and refreshed
+in place on later runs. build_site.py applies the same transform.
+
+Run from repo root:
+  python3 scripts/bundle_css.py [--workers N] [--prune]
+"""
+import argparse
+import hashlib
+import re
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from atomic_write import sync_dirs, write_bytes
+from file_transform import run_transform
+from fingerprint_assets import logical_url, page_dir_url
+
+ROOT = Path(__file__).resolve().parents[1]
+BUNDLE_DIR = ROOT / "assets" / "bundles"
+BUNDLE_URL = "/assets/bundles"
+HASH_LEN = 10
+
+# family -> (page directory, stylesheets in link order)
+FAMILIES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "encyclopedia": ("encyclopedia", (
+        "/assets/css/main.css",
+        "/assets/css/site-template.css",
+        "/assets/css/encyclopedia.css",
+        "/style.css",
+    )),
+}
+
+# Classes and ids rendered above the fold by the encyclopedia template,
+# including the inlined header/banner (_includes/) and the hidden states of
+# its menus, so nothing flashes before the full bundle arrives.
+CRITICAL_CLASSES = {
+    # header + banner
+    "site-header", "header-container", "container", "logo", "global-nav", "mobile-menu-toggle",
+    "dropdown", "dropbtn", "dropdown-content", "verified-badge-container", "verified-badge-below",
+    "audit-banner", "audit-title", "audit-phase", "audit-link", "audit-sep",
+    # page frame, breadcrumbs and hero
+    "template-page", "template-section", "encyclopedia-entry", "template-container",
+    "enc-breadcrumbs", "encyclopedia-hero", "template-hero-badge", "template-accent-text",
+    "lead-text", "meta-badges", "category-badge", "difficulty-badge",
+    # reading column and first figure
+    "template-reading", "concept-visual", "figure-credit", "figure-license",
+}
+CRITICAL_IDS = {"header-placeholder", "sitewide-banner-placeholder", "globalNav"}
+# Elements the above-the-fold template renders: base typography, the header
+# nav and the hero. Tables, code, canvases, details, math notes and the footer
+# sit further down and are left to the deferred bundle.
+CRITICAL_ELEMENTS = {
+    "*", "html", "body", "header", "nav", "main", "section", "article", "div", "span",
+    "h1", "p", "a", "strong", "b", "em", "i", "ul", "li",
+    "button", "img", "picture", "figure", "figcaption",
+}
+# Hidden until opened: only the rule that hides them is critical, not their contents
+HIDDEN_CLASSES = {"dropdown-content"}
+# Browsers only get a fast first render from CSS that fits the first round trip
+CRITICAL_MAX_BYTES = 14 * 1024
+# Not needed for first paint: interaction states and ::before/::after decorations
+DEFERRED_PSEUDO_RE = re.compile(r":(?:hover|focus|focus-within|focus-visible|active|visited|target|:?before|:?after)\b")
+
+CLASS_RE = re.compile(r"\.(-?[_a-zA-Z][-_a-zA-Z0-9]*)")
+ID_RE = re.compile(r"#(-?[_a-zA-Z][-_a-zA-Z0-9]*)")
+# Type selector: at the start of a compound, not after ".", "#", ":" or "-"
+ELEMENT_RE = re.compile(r"(?:^|(?<=[\s>+~(]))(\*|[a-zA-Z][-a-zA-Z0-9]*)")
+ATTRIBUTE_RE = re.compile(r"\[[^\]]*\]")
+VAR_RE = re.compile(r"var\(\s*(--[-_a-zA-Z0-9]+)")
+# Strings are kept verbatim; comments are dropped
+STRING_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'')
+STRING_OR_COMMENT_RE = re.compile(STRING_RE.pattern + r"|/\*[\s\S]*?\*/")
+# @import/@charset statement; a ";" inside a quoted url() does not end it
+STATEMENT_RE = re.compile(r"@[^;{'\"]*(?:(?:" + STRING_RE.pattern + r")[^;{'\"]*)*;")
+LINK_RE = re.compile(r'[ \t]*<link rel="stylesheet" href="([^"]+)"\s*/?>[ \t]*\n?', re.IGNORECASE)
+BLOCK_RE = re.compile(r"<!-- css-bundle:(\w[-\w]*) -->[\s\S]*?<!-- /css-bundle -->")
+
+
+# --- minification ---
+
+def minify(css: str) -> str:
+    """Drop comments and redundant whitespace, leaving strings untouched."""
+    css = STRING_OR_COMMENT_RE.sub(lambda m: "" if m.group(0).startswith("/*") else m.group(0), css)
+    out = []
+    last = 0
+    for m in STRING_RE.finditer(css):
+        out.append(_squeeze(css[last:m.start()]))
+        out.append(m.group(0))
+        last = m.end()
+    out.append(_squeeze(css[last:]))
+    return "".join(out).strip()
+
+
+def _squeeze(text: str) -> str:
+    text = re.sub(r"\s+", " ", text)
+    # ":" is left alone: "a :hover" and "a:hover" are different selectors
+    text = re.sub(r" ?([{};,>]) ?", r"\1", text)
+    return text.replace(";}", "}")
+
+
+# --- parsing ---
+
+def parse(css: str) -> List[tuple]:
+    """Split minified CSS into ("stmt", text), ("rule", selector, body) and
+    ("block", prelude, children) nodes; @font-face/@keyframes bodies are kept raw."""
+    nodes = []
+    i = 0
+    while i < len(css):
+        stmt = STATEMENT_RE.match(css, i)
+        if stmt:
+            nodes.append(("stmt", stmt.group(0)))
+            i = stmt.end()
+            continue
+        brace = css.find("{", i)
+        if brace == -1:
+            break
+        end = _matching_brace(css, brace)
+        prelude, body = css[i:brace].strip(), css[brace + 1:end]
+        if prelude.startswith(("@media", "@supports")):
+            nodes.append(("block", prelude, parse(body)))
+        elif prelude.startswith("@"):
+            nodes.append(("rule", prelude, body))
+        else:
+            nodes.append(("rule", prelude, _compact_declarations(body)))
+        i = end + 1
+    return nodes
+
+
+def _compact_declarations(body: str) -> str:
+    # Inside a declaration block ":" only separates property and value
+    out = []
+    last = 0
+    for m in STRING_RE.finditer(body):
+        out.append(re.sub(r" ?: ?", ":", body[last:m.start()]))
+        out.append(m.group(0))
+        last = m.end()
+    out.append(re.sub(r" ?: ?", ":", body[last:]))
+    return "".join(out)
+
+
+def _matching_brace(css: str, start: int) -> int:
+    depth = 0
+    for j in range(start, len(css)):
+        if css[j] == "{":
+            depth += 1
+        elif css[j] == "}":
+            depth -= 1
+            if depth == 0:
+                return j
+    return len(css) - 1
+
+
+def serialize(nodes: List[tuple]) -> str:
+    out = []
+    for node in nodes:
+        if node[0] == "stmt":
+            out.append(node[1])
+        elif node[0] == "rule":
+            out.append(f"{node[1]}{{{node[2]}}}")
+        else:
+            out.append(f"{node[1]}{{{serialize(node[2])}}}")
+    return "".join(out)
+
+
+# --- critical subset ---
+
+def is_critical_selector(selector: str) -> bool:
+    if DEFERRED_PSEUDO_RE.search(selector):
+        return False
+    classes = CLASS_RE.findall(selector)
+    ids = ID_RE.findall(selector)
+    elements = ELEMENT_RE.findall(ATTRIBUTE_RE.sub("", selector).strip())
+    # Anything below a hidden menu (".dropdown-content a") waits for the bundle
+    hidden = [m.end() for m in CLASS_RE.finditer(selector) if m.group(1) in HIDDEN_CLASSES]
+    if hidden and selector[max(hidden):].strip(" >+~:"):
+        return False
+    return (all(c in CRITICAL_CLASSES for c in classes) and all(i in CRITICAL_IDS for i in ids)
+            and all(e.lower() in CRITICAL_ELEMENTS for e in elements))
+
+
+def critical_nodes(nodes: List[tuple]) -> List[tuple]:
+    keep = []
+    for node in nodes:
+        if node[0] == "rule":
+            if node[1].startswith("@"):
+                continue  # @font-face, @keyframes, @page: not needed for first paint
+            selectors = [s for s in node[1].split(",") if is_critical_selector(s)]
+            if selectors:
+                keep.append(("rule", ",".join(selectors), node[2]))
+        elif node[0] == "block":
+            inner = critical_nodes(node[2])
+            if inner:
+                keep.append(("block", node[1], inner))
+    return keep
+
+
+def _declarations(body: str) -> List[str]:
+    return [d for d in body.split(";") if d]
+
+
+def prune_custom_properties(nodes: List[tuple]) -> List[tuple]:
+    """Keep only the :root custom properties the critical rules use (directly or
+    through other properties); the deferred bundle still defines all of them."""
+    def walk(nodes):
+        for node in nodes:
+            if node[0] == "block":
+                yield from walk(node[2])
+            elif node[0] == "rule":
+                yield node
+
+    defined: Dict[str, List[str]] = {}
+    used = set()
+    for node in walk(nodes):
+        if node[1] == ":root":
+            for decl in _declarations(node[2]):
+                name, _, value = decl.partition(":")
+                defined.setdefault(name, []).append(value)
+        else:
+            used.update(VAR_RE.findall(node[2]))
+    todo = list(used)
+    while todo:
+        for value in defined.get(todo.pop(), ()):
+            for name in VAR_RE.findall(value):
+                if name not in used:
+                    used.add(name)
+                    todo.append(name)
+
+    def prune(nodes):
+        keep = []
+        for node in nodes:
+            if node[0] == "block":
+                inner = prune(node[2])
+                if inner:
+                    keep.append(("block", node[1], inner))
+            elif node[0] == "rule" and node[1] == ":root":
+                decls = [d for d in _declarations(node[2]) if not d.startswith("--") or d.partition(":")[0] in used]
+                if decls:
+                    keep.append(("rule", node[1], ";".join(decls)))
+            else:
+                keep.append(node)
+        return keep
+
+    return prune(nodes)
+
+
+# --- bundles ---
+
+def build_bundle(family: str) -> Dict[str, str]:
+    """Write the family bundle if missing; returns {"href", "critical"}."""
+    _page_dir, sheets = FAMILIES[family]
+    statements: List[tuple] = []
+    rules: List[tuple] = []
+    for url in sheets:
+        for node in parse(minify((ROOT / url.lstrip("/")).read_text(encoding="utf-8"))):
+            (statements if node[0] == "stmt" else rules).append(node)
+    # @charset/@import are only valid before any rule
+    bundle = serialize(statements + rules)
+    data = bundle.encode("utf-8")
+    digest = hashlib.sha1(data).hexdigest()[:HASH_LEN]
+    dest = BUNDLE_DIR / f"{family}.{digest}.css"
+    if not dest.exists():
+        BUNDLE_DIR.mkdir(parents=True, exist_ok=True)
+        write_bytes(dest, data)
+    critical = serialize(prune_custom_properties(critical_nodes(rules)))
+    if len(critical.encode("utf-8")) > CRITICAL_MAX_BYTES:
+        print(f"Warning: critical CSS for {family} is {len(critical.encode('utf-8'))} bytes, "
+              f"over the {CRITICAL_MAX_BYTES}-byte first round trip")
+    return {"href": f"{BUNDLE_URL}/{dest.name}", "critical": critical}
+
+
+def build_bundles() -> Dict[str, Dict[str, str]]:
+    return {family: build_bundle(family) for family in FAMILIES}
+
+
+def render_block(family: str, bundle: Dict[str, str]) -> str:
+    href = bundle["href"]
+    return (
+        f"<!-- css-bundle:{family} -->\n"
+        f"\t<style>{bundle['critical']}</style>\n"
+        f"\t<link rel=\"preload\" href=\"{href}\" as=\"style\" onload=\"this.onload=null;this.rel='stylesheet'\" />\n"
+        f"\t<noscript><link rel=\"stylesheet\" href=\"{href}\" /></noscript>\n"
+        f"\t<!-- /css-bundle -->"
+    )
+
+
+def family_for(path: Path) -> Optional[str]:
+    rel_dir = path.parent.relative_to(ROOT).as_posix()
+    for family, (page_dir, _sheets) in FAMILIES.items():
+        if rel_dir == page_dir:
+            return family
+    return None
+
+
+def apply_bundle(html: str, path: Path, bundles: Dict[str, Dict[str, str]]) -> str:
+    """Swap a page's family stylesheet links (or an older bundle block) for the current block."""
+    family = family_for(path)
+    if family is None or family not in bundles:
+        return html
+    block = render_block(family, bundles[family])
+
+    existing = BLOCK_RE.search(html)
+    if existing:
+        if existing.group(1) != family:
+            return html
+        return html[:existing.start()] + block + html[existing.end():]
+
+    head_end = html.find("</head>")
+    links = list(LINK_RE.finditer(html, 0, head_end if head_end != -1 else len(html)))
+    base = page_dir_url(path)
+    found = tuple(logical_url(m.group(1).split("?")[0], base) for m in links)
+    if not links or found != FAMILIES[family][1]:
+        return html
+    indent = re.match(r"[ \t]*", links[0].group(0)).group(0)
+    parts = [html[:links[0].start()], indent, block, "\n"]
+    last = links[0].end()
+    for m in links[1:]:
+        parts.append(html[last:m.start()])
+        last = m.end()
+    parts.append(html[last:])
+    return "".join(parts)
+
+
+def bundle_page(bundles: Dict[str, Dict[str, str]], path: Path, text: str) -> str:
+    return apply_bundle(text, path, bundles)
+
+
+def report(path: Path, status: str, detail: str) -> None:
+    if status == "updated":
+        print(f"bundled: {path.relative_to(ROOT)}")
+    elif status == "error":
+        print(f"error: {path} -> {detail}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bundle family CSS and inline the critical subset")
+    ap.add_argument("--prune", action="store_true", help="delete superseded bundles")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
+    bundles = build_bundles()
+    pages = []
+    for family, (page_dir, sheets) in FAMILIES.items():
+        bundle = bundles[family]
+        full = sum((ROOT / s.lstrip("/")).stat().st_size for s in sheets)
+        size = (BUNDLE_DIR / bundle["href"].rsplit("/", 1)[-1]).stat().st_size
+        print(f"{family}: {len(sheets)} stylesheets, {full} bytes -> bundle {size} bytes, "
+              f"critical {len(bundle['critical'].encode('utf-8'))} bytes inlined")
+        pages.extend(sorted((ROOT / page_dir).glob("*.html")))
+
+    counts = run_transform(pages, partial(bundle_page, bundles), report=report, workers=args.workers)
+
+    if args.prune:
+        live = {b["href"].rsplit("/", 1)[-1] for b in bundles.values()}
+        stale = [p for p in BUNDLE_DIR.glob("*.css") if p.name not in live]
+        for p in stale:
+            p.unlink()
+        sync_dirs([BUNDLE_DIR])
+        print(f"Pruned {len(stale)} superseded bundles")
+
+    print(f"Done. {counts['updated']} pages updated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
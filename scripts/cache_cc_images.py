@@ -12,7 +12,6 @@ Enhancements:
 - Final verification for any remaining Wikimedia URLs in HTML and manifest
 """
 import hashlib
-import json
 import os
 import re
 import sys
@@ -21,10 +20,12 @@ from typing import Optional
 from urllib.parse import urlparse, urlunparse, quote
 from urllib.request import Request, urlopen
 
+from atomic_write import write_text
+from image_manifest import ImageManifest
+
 ROOT = Path(__file__).resolve().parents[1]
 ENC_DIR = ROOT / "encyclopedia"
 ASSETS_DIR = ROOT / "assets" / "images" / "encyclopedia"
-MANIFEST_FILE = ROOT / "assets" / "data" / "encyclopedia-images.json"
 
 TARGET_HOST = "upload.wikimedia.org"
 USER_AGENT = (
@@ -156,38 +157,35 @@ def process_html_file(html_path: Path, url_to_local: dict, cache_dir: Path) -> b
 				content = new_content
 				changed = True
 	if changed:
-		html_path.write_text(content, encoding="utf-8")
+		write_text(html_path, content)
 	return changed
 
 
-def process_manifest(url_to_local: dict, cache_dir: Path) -> bool:
-	if not MANIFEST_FILE.exists():
-		return False
-	with MANIFEST_FILE.open("r", encoding="utf-8") as f:
-		manifest = json.load(f)
-	changed = False
-	for page_id, page in manifest.items():
-		images = page.get("images", [])
-		for img in images:
-			src = img.get("src", "")
-			if is_wikimedia(src):
-				local = url_to_local.get(src)
-				if not local:
-					local_file = download_with_fallbacks(src, cache_dir)
-					if not local_file:
-						continue
-					local = f"/assets/images/encyclopedia/_cache/{local_file.name}"
-					url_to_local[src] = local
-				img["source_url"] = src
-				img["src"] = local
-				changed = True
-	if changed:
-		with MANIFEST_FILE.open("w", encoding="utf-8") as f:
-			json.dump(manifest, f, indent=2)
-	return changed
+def process_manifest(store: ImageManifest, url_to_local: dict, cache_dir: Path) -> bool:
+	# The store's reverse URL index means only pages that use each URL are touched
+	for src in [u for u in store.urls() if is_wikimedia(u)]:
+		pages = store.pages_with(src)
+		if not pages:
+			continue
+		local = url_to_local.get(src)
+		if not local:
+			local_file = download_with_fallbacks(src, cache_dir)
+			if not local_file:
+				continue
+			local = f"/assets/images/encyclopedia/_cache/{local_file.name}"
+			url_to_local[src] = local
+		for slug in pages:
+			for img in store.images(slug):
+				if img.get("src") == src:
+					img["source_url"] = src
+		store.replace_url(src, local)
+	if store.dirty:
+		store.save()
+		return True
+	return False
 
 
-def collect_wikimedia_urls() -> set:
+def collect_wikimedia_urls(store: ImageManifest) -> set:
 	urls: set = set()
 	# From HTML
 	for html_file in sorted(ENC_DIR.glob("*.html")):
@@ -198,24 +196,20 @@ def collect_wikimedia_urls() -> set:
 			if is_wikimedia(src):
 				urls.add(src)
 	# From manifest
-	if MANIFEST_FILE.exists():
-		with MANIFEST_FILE.open("r", encoding="utf-8") as f:
-			manifest = json.load(f)
-		for page_id, page in manifest.items():
-			for img in page.get("images", []):
-				src = img.get("src", "")
-				if is_wikimedia(src):
-					urls.add(src)
+	for src in store.urls():
+		if is_wikimedia(src) and store.pages_with(src):
+			urls.add(src)
 	return urls
 
 
 def main():
 	url_to_local = {}
+	store = ImageManifest.load()
 	cache_dir = ASSETS_DIR / "_cache"
 	cache_dir.mkdir(parents=True, exist_ok=True)
 
 	# Pre-scan and cache
-	all_urls = collect_wikimedia_urls()
+	all_urls = collect_wikimedia_urls(store)
 	if all_urls:
 		print(f"Found {len(all_urls)} wikimedia URLs. Downloading locally...")
 		for url in sorted(all_urls):
@@ -236,7 +230,7 @@ def main():
 	print(f"Rewrote {updated_files} HTML files")
 
 	# Rewrite manifest (and cache any missed URLs on the fly)
-	if process_manifest(url_to_local, cache_dir):
+	if process_manifest(store, url_to_local, cache_dir):
 		print("Updated manifest with local Wikimedia image paths")
 
 	# Final check: ensure no upload.wikimedia.org remain in HTML
@@ -249,14 +243,11 @@ def main():
 
 	# Final check: ensure no upload.wikimedia.org remain in manifest
 	remaining_manifest = 0
-	if MANIFEST_FILE.exists():
-		with MANIFEST_FILE.open("r", encoding="utf-8") as f:
-			manifest = json.load(f)
-		for page_id, page in manifest.items():
-			for img in page.get("images", []):
-				src = img.get("src", "")
-				if TARGET_HOST in src:
-					remaining_manifest += 1
+	for page_id, images in store.items():
+		for img in images:
+			src = img.get("src", "")
+			if TARGET_HOST in src:
+				remaining_manifest += 1
 	print(f"Remaining manifest entries containing '{TARGET_HOST}': {remaining_manifest}")
 
 if __name__ == "__main__":
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Check every internal link and local asset reference across the site.
+
+All pages (see build_site.find_pages) plus the _includes/ fragments that
+main.js injects into them are parsed in a process pool. Every <a href>,
+stylesheet/icon/preload <link>, and src/srcset on script, img, source,
+iframe, video, audio and embed is collected. The refs are resolved the way
+GitHub Pages serves them ("/x/" -> /x/index.html, "/x" -> /x.html) and
+reported as:
+
+  broken links    - <a>/<iframe> targets that do not exist, e.g. the
+                    /encyclopedia/<slug>.html cross-links the encyclopedia
+                    agent writes for topics that were never generated
+  missing assets  - stylesheets, scripts, images and media not on disk
+  orphan pages    - pages no other page or include links to
+
+Parsed refs are cached per file in .build/link-graph.json, keyed like the
+build graph: files whose mtime/size are unchanged are not read, touched
+files are re-hashed, and only files whose bytes changed are re-parsed.
+Resolution always runs against the current tree, so a deleted asset shows
+up without re-parsing its pages. The full report is written to
+.build/link-report.json; the exit status is 1 if anything is broken.
+
+Run from repo root:
+  python3 scripts/check_links.py [--workers N] [--limit N]
+"""
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import unquote
+
+from atomic_write import write_text
+from build_site import find_pages
+
+ROOT = Path(__file__).resolve().parents[1]
+INCLUDES_DIR = ROOT / "_includes"
+GRAPH_FILE = ROOT / ".build" / "link-graph.json"
+REPORT_FILE = ROOT / ".build" / "link-report.json"
+
+# Bump when the parser collects different refs
+GRAPH_VERSION = 1
+# Entry points nothing is expected to link to
+ROOT_PAGES = {"index.html", "404.html"}
+SKIP_WALK = {".git", ".build", "node_modules", "__pycache__"}
+
+# http:, mailto:, javascript:, data: ...
+SCHEME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+ASSET_RELS = {"stylesheet", "icon", "shortcut", "apple-touch-icon", "preload", "prefetch", "modulepreload", "manifest"}
+SRC_TAGS = {"script", "img", "source", "video", "audio", "embed", "track"}
+
+
+class RefParser(HTMLParser):
+    """Collects (kind, url) refs, kind being 'link' or 'asset'."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.refs: List[Tuple[str, str]] = []
+
+    def handle_starttag(self, tag, attrs):
+        a = {k: v for k, v in attrs if v}
+        if tag == "a" and "href" in a:
+            self.refs.append(("link", a["href"]))
+        elif tag == "link" and "href" in a:
+            if ASSET_RELS & set(a.get("rel", "").lower().split()):
+                self.refs.append(("asset", a["href"]))
+        elif tag == "iframe" and "src" in a:
+            self.refs.append(("link", a["src"]))
+        elif tag in SRC_TAGS:
+            if "src" in a:
+                self.refs.append(("asset", a["src"]))
+            if tag == "video" and "poster" in a:
+                self.refs.append(("asset", a["poster"]))
+            for candidate in a.get("srcset", "").split(","):
+                url = candidate.strip().split(" ")[0]
+                if url:
+                    self.refs.append(("asset", url))
+
+
+def file_digest(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def stat_key(path: Path) -> List[int]:
+    st = path.stat()
+    return [st.st_mtime_ns, st.st_size]
+
+
+def parse_file(job: Tuple[str, str]) -> Tuple[str, List[int], str, List[Tuple[str, str]], str]:
+    """Worker: (path, cached hash) -> (path, stat, hash, refs, error); refs is None when the hash still matches."""
+    path_str, cached_hash = job
+    path = Path(path_str)
+    try:
+        stat = stat_key(path)
+        data = path.read_bytes()
+        content_hash = file_digest(data)
+        if content_hash == cached_hash:
+            return path_str, stat, content_hash, None, ""
+        parser = RefParser()
+        parser.feed(data.decode("utf-8", errors="ignore"))
+        parser.close()
+        return path_str, stat, content_hash, parser.refs, ""
+    except Exception as e:
+        return path_str, [], "", [], str(e)
+
+
+class LinkGraph:
+    def __init__(self):
+        graph = {}
+        if GRAPH_FILE.exists():
+            with GRAPH_FILE.open("r", encoding="utf-8") as f:
+                graph = json.load(f)
+        if graph.get("version") != GRAPH_VERSION:
+            graph = {}
+        self.nodes: Dict[str, dict] = graph.get("nodes", {})
+        self.changed = not graph
+        self.parsed = 0
+
+    def refresh(self, sources: List[Path], workers: int = 0) -> List[str]:
+        """Bring every source's refs up to date; returns parse errors."""
+        live = {p.relative_to(ROOT).as_posix(): p for p in sources}
+        for rel in set(self.nodes) - set(live):
+            del self.nodes[rel]
+            self.changed = True
+
+        jobs = []
+        for rel, path in live.items():
+            node = self.nodes.get(rel)
+            if node is not None and node["stat"] == stat_key(path):
+                continue
+            jobs.append((str(path), node["hash"] if node else ""))
+
+        errors = []
+        if not jobs:
+            return errors
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            for path_str, stat, content_hash, refs, error in pool.map(parse_file, jobs, chunksize=16):
+                rel = Path(path_str).relative_to(ROOT).as_posix()
+                if error:
+                    errors.append(f"{rel}: {error}")
+                    self.nodes.pop(rel, None)
+                    continue
+                if refs is None:
+                    # Touched but identical: keep the cached parse
+                    self.nodes[rel]["stat"] = stat
+                else:
+                    self.nodes[rel] = {"stat": stat, "hash": content_hash, "refs": refs}
+                    self.parsed += 1
+        self.changed = True
+        return errors
+
+    def save(self) -> None:
+        if not self.changed:
+            return
+        GRAPH_FILE.parent.mkdir(parents=True, exist_ok=True)
+        write_text(GRAPH_FILE, json.dumps({"version": GRAPH_VERSION, "nodes": self.nodes},
+                                          separators=(",", ":"), sort_keys=True))
+
+
+def site_files() -> Set[str]:
+    files = set()
+    for root, dirs, names in os.walk(ROOT):
+        dirs[:] = [d for d in dirs if d not in SKIP_WALK]
+        rel_root = Path(root).relative_to(ROOT).as_posix()
+        for name in names:
+            files.add(name if rel_root == "." else f"{rel_root}/{name}")
+    return files
+
+
+def resolve(url: str, base: str) -> Optional[str]:
+    """Repo-relative path a local URL points at, or None for external/fragment-only URLs."""
+    url = url.strip()
+    if not url or url.startswith("//") or SCHEME_RE.match(url):
+        return None
+    path = unquote(url.split("#", 1)[0].split("?", 1)[0])
+    if not path:
+        return None
+    full = posixpath.normpath(path if path.startswith("/") else posixpath.join(base, path))
+    return full.lstrip("/")
+
+
+def target_file(rel: str, files: Set[str]) -> Optional[str]:
+    """File GitHub Pages would serve for rel, if any."""
+    if rel in files:
+        return rel
+    for candidate in (posixpath.join(rel, "index.html"), rel + ".html"):
+        if candidate in files:
+            return candidate
+    return None
+
+
+def check(nodes: Dict[str, dict], pages: Set[str], files: Set[str]) -> dict:
+    broken: List[Tuple[str, str]] = []
+    missing: List[Tuple[str, str]] = []
+    inbound: Dict[str, int] = {}
+    resolved: Dict[Tuple[str, str], Optional[str]] = {}
+    for source, node in sorted(nodes.items()):
+        # Fragments are injected into pages at the site root level
+        base = "/" if source.startswith("_includes/") else "/" + posixpath.dirname(source)
+        for kind, url in node["refs"]:
+            key = (base, url)
+            if key not in resolved:
+                rel = resolve(url, base)
+                resolved[key] = None if rel is None else (target_file(rel, files) or "")
+            target = resolved[key]
+            if target is None:
+                continue
+            if not target:
+                (broken if kind == "link" else missing).append((source, url))
+            elif target in pages and target != source:
+                inbound[target] = inbound.get(target, 0) + 1
+    orphans = sorted(p for p in pages if p not in inbound and p not in ROOT_PAGES)
+    return {"broken_links": broken, "missing_assets": missing, "orphans": orphans}
+
+
+def print_section(title: str, rows: list, limit: int) -> None:
+    print(f"{title}: {len(rows)}")
+    for row in rows[:limit] if limit else rows:
+        print("  " + (f"{row[0]} -> {row[1]}" if isinstance(row, tuple) else row))
+    if limit and len(rows) > limit:
+        print(f"  ... {len(rows) - limit} more in {REPORT_FILE.relative_to(ROOT)}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Check internal links, local assets and orphan pages")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    ap.add_argument("--limit", type=int, default=20, help="rows printed per section (0: all)")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    pages = find_pages()
+    sources = pages + sorted(INCLUDES_DIR.glob("*.html"))
+    graph = LinkGraph()
+    errors = graph.refresh(sources, workers=args.workers)
+    graph.save()
+    for error in errors:
+        print(f"error: {error}")
+
+    page_set = {p.relative_to(ROOT).as_posix() for p in pages}
+    result = check(graph.nodes, page_set, site_files())
+    elapsed = time.perf_counter() - start
+
+    print_section("Broken links", result["broken_links"], args.limit)
+    print_section("Missing assets", result["missing_assets"], args.limit)
+    print_section("Orphan pages", result["orphans"], args.limit)
+    REPORT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    write_text(REPORT_FILE, json.dumps(result, indent=2))
+    print(f"Done. {len(sources)} files, {graph.parsed} parsed, "
+          f"{sum(len(n['refs']) for n in graph.nodes.values())} refs checked in {elapsed:.2f}s")
+    return 1 if result["broken_links"] or result["missing_assets"] or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Inline the shared _includes/ fragments into every page at build time.
+
+Pages carry empty placeholders (see normalize_header.py) that main.js would
+otherwise fill with three uncached fetches per page view. This script
+replaces each placeholder with its fragment:
+
+  <div id="header-placeholder"></div>
+    ->
+  <div id="header-placeholder" data-include-hash="1a2b3c4d5e6f">...header.html...</div><!-- /header-placeholder -->
+
+Fragments are expanded into each other first (header.html carries the
+banner placeholder), so one pass over a page leaves no empty placeholder
+behind. A page-level placeholder for a fragment that an included fragment
+already contains is dropped rather than rendered twice.
+
+The hash of the fragment is recorded on the placeholder, so a page is only
+rewritten when a fragment it includes has changed. main.js skips the fetch
+for placeholders that carry data-include-hash. Files are processed in a
+process pool.
+
+Run from repo root:
+  python3 scripts/expand_includes.py            # expand / refresh
+  python3 scripts/expand_includes.py --check    # list stale pages, write nothing
+"""
+import argparse
+import hashlib
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Tuple
+
+from atomic_write import sync_dirs, write_text
+from normalize_header import should_skip
+
+ROOT = Path(__file__).resolve().parents[1]
+INCLUDES_DIR = ROOT / "_includes"
+
+# placeholder id -> fragment file
+FRAGMENTS = {
+    "header-placeholder": "header.html",
+    "sitewide-banner-placeholder": "banner.html",
+    "footer-placeholder": "footer.html",
+}
+
+PLACEHOLDER_RE = re.compile(
+    r'<div id="(?P<id>' + "|".join(re.escape(k) for k in FRAGMENTS) + r')"'
+    r'(?: data-include-hash="(?P<hash>[0-9a-f]+)">.*?</div><!-- /(?P=id) -->|></div>)',
+    re.DOTALL,
+)
+
+
+def load_fragments() -> Dict[str, Tuple[str, str]]:
+    """placeholder id -> (fully expanded fragment html, short content hash)"""
+    raw = {pid: (INCLUDES_DIR / name).read_text(encoding="utf-8").strip() for pid, name in FRAGMENTS.items()}
+    # Expand fragments into each other until nothing changes; a fragment
+    # that (indirectly) includes itself is left as a placeholder
+    fragments = {pid: (text, "") for pid, text in raw.items()}
+    for _ in range(len(FRAGMENTS) + 1):
+        hashed = {pid: (text, hashlib.sha1(text.encode("utf-8")).hexdigest()[:12])
+                  for pid, (text, _) in fragments.items()}
+        expanded = {pid: (expand(raw[pid], hashed, own=pid), "") for pid in raw}
+        if expanded == fragments:
+            break
+        fragments = expanded
+    return {pid: (text, hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]) for pid, (text, _) in fragments.items()}
+
+
+def expand(html: str, fragments: Dict[str, Tuple[str, str]], own: str = "") -> str:
+    # Placeholders already supplied by another fragment on the page
+    present = {m.group("id") for m in PLACEHOLDER_RE.finditer(html)}
+    nested = {m.group("id") for pid in present if pid != own
+              for m in PLACEHOLDER_RE.finditer(fragments[pid][0])}
+
+    def replace(m: re.Match) -> str:
+        pid = m.group("id")
+        if pid == own:
+            return m.group(0)
+        if pid in nested:
+            return ""
+        text, digest = fragments[pid]
+        if m.group("hash") == digest:
+            return m.group(0)
+        return f'<div id="{pid}" data-include-hash="{digest}">{text}</div><!-- /{pid} -->'
+
+    return PLACEHOLDER_RE.sub(replace, html)
+
+
+def process_file(job: Tuple[str, Dict[str, Tuple[str, str]], bool]) -> Tuple[str, str]:
+    """Worker: expand one page; returns (path, 'updated'|'stale'|'current'|'error: ...')."""
+    path_str, fragments, check = job
+    path = Path(path_str)
+    try:
+        html = path.read_text(encoding="utf-8")
+        new_html = expand(html, fragments)
+        if new_html == html:
+            return path_str, "current"
+        if check:
+            return path_str, "stale"
+        write_text(path, new_html, sync_dir=False)
+        return path_str, "updated"
+    except Exception as e:
+        return path_str, f"error: {e}"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inline _includes fragments into page placeholders")
+    ap.add_argument("--check", action="store_true", help="report stale pages without writing")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
+    fragments = load_fragments()
+    files = [f for f in sorted(ROOT.glob("**/*.html")) if not should_skip(f)]
+    jobs = [(str(f), fragments, args.check) for f in files]
+
+    start = time.perf_counter()
+    counts = {"updated": 0, "stale": 0, "current": 0}
+    updated_dirs = set()
+    with ProcessPoolExecutor(max_workers=args.workers or None) as pool:
+        for path_str, status in pool.map(process_file, jobs, chunksize=32):
+            rel = Path(path_str).relative_to(ROOT)
+            if status.startswith("error"):
+                print(f"{status}: {rel}")
+                continue
+            counts[status] += 1
+            if status == "updated":
+                updated_dirs.add(Path(path_str).parent)
+            if status != "current":
+                print(f"{status}: {rel}")
+    sync_dirs(updated_dirs)
+    elapsed = time.perf_counter() - start
+
+    print(f"Done. {len(files)} files in {elapsed:.2f}s: "
+          f"{counts['updated']} updated, {counts['stale']} stale, {counts['current']} current")
+    return 1 if args.check and counts["stale"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Shared parallel runner for scripts that rewrite many files in place.
+
+A transform is a module-level function (path, text) -> new text, so it can
+be sent to worker processes (use functools.partial to bind extra
+arguments). Files are handed out in chunks to a process pool. Each file is
+read once, transformed and written only if its text changed. Results come
+back in input order, so output reads the same as a serial run.
+
+Writes go through atomic_write (temp file + rename); the touched
+directories are fsynced once, by the parent, when the run finishes.
+
+A transform raises SkipFile to leave a file alone with a reason; any other
+exception is reported as an error for that file and the run continues.
+
+An optional before_write hook (path) -> str runs in the worker just before a
+changed file is overwritten (e.g. to back it up); its return value is passed
+to the reporter as the detail of the "updated" result.
+
+Used by normalize_header.py and apply-template-safely.py.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from atomic_write import sync_dirs, write_text
+
+CHUNKSIZE = 32
+
+Transform = Callable[[Path, str], str]
+Reporter = Callable[[Path, str, str], None]
+Hook = Callable[[Path], str]
+
+
+class SkipFile(Exception):
+    """Raised by a transform to leave a file untouched."""
+
+
+def transform_file(job: Tuple[str, Transform, Optional[Hook], bool]) -> Tuple[str, str, str]:
+    """Worker: returns (path, 'updated'|'unchanged'|'skipped'|'error', detail)."""
+    path_str, transform, before_write, dry_run = job
+    path = Path(path_str)
+    try:
+        text = path.read_text(encoding="utf-8")
+        new_text = transform(path, text)
+        if new_text == text:
+            return path_str, "unchanged", ""
+        if dry_run:
+            return path_str, "updated", ""
+        detail = before_write(path) if before_write else ""
+        write_text(path, new_text, sync_dir=False)
+        return path_str, "updated", detail
+    except SkipFile as e:
+        return path_str, "skipped", str(e)
+    except Exception as e:
+        return path_str, "error", str(e)
+
+
+def run_transform(paths: Iterable[Path], transform: Transform, report: Optional[Reporter] = None,
+                  before_write: Optional[Hook] = None, dry_run: bool = False,
+                  workers: int = 0, chunksize: int = CHUNKSIZE) -> Dict[str, int]:
+    """Apply transform to every path in a process pool; returns counts per status."""
+    jobs = [(str(p), transform, before_write, dry_run) for p in paths]
+    counts = {"updated": 0, "unchanged": 0, "skipped": 0, "error": 0}
+    updated_dirs = set()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        for path_str, status, detail in pool.map(transform_file, jobs, chunksize=chunksize):
+            counts[status] += 1
+            if status == "updated":
+                updated_dirs.add(Path(path_str).parent)
+            if report:
+                report(Path(path_str), status, detail)
+    sync_dirs(updated_dirs)
+    elapsed = time.perf_counter() - start
+    rate = len(jobs) / elapsed if elapsed > 0 else 0.0
+    print(f"Processed {len(jobs)} files in {elapsed:.2f}s ({rate:.0f} files/sec)")
+    return counts
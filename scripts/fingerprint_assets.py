@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Fingerprint stylesheets and scripts with a content hash and point every page at them.
+
+Each asset (assets/css/*.css, assets/js/*.js, /style.css) is copied to
+/assets/dist/<path>.<hash>.<ext>, e.g.
+
+  /assets/css/main.css  ->  /assets/dist/assets/css/main.1a2b3c4d5e.css
+
+and assets/data/asset-manifest.json maps logical URL -> fingerprinted URL.
+A file's URL changes whenever its bytes do, so everything under
+/assets/dist/ can be cached as immutable for a year (see /_headers).
+
+Every href/src that resolves to an asset -- absolute, relative, "/../",
+with or without a ?v= cache-buster, or an older fingerprint -- is rewritten
+to the current fingerprinted URL in one regex pass per page. Pages are
+processed in parallel (see file_transform.py); build_site.py applies the same
+rewrite to the pages it rebuilds.
+
+Run from repo root:
+  python3 scripts/fingerprint_assets.py [--prune] [--workers N]
+"""
+import argparse
+import hashlib
+import json
+import posixpath
+import re
+import sys
+from functools import partial
+from pathlib import Path
+from typing import Dict, List
+
+from atomic_write import sync_dirs, write_bytes, write_text
+from file_transform import run_transform
+from normalize_header import should_skip
+
+ROOT = Path(__file__).resolve().parents[1]
+DIST_DIR = ROOT / "assets" / "dist"
+DIST_URL = "/assets/dist"
+MANIFEST_FILE = ROOT / "assets" / "data" / "asset-manifest.json"
+
+ASSET_GLOBS = ("assets/css/*.css", "assets/js/*.js", "style.css")
+HASH_LEN = 10
+
+# href="..." / src="..." pointing at a .css/.js file, with an optional query
+REF_RE = re.compile(r'(?P<attr>\b(?:href|src)=")(?P<url>[^"?#:]+\.(?:css|js))(?:\?[^"#]*)?"')
+# /assets/dist/<logical path>.<hash>.<ext> -> logical path
+DIST_RE = re.compile(r"^" + re.escape(DIST_URL) + r"(/.+)\.[0-9a-f]{" + str(HASH_LEN) + r"}(\.(?:css|js))$")
+
+
+def find_assets() -> List[Path]:
+    assets = []
+    for pattern in ASSET_GLOBS:
+        assets.extend(sorted(ROOT.glob(pattern)))
+    return assets
+
+
+def fingerprint(asset: Path) -> str:
+    """Write the hashed copy of one asset (if missing); returns its URL."""
+    data = asset.read_bytes()
+    digest = hashlib.sha1(data).hexdigest()[:HASH_LEN]
+    rel = asset.relative_to(ROOT)
+    dest = DIST_DIR / rel.parent / f"{asset.stem}.{digest}{asset.suffix}"
+    if not dest.exists():
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        write_bytes(dest, data, sync_dir=False)
+    return f"{DIST_URL}/{dest.relative_to(DIST_DIR).as_posix()}"
+
+
+def load_manifest() -> Dict[str, str]:
+    if not MANIFEST_FILE.exists():
+        return {}
+    with MANIFEST_FILE.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def page_dir_url(path: Path) -> str:
+    """Site URL of the directory a page lives in, for resolving relative refs."""
+    rel = path.parent.relative_to(ROOT).as_posix()
+    return "/" if rel == "." else f"/{rel}"
+
+
+def logical_url(url: str, base: str) -> str:
+    # normpath drops "/../" at the root, as browsers do
+    url = posixpath.normpath(url if url.startswith("/") else posixpath.join(base, url))
+    m = DIST_RE.match(url)
+    return m.group(1) + m.group(2) if m else url
+
+
+def rewrite(html: str, base: str, manifest: Dict[str, str]) -> str:
+    """Point every asset reference in a page at its fingerprinted URL."""
+    if not manifest:
+        return html
+
+    def replace(m: re.Match) -> str:
+        hashed = manifest.get(logical_url(m.group("url"), base))
+        return f'{m.group("attr")}{hashed}"' if hashed else m.group(0)
+
+    return REF_RE.sub(replace, html)
+
+
+def rewrite_page(manifest: Dict[str, str], path: Path, text: str) -> str:
+    return rewrite(text, page_dir_url(path), manifest)
+
+
+def report(path: Path, status: str, detail: str) -> None:
+    if status == "updated":
+        print(f"rewrote: {path.relative_to(ROOT)}")
+    elif status == "error":
+        print(f"error: {path} -> {detail}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Content-hash CSS/JS and rewrite page references")
+    ap.add_argument("--prune", action="store_true", help="delete superseded fingerprinted files")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
+    manifest = {"/" + a.relative_to(ROOT).as_posix(): fingerprint(a) for a in find_assets()}
+    sync_dirs({DIST_DIR / Path(url[len(DIST_URL) + 1:]).parent for url in manifest.values()})
+    MANIFEST_FILE.parent.mkdir(parents=True, exist_ok=True)
+    if write_text(MANIFEST_FILE, json.dumps(manifest, indent=2, sort_keys=True)):
+        print(f"Updated manifest: {MANIFEST_FILE.relative_to(ROOT)}")
+
+    pages = [f for f in sorted(ROOT.glob("**/*.html")) if not should_skip(f)]
+    counts = run_transform(pages, partial(rewrite_page, manifest), report=report, workers=args.workers)
+
+    if args.prune:
+        live = set(manifest.values())
+        stale = [p for p in DIST_DIR.rglob("*") if p.is_file()
+                 and f"{DIST_URL}/{p.relative_to(DIST_DIR).as_posix()}" not in live]
+        for p in stale:
+            p.unlink()
+        print(f"Pruned {len(stale)} superseded files")
+
+    print(f"Done. {len(manifest)} assets, {counts['updated']} pages rewritten")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
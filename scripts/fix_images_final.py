@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """Final fix for encyclopedia images - use stable, working image sources"""
-import json
 import re
 from pathlib import Path
 
+from atomic_write import write_text
+from image_manifest import ImageManifest
+
 # Stable image sources that work
 STABLE_IMAGES = {
     # NASA/ESA images (Public Domain, very stable)
@@ -75,7 +77,7 @@ def main():
             new_content = fix_html_images(content)
             
             if new_content != content:
-                html_file.write_text(new_content, encoding="utf-8")
+                write_text(html_file, new_content)
                 fixed_count += 1
                 print(f"Fixed: {html_file.name}")
         except Exception as e:
@@ -84,22 +86,20 @@ def main():
     print(f"\nFixed {fixed_count} HTML files")
     
     # Also update the manifest for future generations
-    manifest_file = Path("assets/data/encyclopedia-images.json")
-    with open(manifest_file, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
+    store = ImageManifest.load()
     
     # Simple approach: give each page stable images
-    for page_id, page_data in manifest.items():
-        if "images" in page_data:
+    for page_id, images in store.items():
+        if images:
             stable_imgs = get_stable_images_for_category("default")
-            for i, img in enumerate(page_data["images"]):
+            for i, img in enumerate(images):
                 if i < len(stable_imgs):
                     img["src"] = stable_imgs[i]["src"]
                     img["credit"] = stable_imgs[i]["credit"]
                     img["license"] = stable_imgs[i]["license"]
+            store.touch(page_id)
     
-    with open(manifest_file, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    store.save()
     
     print("Updated manifest with stable images")
 
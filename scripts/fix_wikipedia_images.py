@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """Fix Wikipedia Commons image URLs to use direct links"""
-import json
 import re
 from pathlib import Path
 
+from atomic_write import write_text
+from image_manifest import ImageManifest
+
 # Mapping of problematic URLs to working alternatives
 URL_FIXES = {
     # SVG files - use PNG versions instead
@@ -65,31 +67,25 @@ URL_FIXES = {
         "https://map.gsfc.nasa.gov/media/080997/080997_PowerSpectrum_WMAP_PRL102_041301_2009.png"
 }
 
+def urls_to_fix(store):
+    """(old, new) pairs from URL_FIXES that some manifest image uses as its src"""
+    return [(old, new) for old, new in URL_FIXES.items() if old != new and store.pages_with(old)]
+
 def fix_url(url):
     """Fix a URL if it's in our mapping, otherwise return as-is"""
     return URL_FIXES.get(url, url)
 
 def main():
     # Fix the manifest
-    manifest_file = Path("assets/data/encyclopedia-images.json")
-    with open(manifest_file, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
-    
-    updated_manifest = False
-    for page_id, page_data in manifest.items():
-        if "images" in page_data:
-            for img in page_data["images"]:
-                old_src = img.get("src", "")
-                new_src = fix_url(old_src)
-                if new_src != old_src:
-                    img["src"] = new_src
-                    updated_manifest = True
-                    print(f"Updated {page_id}: {old_src} -> {new_src}")
-    
-    if updated_manifest:
-        with open(manifest_file, "w", encoding="utf-8") as f:
-            json.dump(manifest, f, indent=2)
-        print(f"\nUpdated manifest file")
+    store = ImageManifest.load()
+    
+    # Only pages that actually reference a mapped URL are touched
+    for old_url, new_url in urls_to_fix(store):
+        for page_id in sorted(store.replace_url(old_url, new_url)):
+            print(f"Updated {page_id}: {old_url} -> {new_url}")
+    
+    if store.dirty:
+        print(f"\nUpdated manifest entries")
     
     # Fix already-generated HTML files
     enc_dir = Path("encyclopedia")
@@ -107,7 +103,7 @@ def main():
             content = content.replace(old_url, new_url)
         
         if content != original_content:
-            html_file.write_text(content, encoding="utf-8")
+            write_text(html_file, content)
             updated_files += 1
             print(f"Updated HTML: {html_file.name}")
     
@@ -115,20 +111,16 @@ def main():
     
     # Add fallback images to the manifest for resilience
     print("\nAdding fallback URLs...")
-    with open(manifest_file, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
-    
     # Add a generic fallback for all images
     fallback_url = "https://via.placeholder.com/800x400/f0f0f0/666666?text=Image+Loading..."
     
-    for page_id, page_data in manifest.items():
-        if "images" in page_data:
-            for img in page_data["images"]:
-                if "fallback_src" not in img:
-                    img["fallback_src"] = fallback_url
+    for page_id, images in store.items():
+        if any("fallback_src" not in img for img in images):
+            for img in images:
+                img.setdefault("fallback_src", fallback_url)
+            store.touch(page_id)
     
-    with open(manifest_file, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    store.save()
     
     print("Added fallback URLs to all images")
 
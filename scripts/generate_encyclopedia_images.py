@@ -4,6 +4,8 @@ import json
 import os
 from pathlib import Path
 
+from image_manifest import ImageManifest, task_slug
+
 # Image sources by category - all CC or Public Domain
 IMAGE_SOURCES = {
     "Recognition Physics Fundamentals": [
@@ -207,22 +209,15 @@ def main():
     # Create task lookup by slug
     task_by_slug = {}
     for task in all_tasks:
-        slug = task["title"].lower().replace(" ", "-").replace("(", "").replace(")", "").replace(",", "")
-        slug = "-".join(slug.split())
-        task_by_slug[slug] = task
+        task_by_slug[task_slug(task)] = task
     
     # Load existing manifest
-    manifest_file = Path("assets/data/encyclopedia-images.json")
-    if manifest_file.exists():
-        with open(manifest_file, "r", encoding="utf-8") as f:
-            manifest = json.load(f)
-    else:
-        manifest = {}
+    store = ImageManifest.load()
     
     # Generate entries for all existing pages
     updated = 0
     for page_slug in existing_pages:
-        if page_slug not in manifest:
+        if page_slug not in store:
             # Find the task for this page
             task = task_by_slug.get(page_slug)
             if task:
@@ -238,16 +233,15 @@ def main():
                         custom_img["alt"] = f"{task['title']} conceptual visualization"
                     customized_images.append(custom_img)
                 
-                manifest[page_slug] = {"images": customized_images}
+                store.put(page_slug, customized_images, category)
                 updated += 1
                 print(f"Added images for: {page_slug}")
     
     # Write updated manifest
-    with open(manifest_file, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    store.save()
     
     print(f"\nUpdated manifest with {updated} new entries")
-    print(f"Total pages with images: {len(manifest)}")
+    print(f"Total pages with images: {len(store)}")
     
     # Run the image addition script
     print("\nApplying images to HTML pages...")
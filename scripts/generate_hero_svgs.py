@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Render a small, deterministic hero SVG for every encyclopedia task.
+
+Each image is built offline from the task's title, category and tags: a
+category gradient, a golden-angle dot spiral seeded by the slug, and the
+title/category/tag text. Output is minified and content-hashed
+(assets/images/encyclopedia/hero/{slug}.{hash}.svg), so a file's URL changes
+whenever its bytes do and it can be served with a year-long immutable cache
+lifetime. assets/data/encyclopedia-heroes.json maps slug -> URL; the
+encyclopedia agent uses it for the default hero src.
+
+Unchanged images are not rewritten. Rendering runs across a process pool.
+
+Run from repo root:
+  python3 scripts/generate_hero_svgs.py [--tasks PATH ...] [--workers N] [--prune]
+"""
+import argparse
+import hashlib
+import json
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+from xml.sax.saxutils import escape
+
+from atomic_write import sync_dirs, write_bytes, write_text
+from image_manifest import slugify
+
+ROOT = Path(__file__).resolve().parents[1]
+TASKS_FILE = ROOT / "agents" / "encyclopedia" / "tasks.complete-2000.json"
+OUT_DIR = ROOT / "assets" / "images" / "encyclopedia" / "hero"
+OUT_URL = "/assets/images/encyclopedia/hero"
+INDEX_FILE = ROOT / "assets" / "data" / "encyclopedia-heroes.json"
+
+WIDTH, HEIGHT = 1200, 400
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+FONT = "system-ui,-apple-system,Segoe UI,sans-serif"
+
+# (gradient start, gradient end) per category; colours follow the placeholder palette
+CATEGORY_PALETTES: Dict[str, Tuple[str, str]] = {
+    "Recognition Physics Fundamentals": ("#2d3748", "#4a5568"),
+    "Fundamental Constants": ("#1e3a4c", "#2e5266"),
+    "Quantum & Particle Physics": ("#2e0854", "#4b0082"),
+    "Spacetime & Gravity": ("#0d0d1a", "#1a1a2e"),
+    "Thermodynamics & Statistical": ("#4a1c1c", "#7a2e2e"),
+    "Cosmology & Astrophysics": ("#071a33", "#0f3460"),
+    "Chemistry & Materials": ("#163b2e", "#1f5c45"),
+    "Biology & Consciousness": ("#1b3b1b", "#2f5d3a"),
+    "Mathematics & Computation": ("#2b2b40", "#3f3f66"),
+    "Advanced Physics & Technology": ("#332200", "#5c4200"),
+}
+DEFAULT_PALETTE = ("#222222", "#444444")
+
+
+def wrap_title(title: str) -> Tuple[List[str], int]:
+    """Fit the title into at most two lines, shrinking the font for long titles."""
+    for size in (64, 52, 44):
+        per_line = int(720 / (size * 0.56))
+        lines: List[str] = []
+        for word in title.split():
+            if lines and len(lines[-1]) + 1 + len(word) <= per_line:
+                lines[-1] += " " + word
+            else:
+                lines.append(word)
+        if len(lines) <= 2 and all(len(line) <= per_line for line in lines):
+            return lines, size
+    return [lines[0], " ".join(lines[1:])[: per_line - 1] + "…"], size
+
+
+def fmt(x: float) -> str:
+    return f"{x:.1f}".rstrip("0").rstrip(".")
+
+
+def render_svg(task: dict) -> str:
+    title = task.get("title", "")
+    slug = task.get("slug") or slugify(title)
+    category = task.get("category", "")
+    tags = task.get("tags", [])[:4]
+    seed = hashlib.sha1(slug.encode("utf-8")).digest()
+    start, end = CATEGORY_PALETTES.get(category, DEFAULT_PALETTE)
+    hue = seed[0] * 360 // 256
+
+    # Golden-angle spiral, rotated and sized per slug so each page differs
+    dots = []
+    count = 90 + seed[1] % 60
+    spin = seed[2] / 255 * 2 * math.pi
+    scale = 13 + seed[3] % 5
+    cx, cy = 960, HEIGHT / 2
+    for i in range(1, count):
+        r = scale * math.sqrt(i)
+        x = cx + r * math.cos(i * GOLDEN_ANGLE + spin)
+        y = cy + r * math.sin(i * GOLDEN_ANGLE + spin)
+        if -10 < x < WIDTH + 10 and -10 < y < HEIGHT + 10:
+            dots.append(f'<circle cx="{fmt(x)}" cy="{fmt(y)}" r="{fmt(1.5 + i / count * 4)}"/>')
+
+    lines, size = wrap_title(title)
+    title_y = 215 if len(lines) == 1 else 185
+    title_svg = "".join(
+        f'<tspan x="60" dy="{0 if n == 0 else fmt(size * 1.1)}">{escape(line)}</tspan>'
+        for n, line in enumerate(lines)
+    )
+    tag_text = "  ".join(f"#{t}" for t in tags)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {WIDTH} {HEIGHT}" width="{WIDTH}" height="{HEIGHT}"'
+        f' role="img" aria-label="{escape(title, {chr(34): "&quot;"})}">'
+        f'<defs><linearGradient id="g" x2="1" y2="1"><stop stop-color="{start}"/>'
+        f'<stop offset="1" stop-color="{end}"/></linearGradient></defs>'
+        f'<rect width="{WIDTH}" height="{HEIGHT}" fill="url(#g)"/>'
+        f'<g fill="hsl({hue},70%,70%)" fill-opacity=".45">{"".join(dots)}</g>'
+        f'<g font-family="{FONT}" fill="#fff">'
+        f'<text x="60" y="100" font-size="20" letter-spacing="3" fill-opacity=".75">{escape(category.upper())}</text>'
+        f'<text x="60" y="{title_y}" font-size="{size}" font-weight="700">{title_svg}</text>'
+        + (f'<text x="60" y="340" font-size="22" fill-opacity=".7">{escape(tag_text)}</text>' if tag_text else "")
+        + "</g></svg>"
+    )
+
+
+def write_hero(task: dict) -> Tuple[str, str, bool]:
+    """Worker: render one task; returns (slug, url, written)."""
+    slug = task.get("slug") or slugify(task.get("title", ""))
+    svg = render_svg(task).encode("utf-8")
+    digest = hashlib.sha1(svg).hexdigest()[:10]
+    dest = OUT_DIR / f"{slug}.{digest}.svg"
+    written = False
+    if not dest.exists():
+        # Atomic, so an interrupted run never leaves a truncated file under a valid hash
+        write_bytes(dest, svg, sync_dir=False)
+        written = True
+    return slug, f"{OUT_URL}/{dest.name}", written
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate hashed hero SVGs for encyclopedia tasks")
+    ap.add_argument("--tasks", nargs="+", default=[str(TASKS_FILE)], help="task JSON files")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    ap.add_argument("--prune", action="store_true", help="delete superseded hashed files")
+    args = ap.parse_args()
+
+    tasks = []
+    for path in args.tasks:
+        with open(path, "r", encoding="utf-8") as f:
+            tasks.extend(t for t in json.load(f) if t.get("title"))
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    index: Dict[str, str] = {}
+    if INDEX_FILE.exists():
+        with INDEX_FILE.open("r", encoding="utf-8") as f:
+            index = json.load(f)
+
+    written = 0
+    with ProcessPoolExecutor(max_workers=args.workers or None) as pool:
+        for slug, url, was_written in pool.map(write_hero, tasks, chunksize=64):
+            index[slug] = url
+            written += was_written
+    if written:
+        sync_dirs([OUT_DIR])
+
+    if args.prune:
+        live = {url.rsplit("/", 1)[-1] for url in index.values()}
+        stale = [p for p in OUT_DIR.glob("*.svg") if p.name not in live]
+        for p in stale:
+            p.unlink()
+        print(f"Pruned {len(stale)} superseded files")
+
+    text = json.dumps(dict(sorted(index.items())), indent=2)
+    if not INDEX_FILE.exists() or INDEX_FILE.read_text(encoding="utf-8") != text:
+        write_text(INDEX_FILE, text)
+        print(f"Updated index: {INDEX_FILE.relative_to(ROOT)}")
+    print(f"Done. {len(tasks)} heroes, {written} written, {len(tasks) - written} unchanged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Indexed store for encyclopedia page images.
+
+The store is an append-only JSON Lines log (assets/data/encyclopedia-images.jsonl):
+
+  {"schema": "encyclopedia-images", "version": 1}             header, first line
+  {"page": slug, "category": str|null, "images": [...]}       upsert a page
+  {"page": slug, "deleted": true}                             drop a page
+  {"exported": sha1}                                          hash of last JSON export
+
+Later records win. Loading replays the log into a page -> images map plus a
+category index and a reverse URL -> pages index, so lookups are dict hits.
+Updates append one line per touched page instead of rewriting the file; the
+log is compacted once superseded records outnumber live pages.
+
+assets/data/encyclopedia-images.json stays the browser-facing copy and is
+written by export_json(). Loading never writes: if that file was edited by
+hand since the last export, load() leaves the log as it is, the CLI warns,
+and export_json() refuses to overwrite the edits until `import` has folded
+them back into the log, so the two never silently diverge.
+
+CLI (from repo root):
+  python3 scripts/image_manifest.py import     # rebuild the log from the JSON export
+  python3 scripts/image_manifest.py export     # write the JSON export
+  python3 scripts/image_manifest.py compact
+  python3 scripts/image_manifest.py page SLUG | category NAME | url SRC
+"""
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from atomic_write import write_text
+
+ROOT = Path(__file__).resolve().parents[1]
+STORE_FILE = ROOT / "assets" / "data" / "encyclopedia-images.jsonl"
+MANIFEST_FILE = ROOT / "assets" / "data" / "encyclopedia-images.json"
+TASKS_GLOB = "agents/encyclopedia/tasks*.json"
+
+SCHEMA = "encyclopedia-images"
+SCHEMA_VERSION = 1
+# Image fields that reference a fetchable URL and feed the reverse index
+URL_FIELDS = ("src", "source_url", "fallback_src", "fallback2_src")
+
+
+def slugify(title: str) -> str:
+    """Page slug for a title; the encyclopedia agent names its pages with this."""
+    return title.lower().replace(" ", "-").replace("/", "-")
+
+
+def task_slug(task: dict) -> str:
+    return task.get("slug") or slugify(task["title"])
+
+
+def load_task_categories() -> Dict[str, str]:
+    """slug -> category from every task file the encyclopedia agent has run."""
+    categories: Dict[str, str] = {}
+    for path in sorted(ROOT.glob(TASKS_GLOB)):
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                tasks = json.load(f)
+        except Exception:
+            continue
+        for task in tasks if isinstance(tasks, list) else []:
+            if isinstance(task, dict) and task.get("title") and task.get("category"):
+                categories.setdefault(task_slug(task), task["category"])
+    return categories
+
+
+def normalize_images(meta) -> list:
+    # The JSON export historically allowed a bare image object per page
+    if isinstance(meta, dict) and isinstance(meta.get("images"), list):
+        return meta["images"]
+    return [meta] if isinstance(meta, dict) else []
+
+
+def sha1_file(path: Path) -> str:
+    try:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+    except OSError:
+        return ""
+
+
+class ImageManifest:
+    def __init__(self, path: Path = STORE_FILE, export_path: Path = MANIFEST_FILE):
+        self.path = Path(path)
+        self.export_path = Path(export_path)
+        self._pages: Dict[str, dict] = {}
+        self._by_category: Dict[str, Set[str]] = {}
+        self._by_url: Dict[str, Set[str]] = {}
+        self._keys: Dict[str, list] = {}
+        self._pending: Dict[str, dict] = {}
+        self._records = 0
+        self._exported = ""
+
+    # --- loading ---
+
+    @classmethod
+    def load(cls, path: Path = STORE_FILE, export_path: Path = MANIFEST_FILE) -> "ImageManifest":
+        store = cls(path, export_path)
+        if store.path.exists():
+            store._replay()
+        return store
+
+    @property
+    def export_stale(self) -> bool:
+        """True if the JSON export changed since this store last wrote it."""
+        return self.export_path.exists() and sha1_file(self.export_path) != self._exported
+
+    def _replay(self) -> None:
+        with self.path.open("r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("schema") != SCHEMA or header.get("version") != SCHEMA_VERSION:
+                raise ValueError(f"{self.path}: unsupported manifest schema {header}")
+            for line in f:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if "exported" in rec:
+                    self._exported = rec["exported"]
+                    continue
+                self._records += 1
+                if rec.get("deleted"):
+                    self._apply_delete(rec["page"])
+                else:
+                    self._apply_put(rec["page"], rec.get("images", []), rec.get("category"))
+
+    def import_json(self, path: Optional[Path] = None) -> None:
+        """Replace the store contents with a JSON export and rewrite the log."""
+        src = Path(path) if path else self.export_path
+        with src.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        categories = load_task_categories()
+        previous = {slug: page.get("category") for slug, page in self._pages.items()}
+        self._pages.clear()
+        self._by_category.clear()
+        self._by_url.clear()
+        self._keys.clear()
+        for slug, meta in data.items():
+            category = previous.get(slug) or categories.get(slug)
+            self._apply_put(slug, normalize_images(meta), category)
+        self._exported = sha1_file(src)
+        self.compact()
+
+    # --- index maintenance ---
+
+    def _index(self, slug: str, page: dict) -> None:
+        # Remember exactly what was indexed: image dicts may be edited in place
+        # before touch(), so the old keys can't be recomputed from the page
+        keys: List[Tuple[Dict[str, Set[str]], str]] = []
+        if page.get("category"):
+            keys.append((self._by_category, page["category"]))
+        for img in page["images"]:
+            for field in URL_FIELDS:
+                if img.get(field):
+                    keys.append((self._by_url, img[field]))
+        for index, key in keys:
+            index.setdefault(key, set()).add(slug)
+        self._keys[slug] = keys
+
+    def _unindex(self, slug: str) -> None:
+        for index, key in self._keys.pop(slug, ()):
+            if key in index:
+                index[key].discard(slug)
+                if not index[key]:
+                    del index[key]
+
+    def _apply_put(self, slug: str, images: list, category: Optional[str]) -> dict:
+        self._unindex(slug)
+        page = {"category": category, "images": images}
+        self._pages[slug] = page
+        self._index(slug, page)
+        return page
+
+    def _apply_delete(self, slug: str) -> None:
+        self._pages.pop(slug, None)
+        self._unindex(slug)
+
+    # --- lookups ---
+
+    def __contains__(self, slug: str) -> bool:
+        return slug in self._pages
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def slugs(self) -> List[str]:
+        return list(self._pages)
+
+    def items(self) -> Iterator[Tuple[str, list]]:
+        for slug, page in self._pages.items():
+            yield slug, page["images"]
+
+    def images(self, slug: str) -> list:
+        page = self._pages.get(slug)
+        return page["images"] if page else []
+
+    def category(self, slug: str) -> Optional[str]:
+        page = self._pages.get(slug)
+        return page["category"] if page else None
+
+    def categories(self) -> List[str]:
+        return sorted(self._by_category)
+
+    def pages_in_category(self, category: str) -> Set[str]:
+        return set(self._by_category.get(category, ()))
+
+    def pages_using(self, url: str) -> Set[str]:
+        return set(self._by_url.get(url, ()))
+
+    def pages_with(self, url: str, field: str = "src") -> Set[str]:
+        """Pages with an image whose `field` (not just any URL field) equals url."""
+        return {
+            slug for slug in self._by_url.get(url, ())
+            if any(img.get(field) == url for img in self._pages[slug]["images"])
+        }
+
+    def urls(self) -> List[str]:
+        return list(self._by_url)
+
+    # --- updates ---
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    def put(self, slug: str, images: list, category: Optional[str] = None) -> None:
+        """Insert or replace a page. Keeps the known category unless one is given."""
+        if category is None:
+            category = self.category(slug)
+        page = self._apply_put(slug, images, category)
+        self._pending[slug] = {"page": slug, "category": page["category"], "images": images}
+
+    def touch(self, slug: str) -> None:
+        """Re-index and persist a page whose image dicts were edited in place."""
+        if slug in self._pages:
+            self.put(slug, self._pages[slug]["images"])
+
+    def remove(self, slug: str) -> None:
+        if slug in self._pages:
+            self._apply_delete(slug)
+            self._pending[slug] = {"page": slug, "deleted": True}
+
+    def replace_url(self, old: str, new: str, field: str = "src") -> Set[str]:
+        """Point every image whose `field` equals old at new; returns touched pages."""
+        touched = self.pages_with(old, field)
+        for slug in touched:
+            for img in self._pages[slug]["images"]:
+                if img.get(field) == old:
+                    img[field] = new
+            self.touch(slug)
+        return touched
+
+    # --- persistence ---
+
+    def flush(self) -> None:
+        """Append pending page records to the log."""
+        if not self._pending:
+            return
+        if not self.path.exists():
+            self.compact()
+            return
+        with self.path.open("a", encoding="utf-8") as f:
+            for rec in self._pending.values():
+                f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._records += len(self._pending)
+        self._pending.clear()
+        if self._records > 2 * max(len(self._pages), 1):
+            self.compact()
+
+    def compact(self) -> None:
+        """Rewrite the log with exactly one record per live page."""
+        lines = [json.dumps({"schema": SCHEMA, "version": SCHEMA_VERSION})]
+        for slug, page in self._pages.items():
+            rec = {"page": slug, "category": page["category"], "images": page["images"]}
+            lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+        if self._exported:
+            lines.append(json.dumps({"exported": self._exported}))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_text(self.path, "\n".join(lines) + "\n")
+        self._records = len(self._pages)
+        self._pending.clear()
+
+    def to_dict(self) -> Dict[str, dict]:
+        return {slug: {"images": page["images"]} for slug, page in self._pages.items()}
+
+    def export_json(self, path: Optional[Path] = None) -> bool:
+        """Write the browser-facing JSON copy; returns False if it was already current."""
+        dest = Path(path) if path else self.export_path
+        if dest == self.export_path and self.export_stale:
+            raise ValueError(f"{dest} was edited since the last export; "
+                             "run `python3 scripts/image_manifest.py import` first")
+        text = json.dumps(self.to_dict(), indent=2)
+        if dest.exists() and dest.read_text(encoding="utf-8") == text:
+            return False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        write_text(dest, text)
+        if dest == self.export_path:
+            self._exported = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            self.flush()
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps({"exported": self._exported}) + "\n")
+        return True
+
+    def save(self) -> None:
+        """Persist pending updates and refresh the JSON export."""
+        self.flush()
+        self.export_json()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Encyclopedia image manifest store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("import", help="rebuild the store from the JSON export")
+    sub.add_parser("export", help="write the browser-facing JSON export")
+    sub.add_parser("compact", help="rewrite the log with one record per page")
+    sub.add_parser("stats", help="summarize pages, categories and URLs")
+    for name, metavar in (("page", "SLUG"), ("category", "NAME"), ("url", "SRC")):
+        sub.add_parser(name).add_argument("key", metavar=metavar)
+    args = ap.parse_args()
+
+    if args.cmd == "import":
+        store = ImageManifest(STORE_FILE, MANIFEST_FILE)
+        store.import_json()
+        print(f"Imported {len(store)} pages into {STORE_FILE.relative_to(ROOT)}")
+        return 0
+
+    store = ImageManifest.load()
+    if store.export_stale:
+        print(f"Warning: {MANIFEST_FILE.relative_to(ROOT)} was edited since the last export; "
+              "run `import` to load the edits", file=sys.stderr)
+    if args.cmd == "export":
+        try:
+            wrote = store.export_json()
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"{'Wrote' if wrote else 'Up to date'}: {MANIFEST_FILE.relative_to(ROOT)}")
+    elif args.cmd == "compact":
+        store.compact()
+        print(f"Compacted {len(store)} pages")
+    elif args.cmd == "stats":
+        print(f"Pages: {len(store)}")
+        print(f"Distinct URLs: {len(store.urls())}")
+        for cat in store.categories():
+            print(f"  {cat}: {len(store.pages_in_category(cat))}")
+    elif args.cmd == "page":
+        print(json.dumps({"category": store.category(args.key), "images": store.images(args.key)}, indent=2))
+    elif args.cmd == "category":
+        print("\n".join(sorted(store.pages_in_category(args.key))))
+    elif args.cmd == "url":
+        print("\n".join(sorted(store.pages_using(args.key))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Unified encyclopedia image pipeline.
+
+Stages, in order:
+  select   - give pages without a manifest entry their category's images
+  fetch    - cache remote Wikimedia images locally (see cache_cc_images.py)
+  dedupe   - collapse byte-identical cached files and repeated placements
+  optimize - responsive/WebP variants and dimensions (see optimize_images.py)
+  inject   - rewrite cached URLs, drop adjacent duplicate figures and insert
+             manifest figures (see add_encyclopedia_images.py)
+  verify   - report missing local files, remaining remote URLs and pages
+
+All stages share one in-memory manifest (image_manifest.ImageManifest).
+Each stage fingerprints its inputs and is skipped when they match the
+previous run; fingerprints live in .build/image-pipeline.json. The manifest
+store and its JSON export, every page and the state file are each written
+at most once per run.
+
+This replaces running generate_encyclopedia_images.py, cache_cc_images.py,
+optimize_images.py, add_encyclopedia_images.py and verify_images.py by hand.
+
+Run from repo root:
+  python3 scripts/image_pipeline.py                       # run dirty stages
+  python3 scripts/image_pipeline.py --only optimize,inject
+  python3 scripts/image_pipeline.py --force inject        # ignore fingerprints
+  python3 scripts/image_pipeline.py --dry-run             # diff, write nothing
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import add_encyclopedia_images as injector
+import cache_cc_images as cache
+import generate_encyclopedia_images as selector
+import optimize_images as optimizer
+import verify_images as verifier
+from atomic_write import sync_dirs, write_text
+from image_manifest import ImageManifest, task_slug
+
+ROOT = Path(__file__).resolve().parents[1]
+ENC_DIR = ROOT / "encyclopedia"
+TASKS_FILE = ROOT / "agents" / "encyclopedia" / "tasks.complete-2000.json"
+STATE_FILE = ROOT / ".build" / "image-pipeline.json"
+CACHE_DIR = ROOT / "assets" / "images" / "encyclopedia" / "_cache"
+CACHE_URL = "/assets/images/encyclopedia/_cache"
+
+STAGES = ("select", "fetch", "dedupe", "optimize", "inject", "verify")
+# Bump when stage logic changes so stale fingerprints are not trusted
+PIPELINE_VERSION = 1
+
+FIGURE_RE = re.compile(r'<figure class="concept-visual">.*?</figure>', re.DOTALL)
+IMG_SRC_RE = re.compile(r'<img[^>]+src="([^"]+)"', re.IGNORECASE)
+
+
+def digest(*parts) -> str:
+    raw = json.dumps([PIPELINE_VERSION, *parts], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: Path) -> str:
+    try:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+    except OSError:
+        return ""
+
+
+def load_json(path: Path, default):
+    if not path.exists():
+        return default
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_json(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_text(path, json.dumps(data, indent=2))
+
+
+def local_file(src: str) -> Optional[Path]:
+    return ROOT / src.lstrip("/") if src.startswith("/") else None
+
+
+def collapse_adjacent_figures(html: str) -> str:
+    """Keep one figure from each run of back-to-back concept-visual figures.
+
+    Prefers the first figure whose image resolves (remote, or present on
+    disk), so a stale agent-generated placeholder loses to a real image.
+    """
+    out = []
+    last = 0
+    matches = list(FIGURE_RE.finditer(html))
+    i = 0
+    while i < len(matches):
+        run = [matches[i]]
+        while i + 1 < len(matches) and matches[i + 1].start() == run[-1].end():
+            i += 1
+            run.append(matches[i])
+        i += 1
+        if len(run) == 1:
+            continue
+
+        def resolves(m) -> bool:
+            src = IMG_SRC_RE.search(m.group(0))
+            path = local_file(src.group(1)) if src else None
+            return path is None or path.exists()
+
+        keep = next((m for m in run if resolves(m)), run[0])
+        out.append(html[last:run[0].start()])
+        out.append(keep.group(0))
+        last = run[-1].end()
+    out.append(html[last:])
+    return "".join(out)
+
+
+def transform_page(job: Tuple[str, str, str, list, Dict[str, str], bool]) -> Tuple[str, str, str]:
+    """Worker: apply URL rewrites, figure dedupe and injection to one page, write once."""
+    slug, page_path, html, images, url_map, dry_run = job
+    try:
+        new_html = html
+        for old, new in url_map.items():
+            if old in new_html:
+                new_html = new_html.replace(old, new)
+        new_html = collapse_adjacent_figures(new_html)
+        new_html = injector.splice(new_html, injector.plan_insertions(new_html, slug, images))
+        new_html = injector.upgrade_images(new_html, images)
+        if new_html == html:
+            return slug, "unchanged", digest(html)
+        if dry_run:
+            diff = difflib.unified_diff(
+                html.splitlines(keepends=True),
+                new_html.splitlines(keepends=True),
+                fromfile=f"a/encyclopedia/{slug}.html",
+                tofile=f"b/encyclopedia/{slug}.html",
+            )
+            return slug, "updated", "".join(diff)
+        write_text(page_path, new_html, sync_dir=False)
+        return slug, "updated", digest(new_html)
+    except Exception as e:
+        return slug, "error", str(e)
+
+
+class ImagePipeline:
+    def __init__(self, force: set, dry_run: bool = False, workers: int = 0, check_remote: bool = False):
+        self.force = force
+        self.dry_run = dry_run
+        self.workers = workers or None
+        self.check_remote = check_remote
+        self.store = ImageManifest.load()
+        self.state = load_json(STATE_FILE, {})
+        self.state.setdefault("stages", {})
+        self.state.setdefault("pages", {})
+        # old src -> replacement src, applied to pages during inject
+        self.url_map: Dict[str, str] = self.state.setdefault("urls", {})
+        self._pages: Dict[str, str] = {}
+
+    # --- shared model helpers ---
+
+    def page_slugs(self) -> List[str]:
+        return sorted(p.stem for p in ENC_DIR.glob("*.html") if p.name != "index.html")
+
+    def page_html(self, slug: str) -> str:
+        if slug not in self._pages:
+            path = ENC_DIR / f"{slug}.html"
+            self._pages[slug] = path.read_text(encoding="utf-8", errors="ignore")
+        return self._pages[slug]
+
+    def images(self):
+        for slug, images in self.store.items():
+            for img in images:
+                yield slug, img
+
+    def manifest(self) -> Dict[str, dict]:
+        return {slug: {"category": self.store.category(slug), "images": images} for slug, images in self.store.items()}
+
+    def replace_src(self, old: str, new: str) -> None:
+        if old == new:
+            return
+        self.store.replace_url(old, new)
+        # Chain earlier rewrites through so pages converge in one pass
+        for key, value in self.url_map.items():
+            if value == old:
+                self.url_map[key] = new
+        self.url_map[old] = new
+
+    def run_stage(self, name: str, fingerprint: Callable[[], str], action: Callable[[], None]) -> None:
+        if name not in self.force and self.state["stages"].get(name) == fingerprint():
+            print(f"[{name}] up to date")
+            return
+        print(f"[{name}] running")
+        action()
+        # Record post-run inputs so an idempotent stage is clean next time
+        self.state["stages"][name] = fingerprint()
+
+    # --- stages ---
+
+    def fp_select(self) -> str:
+        return digest(self.page_slugs(), file_digest(TASKS_FILE), sorted(self.store.slugs()))
+
+    def select(self) -> None:
+        if not TASKS_FILE.exists():
+            print(f"  tasks not found: {TASKS_FILE}")
+            return
+        with TASKS_FILE.open("r", encoding="utf-8") as f:
+            tasks = json.load(f)
+        task_by_slug = {task_slug(task): task for task in tasks if task.get("title")}
+        added = 0
+        for slug in self.page_slugs():
+            task = task_by_slug.get(slug)
+            if slug in self.store or not task:
+                continue
+            category = task.get("category", "General")
+            images = []
+            for img in selector.get_images_for_category(category):
+                custom = dict(img)
+                if "hero" in img.get("placement", ""):
+                    custom["alt"] = f"{task['title']} conceptual visualization"
+                images.append(custom)
+            self.store.put(slug, images, category)
+            added += 1
+        print(f"  selected images for {added} new pages")
+
+    def remote_srcs(self) -> List[str]:
+        urls = {u for u in self.store.urls() if self.store.pages_with(u)}
+        for slug in self.page_slugs():
+            urls.update(cache.find_img_srcs(self.page_html(slug)))
+        return sorted(u for u in urls if cache.is_wikimedia(u) and u not in self.url_map)
+
+    def fp_fetch(self) -> str:
+        return digest(self.remote_srcs())
+
+    def fetch(self) -> None:
+        urls = self.remote_srcs()
+        if self.dry_run:
+            print(f"  would fetch {len(urls)} remote images")
+            return
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fetched = 0
+        for url in urls:
+            local = cache.download_with_fallbacks(url, CACHE_DIR)
+            if not local:
+                continue
+            for slug in self.store.pages_with(url):
+                for img in self.store.images(slug):
+                    if img.get("src") == url:
+                        img["source_url"] = url
+            self.replace_src(url, f"{CACHE_URL}/{local.name}")
+            fetched += 1
+        print(f"  cached {fetched}/{len(urls)} remote images")
+
+    def local_srcs(self) -> List[str]:
+        srcs = [u for u in self.store.urls() if u.startswith(CACHE_URL + "/")]
+        return sorted(s for s in srcs if self.store.pages_with(s))
+
+    def fp_dedupe(self) -> str:
+        entries = {slug: [(i.get("placement"), i.get("heading"), i.get("src")) for i in images]
+                   for slug, images in self.store.items()}
+        return digest(entries, {s: file_digest(local_file(s)) for s in self.local_srcs()})
+
+    def dedupe(self) -> None:
+        by_hash: Dict[str, List[str]] = {}
+        for src in self.local_srcs():
+            h = file_digest(local_file(src))
+            if h:
+                by_hash.setdefault(h, []).append(src)
+        collapsed = 0
+        for srcs in by_hash.values():
+            canonical = srcs[0]
+            for dup in srcs[1:]:
+                self.replace_src(dup, canonical)
+                collapsed += 1
+        dropped = 0
+        for slug, images in list(self.store.items()):
+            seen = set()
+            kept = []
+            for img in images:
+                key = (img.get("placement"), img.get("heading"), img.get("src"))
+                if key in seen:
+                    dropped += 1
+                    continue
+                seen.add(key)
+                kept.append(img)
+            if len(kept) != len(images):
+                self.store.put(slug, kept)
+        print(f"  collapsed {collapsed} duplicate files, dropped {dropped} repeated placements")
+
+    def fp_optimize(self) -> str:
+        srcs = sorted(u for u in self.store.urls() if self.store.pages_with(u))
+        sources = {s: file_digest(p) for s in srcs for p in [optimizer.local_source(s)] if p is not None}
+        return digest(sources, optimizer.WIDTHS)
+
+    def optimize(self) -> None:
+        if optimizer.Image is None:
+            print("  Pillow is required for optimize: pip install Pillow")
+            return
+        if self.dry_run:
+            print("  would refresh optimized variants")
+            return
+        done = optimizer.optimize_store(self.store)
+        print(f"  optimized {done} source images")
+
+    def page_key(self, slug: str) -> str:
+        return digest(self.store.images(slug), self.url_map, digest(self.page_html(slug)))
+
+    def fp_inject(self) -> str:
+        return digest({slug: self.page_key(slug) for slug in self.page_slugs()})
+
+    def inject(self) -> None:
+        jobs = []
+        for slug in self.page_slugs():
+            if "inject" not in self.force and self.state["pages"].get(slug) == self.page_key(slug):
+                continue
+            jobs.append((slug, str(ENC_DIR / f"{slug}.html"), self.page_html(slug),
+                         self.store.images(slug), self.url_map, self.dry_run))
+        updated = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for slug, status, detail in pool.map(transform_page, jobs, chunksize=16):
+                if status == "error":
+                    print(f"  error updating {slug}: {detail}")
+                    continue
+                if status == "updated":
+                    updated += 1
+                    if self.dry_run:
+                        sys.stdout.write(detail)
+                        continue
+                    print(f"  updated: {slug}")
+                    self._pages.pop(slug, None)
+                # detail is the digest of the page as it now stands on disk
+                self.state["pages"][slug] = digest(self.store.images(slug), self.url_map, detail)
+        if updated and not self.dry_run:
+            sync_dirs([ENC_DIR])
+        print(f"  {len(jobs)} pages considered, {updated} updated")
+
+    def fp_verify(self) -> str:
+        present = [bool(p and p.exists()) for _slug, img in self.images() for p in [local_file(img.get("src", ""))]]
+        return digest(self.manifest(), present, self.check_remote)
+
+    def verify(self) -> None:
+        missing_pages = [slug for slug in self.store.slugs() if not (ENC_DIR / f"{slug}.html").exists()]
+        missing_files = set()
+        remote = set()
+        for _slug, img in self.images():
+            src = img.get("src", "")
+            path = local_file(src)
+            if path is not None:
+                if not path.exists():
+                    missing_files.add(src)
+            elif src:
+                remote.add(src)
+        for slug in missing_pages:
+            print(f"  manifest entry without page: {slug}")
+        for src in sorted(missing_files):
+            print(f"  missing local file: {src}")
+        broken = 0
+        for src in sorted(remote):
+            if self.check_remote:
+                ok, msg = verifier.check_url(src)
+                if not ok:
+                    broken += 1
+                    print(f"  broken remote image: {src} - {msg}")
+            else:
+                print(f"  remote image (not cached): {src}")
+        print(f"  {len(missing_files)} missing files, {len(remote)} remote images, {broken} broken")
+
+    # --- driver ---
+
+    def run(self, only: Optional[set] = None) -> None:
+        plan = [
+            ("select", self.fp_select, self.select),
+            ("fetch", self.fp_fetch, self.fetch),
+            ("dedupe", self.fp_dedupe, self.dedupe),
+            ("optimize", self.fp_optimize, self.optimize),
+            ("inject", self.fp_inject, self.inject),
+            ("verify", self.fp_verify, self.verify),
+        ]
+        for name, fingerprint, action in plan:
+            if only and name not in only:
+                continue
+            self.run_stage(name, fingerprint, action)
+
+        if self.dry_run:
+            print("Dry run: nothing written")
+            return
+        if self.store.dirty:
+            self.store.save()
+            print(f"Wrote manifest: {self.store.export_path.relative_to(ROOT)}")
+        write_json(STATE_FILE, self.state)
+
+
+def parse_stage_list(value: str) -> set:
+    names = {v.strip() for v in value.split(",") if v.strip()}
+    unknown = names - set(STAGES) - {"all"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown stage(s): {', '.join(sorted(unknown))}")
+    return set(STAGES) if "all" in names else names
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Encyclopedia image pipeline: " + " -> ".join(STAGES))
+    ap.add_argument("--only", type=parse_stage_list, default=None, help="comma-separated stages to run")
+    ap.add_argument("--force", type=parse_stage_list, default=set(), help="comma-separated stages (or 'all') to rerun")
+    ap.add_argument("--dry-run", action="store_true", help="print page diffs, write nothing")
+    ap.add_argument("--check-remote", action="store_true", help="HEAD-check remote images during verify")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size for inject (default: CPU count)")
+    args = ap.parse_args()
+
+    pipeline = ImagePipeline(args.force, dry_run=args.dry_run, workers=args.workers, check_remote=args.check_remote)
+    pipeline.run(args.only)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
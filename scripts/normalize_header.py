@@ -8,54 +8,69 @@ Actions per file:
   - Ensure <div id="footer-placeholder"></div> before </body>
   - Ensure <script src="/assets/js/main.js"></script> is included before </body>
 
-Run from repo root: python3 scripts/normalize_header.py
+All edits are made in a single regex pass per page, and pages are processed
+in parallel (see file_transform.py).
+
+Run from repo root: python3 scripts/normalize_header.py [--workers N]
 """
 
-from pathlib import Path
+import argparse
 import re
+from pathlib import Path
+
+from atomic_write import write_text
+from file_transform import run_transform
 
 ROOT = Path(__file__).resolve().parents[1]
 
-def normalize_html(path: Path) -> bool:
-    text = path.read_text(encoding='utf-8', errors='ignore')
-    original = text
-
-    # Remove any existing inline site header block to avoid duplicates
-    text = re.sub(
-        r"<header[^>]*class=\"site-header\"[\s\S]*?</header>",
-        "",
-        text,
-        flags=re.IGNORECASE,
-    )
-
-    # Ensure header + banner placeholders after <body>
-    if 'id="header-placeholder"' not in text:
-        m = re.search(r"<body[^>]*>", text, flags=re.IGNORECASE)
-        if m:
-            insert_pos = m.end()
-            inject = "\n  <div id=\"header-placeholder\"></div>\n  <div id=\"sitewide-banner-placeholder\"></div>\n"
-            text = text[:insert_pos] + inject + text[insert_pos:]
-
-    # Ensure footer placeholder before </body>
+HEADER_PLACEHOLDERS = "\n  <div id=\"header-placeholder\"></div>\n  <div id=\"sitewide-banner-placeholder\"></div>\n"
+FOOTER_PLACEHOLDER = "  \n  <div id=\"footer-placeholder\"></div>\n"
+MAIN_JS = "  \n  <script src=\"/assets/js/main.js\"></script>\n"
+# main.js, possibly fingerprinted by fingerprint_assets.py
+MAIN_JS_RE = re.compile(r"/assets/(?:dist/assets/)?js/main(?:\.[0-9a-f]{10})?\.js")
+
+# One pass over the page for all edits. Every alternative starts with "<" so
+# the regex engine can skip ahead to candidate tags:
+#   header - an inline site header block, removed to avoid duplicates
+#            (but not the one expand_includes.py inlined into the placeholder)
+#   body   - the first <body> tag, followed by the header + banner placeholders
+#   </body> - preceded by the footer placeholder and main.js loader
+NORMALIZE_RE = re.compile(
+    r"<(?:(?P<header>(?<!data-include-hash=\"[0-9a-f]{12}\"><)header[^>]*class=\"site-header\"[\s\S]*?</header>)"
+    r"|(?P<body>body[^>]*>)"
+    r"|/body>)",
+    re.IGNORECASE,
+)
+
+def normalize_text(text: str) -> str:
+    need_header = 'id="header-placeholder"' not in text
+    before_end = ""
     if 'id="footer-placeholder"' not in text:
-        text = re.sub(
-            r"</body>",
-            "  \n  <div id=\"footer-placeholder\"></div>\n</body>",
-            text,
-            flags=re.IGNORECASE,
-        )
-
-    # Ensure main.js loader present
-    if '/assets/js/main.js' not in text:
-        text = re.sub(
-            r"</body>",
-            "  \n  <script src=\"/assets/js/main.js\"></script>\n</body>",
-            text,
-            flags=re.IGNORECASE,
-        )
+        before_end += FOOTER_PLACEHOLDER
+    if not MAIN_JS_RE.search(text):
+        before_end += MAIN_JS
+
+    def replace(m: re.Match) -> str:
+        nonlocal need_header
+        if m.group("header") is not None:
+            return ""
+        if m.group("body") is not None:
+            if need_header:
+                need_header = False
+                return m.group(0) + HEADER_PLACEHOLDERS
+            return m.group(0)
+        return before_end + "</body>" if before_end else m.group(0)
 
+    return NORMALIZE_RE.sub(replace, text)
+
+def normalize_page(path: Path, text: str) -> str:
+    return normalize_text(text)
+
+def normalize_html(path: Path) -> bool:
+    original = path.read_text(encoding='utf-8', errors='ignore')
+    text = normalize_text(original)
     if text != original:
-        path.write_text(text, encoding='utf-8')
+        write_text(path, text)
         return True
     return False
 
@@ -67,25 +82,25 @@ def should_skip(path: Path) -> bool:
         '/tools/',
         '/scripts/',
         '/assets/',
+        '/backups/',
         'test-styling.html',
     ]
     return any(s in p for s in skip_parts)
 
+def report(path: Path, status: str, detail: str) -> None:
+    if status == "updated":
+        print(f"normalized: {path.relative_to(ROOT)}")
+    elif status == "error":
+        print(f"error: {path} -> {detail}")
+
 def main():
-    html_files = sorted(ROOT.glob('**/*.html'))
-    changed = 0
-    for f in html_files:
-        if should_skip(f):
-            continue
-        try:
-            if normalize_html(f):
-                changed += 1
-                print(f"normalized: {f.relative_to(ROOT)}")
-        except Exception as e:
-            print(f"error: {f} -> {e}")
-    print(f"Done. Changed {changed} files.")
+    ap = argparse.ArgumentParser(description="Normalize pages to the shared header/footer includes")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
+    html_files = [f for f in sorted(ROOT.glob('**/*.html')) if not should_skip(f)]
+    counts = run_transform(html_files, normalize_page, report=report, workers=args.workers)
+    print(f"Done. Changed {counts['updated']} files.")
 
 if __name__ == '__main__':
     main()
-
-
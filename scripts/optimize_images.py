@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Optimize locally cached encyclopedia images. Run after cache_cc_images.py.
+
+For every local raster image referenced by the image manifest:
+  - Write resized variants at fixed widths (never upscaled) in the original format
+  - Write WebP variants at the same widths
+  - Record intrinsic width/height and the variant list on each manifest image
+    (see image_manifest.py; the JSON export is refreshed afterwards)
+
+add_encyclopedia_images.py turns the recorded variants into srcset/sizes and
+width/height attributes so browsers reserve layout space and pick the
+smallest adequate file.
+
+Variants are only re-encoded when missing or older than their source (use
+--force to rebuild everything). SVG and GIF sources are left untouched.
+
+Run from repo root: python3 scripts/optimize_images.py [--force]
+"""
+import argparse
+import hashlib
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+try:
+    from PIL import Image
+except Exception:  # pragma: no cover
+    Image = None  # type: ignore
+
+from image_manifest import ImageManifest
+
+ROOT = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT / "assets" / "images" / "encyclopedia" / "_optimized"
+OUT_URL = "/assets/images/encyclopedia/_optimized"
+
+# Widths chosen around the reading column (~800px) at 1x and 1.5x densities
+WIDTHS = (480, 800, 1200)
+RASTER_EXTS = {".png", ".jpg", ".jpeg"}
+MIME_TYPES = {
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def local_source(src: str) -> Optional[Path]:
+    """Map a site-absolute /assets/... src to a raster file on disk, if any."""
+    if not src.startswith("/assets/"):
+        return None
+    path = ROOT / src.lstrip("/")
+    if path.suffix.lower() not in RASTER_EXTS or not path.exists():
+        return None
+    return path
+
+
+def target_widths(width: int) -> List[int]:
+    """Fixed widths below the intrinsic width, plus the (capped) intrinsic width."""
+    widths = {w for w in WIDTHS if w < width}
+    widths.add(min(width, WIDTHS[-1]))
+    return sorted(widths)
+
+
+def variant_name(source: Path, width: int, ext: str) -> str:
+    """Variant file name; the hash of the source's path keeps same-named sources
+    (other directories, or .png next to .jpg) from sharing variants."""
+    tag = hashlib.sha1(source.relative_to(ROOT).as_posix().encode("utf-8")).hexdigest()[:8]
+    return f"{source.stem}-{tag}-{width}w{ext}"
+
+
+def working_mode(im) -> str:
+    # Encoders take RGB/RGBA; keep an alpha channel only where the source has one
+    return "RGBA" if "A" in im.mode or "transparency" in im.info else "RGB"
+
+
+def is_fresh(dest: Path, source: Path) -> bool:
+    return dest.exists() and dest.stat().st_mtime >= source.stat().st_mtime
+
+
+def save_variant(img, dest: Path, ext: str) -> None:
+    if ext == ".webp":
+        img.save(dest, "WEBP", quality=WEBP_QUALITY, method=6)
+    elif ext in (".jpg", ".jpeg"):
+        img.convert("RGB").save(dest, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        img.save(dest, "PNG", optimize=True)
+
+
+def optimize_image(source: Path, force: bool = False) -> Dict:
+    """Write all variants for one source image and return its manifest metadata."""
+    ext = source.suffix.lower()
+    variants = []
+    with Image.open(source) as im:
+        im.load()
+        width, height = im.size
+        # Palette, grayscale and CMYK sources resample poorly or can't be written
+        # as WebP; work in RGB(A) and let the encoders reduce
+        base = im if im.mode in ("RGB", "RGBA") else im.convert(working_mode(im))
+        for w in target_widths(width):
+            h = max(1, round(height * w / width))
+            resized = None
+            for out_ext in (".webp", ext):
+                dest = OUT_DIR / variant_name(source, w, out_ext)
+                if force or not is_fresh(dest, source):
+                    if resized is None:
+                        resized = base if w == width else base.resize((w, h), Image.LANCZOS)
+                    save_variant(resized, dest, out_ext)
+                    # Re-encoding a full-size original can grow it (e.g. palette PNGs)
+                    if w == width and out_ext == ext and dest.stat().st_size > source.stat().st_size:
+                        shutil.copyfile(source, dest)
+                variants.append({
+                    "src": f"{OUT_URL}/{dest.name}",
+                    "width": w,
+                    "type": MIME_TYPES[out_ext],
+                    "bytes": dest.stat().st_size,
+                })
+    return {"width": width, "height": height, "variants": variants}
+
+
+def optimize_store(store: ImageManifest, force: bool = False) -> int:
+    """Optimize every local source referenced by the store; returns sources optimized."""
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    # Many pages share the same cached file; encode each source once
+    optimized: Dict[str, Optional[Dict]] = {}
+    for slug, images in store.items():
+        for img in images:
+            src = img.get("src", "")
+            if src not in optimized:
+                source = local_source(src)
+                meta = None
+                if source is not None:
+                    try:
+                        meta = optimize_image(source, force=force)
+                        original = source.stat().st_size
+                        smallest = min(v["bytes"] for v in meta["variants"])
+                        print(f"Optimized: {src} ({meta['width']}x{meta['height']}, {original} -> {smallest} bytes smallest)")
+                    except Exception as e:
+                        print(f"WARN: failed to optimize {src}: {e}")
+                optimized[src] = meta
+            meta = optimized[src]
+            if meta is None:
+                continue
+            record = {
+                "width": meta["width"],
+                "height": meta["height"],
+                "variants": [{k: v[k] for k in ("src", "width", "type")} for v in meta["variants"]],
+            }
+            if any(img.get(k) != v for k, v in record.items()):
+                img.update(record)
+                store.touch(slug)
+    return sum(1 for m in optimized.values() if m)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate responsive/WebP variants for encyclopedia images")
+    ap.add_argument("--force", action="store_true", help="re-encode variants even if up to date")
+    args = ap.parse_args()
+
+    if Image is None:
+        print("Pillow is required: pip install Pillow")
+        return 1
+
+    store = ImageManifest.load()
+    done = optimize_store(store, force=args.force)
+    if store.dirty:
+        store.save()
+        print("Updated image manifest")
+    print(f"Done. Optimized {done} source images into {OUT_DIR.relative_to(ROOT)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
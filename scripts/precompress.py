@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Write precompressed .gz and .br siblings for the site's text assets.
+
+Every served .html, .css, .js, .json and .svg file gets page.html.gz (gzip
+level 9, zeroed header mtime so output is reproducible) and page.html.br
+(Brotli quality 11, when the brotli package is installed). Hosts that serve
+precompressed variants (nginx gzip_static/brotli_static, Caddy
+precompressed, most CDNs) can then send them with no per-request CPU cost.
+GitHub Pages compresses on its own and ignores these files.
+
+Work is incremental: a sibling is only rebuilt when missing or older than
+its source, and only kept when it is smaller than the source. Files are
+compressed in a process pool. A per-type size report is printed and
+written to .build/precompress-report.json.
+
+Run from repo root:
+  python3 scripts/precompress.py [--force] [--prune] [--workers N]
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except Exception:  # pragma: no cover
+    brotli = None  # type: ignore
+
+from atomic_write import sync_dirs, write_bytes, write_text
+
+ROOT = Path(__file__).resolve().parents[1]
+REPORT_FILE = ROOT / ".build" / "precompress-report.json"
+
+EXTENSIONS = (".html", ".css", ".js", ".json", ".svg")
+# Not served, or not worth the disk: build state, backups, tooling sources
+SKIP_DIRS = {".git", ".build", "node_modules", "backups", "scripts", "agents", "tools", "__pycache__"}
+# Below this, headers and framing eat most of the saving
+MIN_SIZE = 256
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def brotli_bytes(data: bytes) -> bytes:
+    return brotli.compress(data, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+
+
+def encoders() -> List[Tuple[str, object]]:
+    encs = [(".gz", gzip_bytes)]
+    if brotli is not None:
+        encs.append((".br", brotli_bytes))
+    return encs
+
+
+def find_sources() -> List[Path]:
+    sources = []
+    for root, dirs, files in os.walk(ROOT):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for name in sorted(files):
+            if name.endswith(EXTENSIONS) and not name.startswith("._"):
+                sources.append(Path(root) / name)
+    return sources
+
+
+def is_fresh(dest: Path, source: Path) -> bool:
+    return dest.exists() and dest.stat().st_mtime >= source.stat().st_mtime
+
+
+def compress_file(job: Tuple[str, bool]) -> Tuple[str, int, Dict[str, Optional[int]], int, str]:
+    """Worker: refresh every sibling of one file.
+
+    Returns (path, source bytes, {suffix: sibling bytes or None}, siblings written, error).
+    """
+    path_str, force = job
+    source = Path(path_str)
+    sizes: Dict[str, Optional[int]] = {}
+    written = 0
+    try:
+        size = source.stat().st_size
+        data = None
+        for suffix, encode in encoders():
+            dest = Path(path_str + suffix)
+            if size < MIN_SIZE:
+                sizes[suffix] = None
+                if dest.exists():
+                    dest.unlink()
+                continue
+            if not force and is_fresh(dest, source):
+                sizes[suffix] = dest.stat().st_size
+                continue
+            if data is None:
+                data = source.read_bytes()
+            packed = encode(data)
+            if len(packed) >= size:
+                sizes[suffix] = None
+                if dest.exists():
+                    dest.unlink()
+                continue
+            if write_bytes(dest, packed, sync_dir=False):
+                written += 1
+            else:
+                # Same bytes as before; bump the mtime so it reads as fresh
+                os.utime(dest)
+            sizes[suffix] = len(packed)
+        return path_str, size, sizes, written, ""
+    except Exception as e:
+        return path_str, 0, sizes, written, str(e)
+
+
+def prune_orphans() -> int:
+    """Delete .gz/.br siblings whose source file no longer exists."""
+    removed = 0
+    for root, dirs, files in os.walk(ROOT):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            base, suffix = os.path.splitext(name)
+            if suffix in (".gz", ".br") and base.endswith(EXTENSIONS) and not os.path.exists(os.path.join(root, base)):
+                os.unlink(os.path.join(root, name))
+                removed += 1
+    return removed
+
+
+def pct(saved: int, total: int) -> str:
+    return f"{100.0 * saved / total:.1f}%" if total else "-"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write .gz/.br siblings for text assets")
+    ap.add_argument("--force", action="store_true", help="recompress even if siblings are up to date")
+    ap.add_argument("--prune", action="store_true", help="delete siblings whose source is gone")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
+    suffixes = [suffix for suffix, _encode in encoders()]
+    if brotli is None:
+        print("brotli not installed; writing .gz only (pip install brotli)")
+
+    sources = find_sources()
+    jobs = [(str(p), args.force) for p in sources]
+    by_type: Dict[str, Dict[str, int]] = {}
+    written = 0
+    dirs = set()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers or None) as pool:
+        for path_str, size, sizes, wrote, error in pool.map(compress_file, jobs, chunksize=32):
+            if error:
+                print(f"error: {Path(path_str).relative_to(ROOT)}: {error}")
+                continue
+            if wrote:
+                written += wrote
+                dirs.add(Path(path_str).parent)
+            row = by_type.setdefault(Path(path_str).suffix, {"files": 0, "bytes": 0})
+            row["files"] += 1
+            row["bytes"] += size
+            for suffix in suffixes:
+                # A missing sibling means the original is served as-is
+                row[suffix] = row.get(suffix, 0) + (sizes.get(suffix) or size)
+    sync_dirs(dirs)
+    elapsed = time.perf_counter() - start
+
+    if args.prune:
+        print(f"Pruned {prune_orphans()} orphaned siblings")
+
+    header = f"{'type':<6} {'files':>6} {'bytes':>12}" + "".join(f" {s:>12} {'saved':>7}" for s in suffixes)
+    print(header)
+    totals = {"files": 0, "bytes": 0, **{s: 0 for s in suffixes}}
+    for ext in sorted(by_type):
+        row = by_type[ext]
+        for key in totals:
+            totals[key] += row.get(key, 0)
+        print(f"{ext:<6} {row['files']:>6} {row['bytes']:>12}"
+              + "".join(f" {row[s]:>12} {pct(row['bytes'] - row[s], row['bytes']):>7}" for s in suffixes))
+    print(f"{'total':<6} {totals['files']:>6} {totals['bytes']:>12}"
+          + "".join(f" {totals[s]:>12} {pct(totals['bytes'] - totals[s], totals['bytes']):>7}" for s in suffixes))
+
+    REPORT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    write_text(REPORT_FILE, json.dumps({"types": by_type, "total": totals}, indent=2, sort_keys=True))
+    print(f"Done. {len(sources)} files, {written} siblings written in {elapsed:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Pre-render encyclopedia math to static SVG at build time and drop client MathJax.
+
+Pages written by agents/encyclopedia/agent.py load a polyfill, the full
+MathJax bundle from jsdelivr and a DOMContentLoaded hook that wraps each
+<math-note> in \\( \\) and typesets the page in the browser. This script
+does that work once:
+
+  - finds the math on each page: <math-note> text (inline TeX, as the hook
+    treats it) and \\(...\\) / \\[...\\] in body text outside
+    script/style/pre/code/textarea
+  - renders expressions missing from .build/math-cache.json in one batch
+    through scripts/render_math.js (Node + mathjax-full), caching the SVG
+    markup by expression hash so reruns and shared formulas cost nothing
+  - replaces the math with the markup, inlines MathJax's SVG stylesheet and
+    removes the MathJax config, polyfill, MathJax and math-note scripts
+    (and their CDN origins from the page CSP)
+
+Pages with no math lose the MathJax scripts outright; pages with TeX this
+script does not handle (bare \\begin{...} environments, $ delimiters) keep
+them untouched. Every page left
+without client MathJax is marked <html data-math-prerendered>, which tells
+main.js not to load MathJax or typeset. Without Node or mathjax-full, pages
+with math keep client-side MathJax unchanged and the rest are still
+stripped. build_site.py runs this as its "math" stage.
+
+Run from repo root:
+  python3 scripts/prerender_math.py [--workers N]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from functools import partial
+from html import unescape
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from atomic_write import write_text
+from file_transform import run_transform
+
+ROOT = Path(__file__).resolve().parents[1]
+RENDERER = ROOT / "scripts" / "render_math.js"
+CACHE_FILE = ROOT / ".build" / "math-cache.json"
+# Bump when render_math.js output changes
+CACHE_VERSION = 1
+PAGE_GLOBS = ("encyclopedia/*.html",)
+
+MATH_NOTE_RE = re.compile(r"(<math-note\b[^>]*>)([^<]*)(</math-note>)")
+# Tags and raw-text elements are copied as-is; only text between them is scanned
+MARKUP_RE = re.compile(r"<(script|style|pre|code|textarea)\b[\s\S]*?</\1\s*>|<!--[\s\S]*?-->|<[^>]*>", re.IGNORECASE)
+DELIMITED_RE = re.compile(r"\\\((?P<inline>[\s\S]+?)\\\)|\\\[(?P<display>[\s\S]+?)\\\]")
+# TeX that client MathJax typesets but walk_math() does not: bare environments and $ delimiters
+UNHANDLED_TEX_RE = re.compile(r"\\begin\{|\$\$|\$[^$\s][^$]*\$")
+MATHJAX_SRC_RE = re.compile(
+    r'[ \t]*<script\b[^>]*\bsrc="https://(?:polyfill\.io/|cdn\.jsdelivr\.net/npm/mathjax@)[^"]*"[^>]*>\s*</script>[ \t]*\n')
+MATHJAX_SCRIPT_RES = (
+    re.compile(r"[ \t]*<!-- MathJax Configuration -->[ \t]*\n"),
+    re.compile(r"[ \t]*<script>\s*(?:window\.)?MathJax = \{[\s\S]*?</script>[ \t]*\n"),
+    MATHJAX_SRC_RE,
+    re.compile(r"[ \t]*<script>\s*document\.addEventListener\('DOMContentLoaded', function\(\) \{\s*"
+               r"// Process math-note elements[\s\S]*?</script>[ \t]*\n"),
+)
+# CDN origins only MathJax needed in the page CSP
+CSP_RE = re.compile(r'<meta http-equiv="Content-Security-Policy" content="[^"]*"')
+MATHJAX_ORIGINS_RE = re.compile(r" https://(?:cdn\.jsdelivr\.net|polyfill\.io)(?=[ ;\"])")
+STYLES_RE = re.compile(r'<style id="MJX-SVG-styles">[\s\S]*?</style>')
+HTML_TAG_RE = re.compile(r"<html\b[^>]*>", re.IGNORECASE)
+MARKER = "data-math-prerendered"
+
+# (display, tex) -> markup, or None to leave the source as it is
+Render = Callable[[bool, str], Optional[str]]
+
+
+def math_key(display: bool, tex: str) -> str:
+    return hashlib.sha1(f"{int(display)}\0{tex}".encode("utf-8")).hexdigest()
+
+
+def walk_math(html: str, render: Render) -> str:
+    """Call render() for every expression in the page body, substituting its result."""
+    body = html.find("<body")
+    if body == -1:
+        return html
+
+    def note(m: re.Match) -> str:
+        tex = unescape(m.group(2)).strip()
+        # Already delimited notes are typeset like any other text
+        if not tex or tex.startswith(("\\(", "\\[")):
+            return m.group(0)
+        out = render(False, tex)
+        return m.group(0) if out is None else m.group(1) + out + m.group(3)
+
+    def delimited(m: re.Match) -> str:
+        display = m.group("display") is not None
+        tex = unescape(m.group("display") if display else m.group("inline")).strip()
+        out = render(display, tex)
+        return m.group(0) if out is None else out
+
+    rest = MATH_NOTE_RE.sub(note, html[body:])
+    parts = [html[:body]]
+    last = 0
+    for m in MARKUP_RE.finditer(rest):
+        parts.append(DELIMITED_RE.sub(delimited, rest[last:m.start()]))
+        parts.append(m.group(0))
+        last = m.end()
+    parts.append(DELIMITED_RE.sub(delimited, rest[last:]))
+    return "".join(parts)
+
+
+def find_math(html: str) -> List[Tuple[bool, str]]:
+    found: List[Tuple[bool, str]] = []
+    walk_math(html, lambda display, tex: found.append((display, tex)))
+    return found
+
+
+def has_unhandled_tex(html: str) -> bool:
+    body = html.find("<body")
+    if body == -1:
+        return False
+    text = MARKUP_RE.sub(" ", html[body:])
+    return UNHANDLED_TEX_RE.search(unescape(text)) is not None
+
+
+def strip_mathjax(html: str) -> str:
+    head_end = html.find("</head>")
+    if head_end == -1:
+        return html
+    head = html[:head_end]
+    for pattern in MATHJAX_SCRIPT_RES:
+        head = pattern.sub("", head)
+    if not MATHJAX_SRC_RE.search(head):
+        head = CSP_RE.sub(lambda m: MATHJAX_ORIGINS_RE.sub("", m.group(0)), head)
+    return head + html[head_end:]
+
+
+def mark_prerendered(html: str) -> str:
+    """Flag the page for main.js: its math needs no client-side MathJax."""
+    m = HTML_TAG_RE.search(html)
+    if m is None or MARKER in m.group(0):
+        return html
+    tag = m.group(0)[:-1].rstrip("/").rstrip() + f" {MARKER}>"
+    return html[:m.start()] + tag + html[m.end():]
+
+
+def prerender(html: str, cache: Dict[str, str], styles: str) -> str:
+    """Swap math for cached markup; keep client MathJax if anything is unrendered."""
+    if any(math_key(display, tex) not in cache for display, tex in find_math(html)) or has_unhandled_tex(html):
+        return html
+    rendered = []
+
+    def render(display: bool, tex: str) -> str:
+        rendered.append(tex)
+        return cache[math_key(display, tex)]
+
+    html = walk_math(html, render)
+    if rendered and styles and not STYLES_RE.search(html):
+        html = html.replace("</head>", f'\t<style id="MJX-SVG-styles">{styles}</style>\n</head>', 1)
+    elif styles:
+        html = STYLES_RE.sub(lambda _m: f'<style id="MJX-SVG-styles">{styles}</style>', html)
+    return mark_prerendered(strip_mathjax(html))
+
+
+def prerender_page(cache: Dict[str, str], styles: str, path: Path, text: str) -> str:
+    return prerender(text, cache, styles)
+
+
+# --- renderer and cache ---
+
+def load_cache() -> dict:
+    if CACHE_FILE.exists():
+        with CACHE_FILE.open("r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") == CACHE_VERSION:
+            return cache
+    return {"version": CACHE_VERSION, "styles": "", "items": {}}
+
+
+def render_batch(items: List[Tuple[bool, str]]) -> Optional[Tuple[str, List[str]]]:
+    """Render expressions through render_math.js; None if Node/mathjax-full is unavailable."""
+    node = shutil.which("node")
+    if node is None:
+        print("node not found; pages with math keep client-side MathJax")
+        return None
+    env = dict(os.environ)
+    env["NODE_PATH"] = os.pathsep.join(p for p in (str(ROOT / "node_modules"), env.get("NODE_PATH", "")) if p)
+    payload = json.dumps([{"tex": tex, "display": display} for display, tex in items])
+    proc = subprocess.run([node, str(RENDERER)], input=payload, capture_output=True,
+                          text=True, env=env, timeout=600)
+    if proc.returncode != 0:
+        print(f"renderer failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else proc.returncode}; "
+              "pages with math keep client-side MathJax")
+        return None
+    result = json.loads(proc.stdout)
+    return result["styles"], result["markup"]
+
+
+def find_pages() -> List[Path]:
+    pages = []
+    for pattern in PAGE_GLOBS:
+        pages.extend(sorted(ROOT.glob(pattern)))
+    return pages
+
+
+def report(path: Path, status: str, detail: str) -> None:
+    if status == "updated":
+        print(f"prerendered: {path.relative_to(ROOT)}")
+    elif status == "error":
+        print(f"error: {path} -> {detail}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-render page math to SVG and drop client MathJax")
+    ap.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    args = ap.parse_args()
+
+    pages = find_pages()
+    cache = load_cache()
+    items = cache["items"]
+    missing: Dict[str, Tuple[bool, str]] = {}
+    with_math = 0
+    for path in pages:
+        found = find_math(path.read_text(encoding="utf-8", errors="ignore"))
+        with_math += bool(found)
+        for display, tex in found:
+            key = math_key(display, tex)
+            if key not in items:
+                missing[key] = (display, tex)
+    print(f"{len(pages)} pages, {with_math} with math; {len(missing)} expressions to render, "
+          f"{len(items)} cached")
+
+    if missing:
+        result = render_batch(list(missing.values()))
+        if result is not None:
+            cache["styles"], markup = result
+            items.update(zip(missing, markup))
+            CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            write_text(CACHE_FILE, json.dumps(cache, separators=(",", ":"), sort_keys=True))
+
+    counts = run_transform(pages, partial(prerender_page, items, cache["styles"]),
+                           report=report, workers=args.workers)
+    print(f"Done. {counts['updated']} pages updated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main() or 0)
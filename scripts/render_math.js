@@ -0,0 +1,42 @@
+// Render TeX to static MathJax SVG markup for scripts/prerender_math.py.
+//
+// stdin:  JSON array of {"tex": "...", "display": true|false}
+// stdout: JSON {"styles": "<css>", "markup": ["<mjx-container ...>", ...]}
+//
+// Needs mathjax-full 3.x resolvable from here or via NODE_PATH
+// (npm install mathjax-full@3). Exits with status 2 when it is missing.
+
+let mathjax, TeX, SVG, liteAdaptor, RegisterHTMLHandler, AllPackages;
+try {
+  ({ mathjax } = require("mathjax-full/js/mathjax.js"));
+  ({ TeX } = require("mathjax-full/js/input/tex.js"));
+  ({ SVG } = require("mathjax-full/js/output/svg.js"));
+  ({ liteAdaptor } = require("mathjax-full/js/adaptors/liteAdaptor.js"));
+  ({ RegisterHTMLHandler } = require("mathjax-full/js/handlers/html.js"));
+  ({ AllPackages } = require("mathjax-full/js/input/tex/AllPackages.js"));
+} catch (error) {
+  console.error("mathjax-full not found (npm install mathjax-full@3)");
+  process.exit(2);
+}
+
+const adaptor = liteAdaptor();
+RegisterHTMLHandler(adaptor);
+const doc = mathjax.document("", {
+  InputJax: new TeX({ packages: AllPackages }),
+  // Each expression carries its own glyph paths, so it can be inlined anywhere
+  OutputJax: new SVG({ fontCache: "local" }),
+});
+
+let input = "";
+process.stdin.setEncoding("utf8");
+process.stdin.on("data", (chunk) => { input += chunk; });
+process.stdin.on("end", () => {
+  const markup = JSON.parse(input).map(({ tex, display }) => {
+    const node = doc.convert(tex, { display });
+    adaptor.setAttribute(node, "role", "img");
+    adaptor.setAttribute(node, "aria-label", tex);
+    return adaptor.outerHTML(node);
+  });
+  const styles = adaptor.textContent(doc.outputJax.styleSheet(doc));
+  process.stdout.write(JSON.stringify({ styles, markup }));
+});
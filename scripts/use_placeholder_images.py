@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 """Replace broken Wikipedia images with placeholder images until we find better sources"""
-import json
-from pathlib import Path
+from image_manifest import ImageManifest
 
 def main():
     # Create placeholder URLs based on category
@@ -38,49 +37,26 @@ def main():
         ]
     }
     
-    # Load manifest
-    manifest_file = Path("assets/data/encyclopedia-images.json")
-    with open(manifest_file, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
+    store = ImageManifest.load()
     
     # Update all images to use placeholders
-    for page_id, page_data in manifest.items():
-        if "images" in page_data:
-            # Find the category for this page
-            category = None
-            # Try to determine category from existing images
-            for img in page_data["images"]:
-                if "Recognition Physics" in img.get("caption", ""):
-                    category = "Recognition Physics Fundamentals"
-                    break
-                elif "constant" in img.get("caption", "").lower():
-                    category = "Fundamental Constants"
-                    break
-                elif "quantum" in img.get("caption", "").lower():
-                    category = "Quantum & Particle Physics"
-                    break
-                elif "spacetime" in img.get("caption", "").lower() or "gravity" in img.get("caption", "").lower():
-                    category = "Spacetime & Gravity"
-                    break
-                elif "cosmic" in img.get("caption", "").lower() or "universe" in img.get("caption", "").lower():
-                    category = "Cosmology & Astrophysics"
-                    break
-            
-            # Get appropriate placeholders
-            placeholder_urls = placeholders.get(category, placeholders["default"])
+    for page_id, images in store.items():
+        if images:
+            # Category comes from the page's task entry (see image_manifest.py)
+            placeholder_urls = placeholders.get(store.category(page_id), placeholders["default"])
             
             # Update each image
-            for i, img in enumerate(page_data["images"]):
+            for i, img in enumerate(images):
                 # Use appropriate placeholder based on position
                 placeholder_index = min(i, len(placeholder_urls) - 1)
                 img["src"] = placeholder_urls[placeholder_index]
                 # Keep original caption but update credit
                 img["credit"] = "Placeholder Image"
                 img["license"] = "CC0"
+            store.touch(page_id)
     
     # Save updated manifest
-    with open(manifest_file, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    store.save()
     
     print("Updated all images to use placeholders")
     
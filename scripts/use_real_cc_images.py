@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """Use real CC-licensed images from reliable sources"""
-import json
 import re
 from pathlib import Path
 
+from atomic_write import write_text
+from image_manifest import ImageManifest
+
 # Real CC-licensed images from stable sources
 # These are direct links to actual images, not the upload.wikimedia.org URLs that get transformed
 CC_IMAGES = {
@@ -129,18 +131,16 @@ def main():
         
         try:
             new_content = update_html_with_cc_images(html_file)
-            html_file.write_text(new_content, encoding="utf-8")
-            updated_count += 1
-            print(f"Updated: {html_file.name}")
+            if write_text(html_file, new_content):
+                updated_count += 1
+                print(f"Updated: {html_file.name}")
         except Exception as e:
             print(f"Error processing {html_file.name}: {e}")
     
     print(f"\nUpdated {updated_count} files with real CC-licensed images")
     
     # Also update the manifest for future generations
-    manifest_file = Path("assets/data/encyclopedia-images.json")
-    with open(manifest_file, "r", encoding="utf-8") as f:
-        manifest = json.load(f)
+    store = ImageManifest.load()
     
     # Update manifest with a selection of CC images
     default_images = [
@@ -152,14 +152,14 @@ def main():
          "license": CC_ATTRIBUTIONS["quantum_orbital"]["license"]}
     ]
     
-    for page_id, page_data in manifest.items():
-        if "images" in page_data:
-            for i, img in enumerate(page_data["images"]):
+    for page_id, images in store.items():
+        if images:
+            for i, img in enumerate(images):
                 if i < len(default_images):
                     img.update(default_images[i])
+            store.touch(page_id)
     
-    with open(manifest_file, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2)
+    store.save()
     
     print("Updated manifest with real CC images")
 
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """Verify all images in the manifest are accessible"""
-import json
 import urllib.request
 import urllib.error
-from pathlib import Path
+
+from image_manifest import ImageManifest
 
 
 def check_url(url: str) -> tuple[bool, str]:
@@ -22,20 +22,18 @@ def check_url(url: str) -> tuple[bool, str]:
 
 
 def main():
-    manifest_path = Path("assets/data/encyclopedia-images.json")
-    if not manifest_path.exists():
-        print(f"Manifest not found: {manifest_path}")
+    store = ImageManifest.load()
+    if not len(store):
+        print("Image manifest is empty")
         return
     
-    with open(manifest_path, "r") as f:
-        manifest = json.load(f)
-    
     print("Verifying image URLs...\n")
     
     errors = 0
-    for page, data in manifest.items():
+    # Each distinct URL is checked once even when many pages share it
+    checked = {}
+    for page, images in store.items():
         print(f"Page: {page}")
-        images = data.get("images", [data]) if isinstance(data, dict) else [data]
         
         for i, img in enumerate(images):
             src = img.get("src", "")
@@ -47,7 +45,9 @@ def main():
                 continue
             
             # Check external URL
-            ok, msg = check_url(src)
+            if src not in checked:
+                checked[src] = check_url(src)
+            ok, msg = checked[src]
             if ok:
                 print(f"  [{i+1}] ✓ {src[:60]}... - {msg}")
             else:
@@ -1,11 +1,83 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import datetime as _dt
-from astrology_os import window_score, state_vector, zodiac_hash, global_cost, generate_heatmap
+import gzip
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import NamedTuple, Optional
+from astrology_os import (preload, state_vector, zodiac_hash, global_cost, RESOLUTIONS,
+                          best_windows, day_labels, posix_days, range_days, score_days)
+from heatmap_cache import HeatmapCache, LRU_SIZE
 
 app = Flask(__name__)
 CORS(app)
+# Year heatmaps are computed once per code version (see heatmap_cache.py); the
+# in-memory copy is the payload cache below, so the heatmap cache keeps none
+heatmaps = HeatmapCache(max_entries=0)
+# Most instants one batch request may evaluate (about 11 years at hourly steps)
+MAX_POINTS = 100_000
+# /window_score rounds timestamps to this many seconds, so nearby requests share one result
+SCORE_RESOLUTION = int(os.environ.get("ASTROLOGY_SCORE_RESOLUTION", "60"))
+SCORE_CACHE_SIZE = 65536
+# Results are deterministic: anything about the past can be cached for a year,
+# the present and future for a day (until the ephemeris or code is updated)
+PAST_MAX_AGE = 365 * 86400
+FUTURE_MAX_AGE = 86400
+# Smaller bodies are sent uncompressed
+GZIP_MIN_BYTES = 1024
+
+class Payload(NamedTuple):
+    body: bytes
+    etag: str
+    gzipped: Optional[bytes]
+
+def make_payload(body: str) -> Payload:
+    raw = body.encode("utf-8")
+    # mtime=0 keeps the gzip bytes, and so their ETag, reproducible
+    gzipped = gzip.compress(raw, compresslevel=6, mtime=0) if len(raw) >= GZIP_MIN_BYTES else None
+    return Payload(raw, hashlib.sha1(raw).hexdigest()[:20], gzipped)
+
+def cached_response(payload: Payload, max_age: int):
+    """JSON response with a strong ETag and Cache-Control; 304 when If-None-Match matches."""
+    use_gzip = payload.gzipped is not None and request.accept_encodings["gzip"] > 0
+    # Each encoding is a different representation, so it gets its own strong ETag
+    etag = payload.etag + ("-gz" if use_gzip else "")
+    headers = {"ETag": f'"{etag}"', "Cache-Control": f"public, max-age={max_age}", "Vary": "Accept-Encoding"}
+    if etag in request.if_none_match:
+        return Response(status=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return Response(payload.gzipped if use_gzip else payload.body, mimetype="application/json", headers=headers)
+
+def max_age_until(last: _dt.datetime) -> int:
+    return PAST_MAX_AGE if last < _dt.datetime.now(_dt.timezone.utc) else FUTURE_MAX_AGE
+
+@lru_cache(maxsize=SCORE_CACHE_SIZE)
+def score_payload(seconds: int) -> Payload:
+    ts = _dt.datetime.fromtimestamp(seconds, _dt.timezone.utc)
+    vec = state_vector(ts)
+    cost = global_cost(vec)
+    return make_payload(json.dumps({"timestamp": ts.strftime("%Y-%m-%dT%H:%M:%SZ"), "window_score": 1 / (1 + cost),
+                                    "zodiac_hash": zodiac_hash(vec), "global_cost": cost}))
+
+@lru_cache(maxsize=LRU_SIZE)
+def heatmap_payload(year: int, resolution: str) -> Payload:
+    return make_payload(heatmaps.get(year, resolution))
+
+def parse_timestamp(ts_str):
+    if not isinstance(ts_str, str):
+        raise ValueError(f"timestamps must be ISO 8601 strings, not {ts_str!r}")
+    return _dt.datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
+
+def request_range(params):
+    """(start, end, step minutes) from start/end/step request parameters."""
+    if not params.get('start') or not params.get('end'):
+        raise ValueError("start and end are required")
+    return parse_timestamp(params['start']), parse_timestamp(params['end']), float(params.get('step', 60))
 
 @app.route('/health')
 def health():
@@ -14,20 +86,97 @@ def health():
 @app.route('/window_score')
 def get_window_score():
     ts_str = request.args.get('timestamp')
+    if not ts_str:
+        return jsonify({"error": "timestamp is required"}), 400
     try:
-        ts = _dt.datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-        vec = state_vector(ts)
-        return jsonify({"timestamp": ts_str, "window_score": window_score(ts), "zodiac_hash": zodiac_hash(vec), "global_cost": global_cost(vec)})
+        ts = parse_timestamp(ts_str)
+        if ts.tzinfo is None:
+            raise ValueError("cannot interpret a naive datetime; give it a timezone such as UTC")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        # Keyed by the timestamp rounded to SCORE_RESOLUTION seconds
+        seconds = round(ts.timestamp() / SCORE_RESOLUTION) * SCORE_RESOLUTION
+        return cached_response(score_payload(seconds), max_age_until(ts))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/heatmap')
 def get_heatmap():
     year_str = request.args.get('year')
+    resolution = request.args.get('resolution', 'day')
+    if not year_str:
+        return jsonify({"error": "year is required"}), 400
+    try:
+        year = int(year_str)
+    except ValueError:
+        return jsonify({"error": f"year must be an integer, not {year_str!r}"}), 400
+    if not _dt.MINYEAR <= year < _dt.MAXYEAR:
+        return jsonify({"error": f"year must be between {_dt.MINYEAR} and {_dt.MAXYEAR - 1}"}), 400
+    if resolution not in RESOLUTIONS:
+        return jsonify({"error": f"resolution must be one of {sorted(RESOLUTIONS)}"}), 400
+    try:
+        return cached_response(heatmap_payload(year, resolution),
+                               max_age_until(_dt.datetime(year + 1, 1, 1, tzinfo=_dt.timezone.utc)))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/window_scores', methods=['GET', 'POST'])
+def get_window_scores():
+    """Scores for many instants in one call: JSON {"timestamps": [...]} or ?timestamps=a,b,... or ?start=&end=&step=MINUTES."""
+    params = request.get_json(silent=True) or request.args
+    if not isinstance(params, Mapping):
+        return jsonify({"error": "request body must be a JSON object"}), 400
+    try:
+        timestamps = params.get('timestamps')
+        if isinstance(timestamps, str):
+            timestamps = timestamps.split(',')
+        if timestamps is not None and not isinstance(timestamps, list):
+            raise ValueError("timestamps must be a list or a comma-separated string")
+        if timestamps:
+            if len(timestamps) > MAX_POINTS:
+                return jsonify({"error": f"at most {MAX_POINTS} timestamps per request"}), 400
+            days = posix_days([parse_timestamp(ts) for ts in timestamps])
+            response = {"timestamps": day_labels(days)}
+        else:
+            start, end, step = request_range(params)
+            if step > 0 and (end - start).total_seconds() / 60 / step > MAX_POINTS:
+                return jsonify({"error": f"at most {MAX_POINTS} timestamps per request"}), 400
+            days = range_days(start, end, step)
+            response = {"start": day_labels(days[:1])[0] if len(days) else None, "step": step, "count": len(days)}
+        if len(days) > MAX_POINTS:
+            return jsonify({"error": f"at most {MAX_POINTS} timestamps per request"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        scores = score_days(days)
+        response.update({name: values.tolist() for name, values in scores.items()})
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/best_windows')
+def get_best_windows():
+    """The n best windows in [start, end), refined from a coarse grid of ?coarse=MINUTES."""
+    try:
+        start, end, _ = request_range(request.args)
+        n = int(request.args.get('n', 10))
+        coarse = float(request.args.get('coarse', 60))
+        if n < 1 or coarse <= 0:
+            raise ValueError("n and coarse must be positive")
+        if (end - start).total_seconds() / 60 / coarse > MAX_POINTS:
+            return jsonify({"error": f"range exceeds {MAX_POINTS} coarse steps"}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
     try:
-        return jsonify(generate_heatmap(int(year_str)))
+        return jsonify({"start": request.args['start'], "end": request.args['end'],
+                        "windows": best_windows(start, end, n, coarse)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # Pay the ephemeris load before the first request (ASTROLOGY_PRELOAD=0 to skip)
+    if os.environ.get("ASTROLOGY_PRELOAD", "1") != "0":
+        print("Preloaded: " + ", ".join(f"{name} {secs:.2f}s" for name, secs in preload().items()))
+    # Development server; for production use gunicorn -c gunicorn.conf.py api:app
+    app.run(debug=os.environ.get("ASTROLOGY_DEBUG") == "1", host='0.0.0.0', port=5001)
\ No newline at end of file
@@ -3,9 +3,23 @@
 Astrology OS - Recognition Science Implementation
 Author: Jonathan Washburn
 """
+import hashlib
 import math
+import os
+import sys
+import threading
+import time
 import datetime as _dt
-from typing import Tuple, List
+from pathlib import Path
+from typing import Tuple, List, Sequence
+
+import numpy as np
+
+# Shards are written through the site's shared atomic writer, so a half-written one is never served
+_SCRIPTS_DIR = str(Path(__file__).resolve().parents[2] / "scripts")
+if _SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, _SCRIPTS_DIR)
+from atomic_write import write_text as _write_text  # noqa: E402
 
 PHI = (1 + 5**0.5) / 2
 SECTOR = math.pi / 6
@@ -15,35 +29,142 @@ PLANETS = [
     "uranus", "neptune", "pluto",
 ]
 
-try:
-    from skyfield.api import load as _sky_load
-    _EPEM = _sky_load("de440.bsp")
-    _TS = _sky_load.timescale()
-
-    def _ecliptic_longitude(body: str, t) -> float:
-        planet_map = {
-            "sun": "sun", "moon": "moon", "mercury": "mercury", "venus": "venus",
-            "mars": "mars barycenter", "jupiter": "jupiter barycenter",
-            "saturn": "saturn barycenter", "uranus": "uranus barycenter",
-            "neptune": "neptune barycenter", "pluto": "pluto barycenter"
-        }
-        ephemeris_id = planet_map.get(body, body)
-        # ALWAYS observe from Earth for geocentric coordinates.
-        geocentric = _EPEM["earth"].at(t).observe(_EPEM[ephemeris_id])
-        lon, _, _ = geocentric.ecliptic_latlon()
-        return lon.radians
-
-    def _longitude_and_rate(body: str, t) -> Tuple[float, float]:
-        dt_plus = t + (1 / 24)
-        lam, lam_plus = _ecliptic_longitude(body, t), _ecliptic_longitude(body, dt_plus)
-        return lam, (lam_plus - lam) / (1 / 24)
-
-except Exception:
-    _longitude_and_rate = lambda *a, **k: (_ for _ in ()).throw(NotImplementedError("Skyfield not available."))
+EPHEMERIS_IDS = {
+    "sun": "sun", "moon": "moon", "mercury": "mercury", "venus": "venus",
+    "mars": "mars barycenter", "jupiter": "jupiter barycenter",
+    "saturn": "saturn barycenter", "uranus": "uranus barycenter",
+    "neptune": "neptune barycenter", "pluto": "pluto barycenter"
+}
+# Changes whenever this file does; versions cached heatmaps and static shards
+CODE_VERSION = hashlib.sha1(Path(__file__).read_bytes()).hexdigest()[:12]
+# Finite-difference step for longitude rates, in days
+RATE_STEP = 1 / 24
+# Precomputed longitudes (see ephemeris_table.py); Skyfield is only needed outside its range
+EPHEMERIS_TABLE = Path(os.environ.get("ASTROLOGY_EPHEMERIS_TABLE", Path(__file__).resolve().with_name("ephemeris_table.npy")))
+EPHEMERIS_FILE = "de440.bsp"
+
+# Nothing is loaded at import: the table and Skyfield's ephemeris/timescale
+# are loaded by the first call that needs them (or by preload())
+_LOADED = {}
+_LOAD_LOCK = threading.Lock()
+
+def _load_once(name: str, loader):
+    """loader() runs until it first succeeds; a failure is raised to that caller and the next one retries."""
+    if name in _LOADED:
+        return _LOADED[name]
+    with _LOAD_LOCK:
+        if name not in _LOADED:
+            _LOADED[name] = loader()
+        return _LOADED[name]
+
+def _load_table():
+    if not EPHEMERIS_TABLE.exists():
+        return None
+    try:
+        from ephemeris_table import EphemerisTable
+        return EphemerisTable(EPHEMERIS_TABLE)
+    except Exception as e:
+        print(f"Ephemeris table not loaded: {e}")
+        return None
+
+def _load_skyfield():
+    try:
+        from skyfield.api import load
+    except ImportError as e:
+        raise NotImplementedError("Skyfield not available.") from e
+    return load(EPHEMERIS_FILE), load.timescale()
+
+def _table():
+    return _load_once("table", _load_table)
+
+def _sky():
+    """(ephemeris, timescale)"""
+    return _load_once("skyfield", _load_skyfield)
+
+def preload() -> dict:
+    """Load the ephemeris table and Skyfield now, e.g. at server startup.
+
+    Returns the seconds each took. A Skyfield failure is reported rather
+    than raised, since the table may cover every request; the first call
+    that needs Skyfield tries to load it again.
+    """
+    timings = {}
+    for name, load in (("table", _table), ("skyfield", _sky)):
+        start = time.perf_counter()
+        try:
+            load()
+        except Exception as e:
+            print(f"{name} not loaded: {e}")
+        timings[name] = time.perf_counter() - start
+    return timings
+
+def _ecliptic_longitude(body: str, t) -> float:
+    epem, _ = _sky()
+    ephemeris_id = EPHEMERIS_IDS.get(body, body)
+    # ALWAYS observe from Earth for geocentric coordinates.
+    geocentric = epem["earth"].at(t).observe(epem[ephemeris_id])
+    _, lon, _ = geocentric.ecliptic_latlon()  # (lat, lon, distance)
+    return lon.radians
+
+def _longitude_and_rate(body: str, t) -> Tuple[float, float]:
+    dt_plus = t + RATE_STEP
+    lam, lam_plus = _ecliptic_longitude(body, t), _ecliptic_longitude(body, dt_plus)
+    return lam, (lam_plus - lam) / RATE_STEP
+
+def _state_matrix(t) -> np.ndarray:
+    """(N, 20) longitudes and rates for a Skyfield Time array.
+
+    t and t + RATE_STEP are stacked into one Time array, so Earth is
+    evaluated once and each body is observed once for all 2N instants.
+    """
+    epem, ts = _sky()
+    n = len(t.tt)
+    w, f = divmod(RATE_STEP, 1.0)  # as Time.__add__ splits it
+    both = ts.tt_jd(np.concatenate([t.whole, t.whole + w]), np.concatenate([t.tt_fraction, t.tt_fraction + f]))
+    earth = epem["earth"].at(both)
+    out = np.empty((n, 2 * len(PLANETS)))
+    for k, body in enumerate(PLANETS):
+        lon = earth.observe(epem[EPHEMERIS_IDS[body]]).ecliptic_latlon()[1].radians
+        out[:, 2 * k] = lon[:n]
+        out[:, 2 * k + 1] = (lon[n:] - lon[:n]) / RATE_STEP
+    return out
+
+def _sky_state_matrix(days: np.ndarray) -> np.ndarray:
+    _, ts = _sky()
+    return _state_matrix(ts.utc(1970, 1, 1, 0, 0, days * 86400.0))
+
+def _table_state_matrix(table, days: np.ndarray) -> np.ndarray:
+    # Unwrapped longitudes, so rates have no jump where a body crosses 0 degrees
+    n = len(days)
+    lon = table.longitudes(np.concatenate([days, days + RATE_STEP]))
+    out = np.empty((n, 2 * len(PLANETS)))
+    out[:, 0::2] = lon[:n] % (2 * math.pi)
+    out[:, 1::2] = (lon[n:] - lon[:n]) / RATE_STEP
+    return out
+
+def state_matrix(days: np.ndarray) -> np.ndarray:
+    """(N, 20) state vectors at POSIX days (UTC seconds since 1970 / 86400).
+
+    Served from the ephemeris table when it covers every day, else Skyfield.
+    """
+    days = np.asarray(days, dtype=float)
+    table = _table()
+    if table is not None and table.covers(days) and table.covers(days + RATE_STEP):
+        return _table_state_matrix(table, days)
+    return _sky_state_matrix(days)
+
+def posix_days(timestamps: Sequence[_dt.datetime]) -> np.ndarray:
+    for ts in timestamps:
+        if ts.tzinfo is None:
+            raise ValueError("cannot interpret a naive datetime; give it a timezone such as UTC")
+    return np.array([ts.timestamp() for ts in timestamps], dtype=float) / 86400.0
+
+def state_vectors(timestamps: Sequence[_dt.datetime]) -> np.ndarray:
+    """State vectors for many timestamps at once, as an (N, 20) array."""
+    return state_matrix(posix_days(list(timestamps)))
 
 def state_vector(timestamp: _dt.datetime) -> List[float]:
-    t_sf = _TS.from_datetime(timestamp)
-    return [val for body in PLANETS for val in _longitude_and_rate(body, t_sf)]
+    return state_vectors([timestamp])[0].tolist()
 
 def zodiac_hash(state_vec: List[float]) -> Tuple[int, ...]:
     signs = [0] * 12
@@ -54,52 +175,252 @@ def zodiac_hash(state_vec: List[float]) -> Tuple[int, ...]:
 def cost_kernel(sign_i: int, sign_j: int) -> float:
     return abs(math.sin(abs(sign_i - sign_j) % 12 * SECTOR)) ** PHI
 
+# cost_kernel depends only on abs(i - j) % 12: precomputed from it, so lookups are bit-identical
+COST_TABLE = tuple(cost_kernel(0, d) for d in range(12))
+_COST_LUT = np.array(COST_TABLE)
+# _PAIR_COST[a, b] = cost of one body in sign a paired with one in sign b > a
+_PAIR_COST = np.triu(_COST_LUT[np.abs(np.subtract.outer(np.arange(12), np.arange(12)))], k=1)
+
 def global_cost(state_vec: List[float]) -> float:
     signs = [int((l % (2 * math.pi)) / SECTOR) for l in state_vec[0::2]]
-    return sum(cost_kernel(signs[i], signs[j]) for i in range(len(signs)) for j in range(i + 1, len(signs)))
+    return sum(COST_TABLE[abs(signs[i] - signs[j]) % 12] for i in range(len(signs)) for j in range(i + 1, len(signs)))
+
+_PAIRS = np.triu_indices(len(PLANETS), k=1)
+
+def sign_indices(state_vecs: np.ndarray) -> np.ndarray:
+    """(N, 10) zodiac sign index of each body for a batch of state vectors."""
+    return ((np.asarray(state_vecs)[:, 0::2] % (2 * math.pi)) / SECTOR).astype(np.int64)
+
+def global_costs(state_vecs: np.ndarray) -> np.ndarray:
+    """global_cost over a batch of state vectors, as an (N,) array.
+
+    Pair costs come from the table and are added in global_cost's pair
+    order, so every element is bit-identical to global_cost().
+    """
+    signs = sign_indices(state_vecs)
+    costs = _COST_LUT[np.abs(signs[:, _PAIRS[0]] - signs[:, _PAIRS[1]]) % 12]
+    total = np.zeros(len(signs))
+    for k in range(costs.shape[1]):
+        total += costs[:, k]
+    return total
+
+def zodiac_hashes(state_vecs: np.ndarray) -> np.ndarray:
+    """(N, 12) sign histograms; row n equals zodiac_hash(state_vecs[n])."""
+    signs = sign_indices(state_vecs)
+    hist = np.zeros((len(signs), 12), dtype=np.int64)
+    np.add.at(hist, (np.arange(len(signs))[:, None], signs), 1)
+    return hist
+
+def hash_costs(hashes: np.ndarray) -> np.ndarray:
+    """global_cost from sign histograms (zodiac_hash counts): h^T K h per row.
+
+    The cost only depends on how many bodies share each sign, so this is a
+    12 x 12 quadratic form; it agrees with global_cost() to within rounding
+    (a few ulp), since the terms are summed in a different order.
+    """
+    hashes = np.asarray(hashes, dtype=float)
+    return np.einsum("na,ab,nb->n", hashes, _PAIR_COST, hashes)
 
 def window_score(timestamp: _dt.datetime) -> float:
     return 1 / (1 + global_cost(state_vector(timestamp)))
 
-def generate_heatmap(year: int) -> dict:
-    """Generate a full-year heatmap of daily window scores."""
-    start_date = _dt.datetime(year, 1, 1, tzinfo=_dt.timezone.utc)
-    daily_scores = {}
-    
-    for i in range(366):
-        current_date = start_date + _dt.timedelta(days=i)
-        if current_date.year > year:
-            break
-        
-        date_str = current_date.strftime('%Y-%m-%d')
-        try:
-            score = window_score(current_date)
-            daily_scores[date_str] = score
-        except Exception as e:
-            # This will help debug if a specific day fails.
-            print(f"Error calculating score for {date_str}: {e}")
-            daily_scores[date_str] = None 
+# Heatmap resolution -> slot length in minutes
+RESOLUTIONS = {"day": 1440, "hour": 60, "10min": 10}
+# Slots evaluated per ephemeris batch; bounds memory at fine resolutions
+HEATMAP_BATCH = 8784
+
+def top_windows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k best scores, best first, earlier slots first on ties."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    threshold = scores[np.argpartition(-scores, k - 1)[k - 1]]
+    candidates = np.flatnonzero(scores >= threshold)
+    return candidates[np.argsort(-scores[candidates], kind="stable")][:k]
+
+def year_scores(year: int, resolution: str = "day") -> Tuple[np.ndarray, np.ndarray]:
+    """(slot start minutes since the year began, window scores) for every slot of the year.
+
+    All slots are evaluated in batched ephemeris calls.
+    """
+    step = RESOLUTIONS[resolution]
+    start = np.datetime64(f"{year}-01-01", "m")
+    count = int((np.datetime64(f"{year + 1}-01-01", "m") - start) // np.timedelta64(step, "m"))
+    minutes = np.arange(count) * step
+    days = (start.astype(np.int64) + minutes) / 1440.0
+    scores = np.empty(count)
+    for lo in range(0, count, HEATMAP_BATCH):
+        scores[lo:lo + HEATMAP_BATCH] = 1 / (1 + global_costs(state_matrix(days[lo:lo + HEATMAP_BATCH])))
+    return minutes, scores
+
+def generate_heatmap(year: int, resolution: str = "day", top: int = 10) -> dict:
+    """Generate a full-year heatmap of window scores.
+
+    "day" returns "daily_scores" keyed YYYY-MM-DD; finer resolutions
+    return "scores" keyed YYYY-MM-DDTHH:MM (UTC slot start).
+    """
+    minutes, scores = year_scores(year, resolution)
+    start = np.datetime64(f"{year}-01-01", "m")
+    labels = np.datetime_as_string(start + minutes.astype("timedelta64[m]"), unit="D" if resolution == "day" else "m")
+    labels = labels.tolist()
+    values = scores.tolist()
+    return {
+        "year": year,
+        "resolution": resolution,
+        "daily_scores" if resolution == "day" else "scores": dict(zip(labels, values)),
+        "top_windows": [{"date": labels[i], "score": values[i]} for i in top_windows(scores, top)],
+    }
+
+def score_days(days: np.ndarray) -> dict:
+    """Window scores, zodiac hashes and global costs at POSIX days, in one batch."""
+    vecs = state_matrix(days)
+    costs = global_costs(vecs)
+    return {"window_score": 1 / (1 + costs), "zodiac_hash": zodiac_hashes(vecs), "global_cost": costs}
+
+def range_days(start: _dt.datetime, end: _dt.datetime, step_minutes: float) -> np.ndarray:
+    """POSIX days from start up to (not including) end, step_minutes apart."""
+    if step_minutes <= 0:
+        raise ValueError("step must be positive")
+    first, last = posix_days([start, end])
+    return first + np.arange(math.ceil(round((last - first) * 1440 / step_minutes, 9))) * (step_minutes / 1440)
+
+def day_labels(days: np.ndarray) -> List[str]:
+    """ISO UTC labels (to the second) for POSIX days."""
+    seconds = np.round(np.asarray(days) * 86400).astype(np.int64).astype("datetime64[s]")
+    return [label + "Z" for label in np.datetime_as_string(seconds).tolist()]
+
+def best_windows(start: _dt.datetime, end: _dt.datetime, n: int = 10,
+                 coarse_minutes: float = 60, resolution_minutes: float = 1) -> List[dict]:
+    """The n best-scoring windows in [start, end), best first.
+
+    The score is constant while no body changes sign, so a window is a run
+    of equal score. Runs are found on a coarse grid, ranked, and only the
+    boundaries of the n best are refined, by bisection to within
+    resolution_minutes, every boundary advancing together in one batched
+    evaluation per halving. A run shorter than coarse_minutes can fall
+    between grid points and be missed.
+    """
+    grid = range_days(start, end, coarse_minutes)
+    if not len(grid):
+        return []
+    end_day = posix_days([end])[0]
+    vecs = state_matrix(grid)
+    costs = global_costs(vecs)
+    scores = 1 / (1 + costs)
+    change = np.flatnonzero(scores[1:] != scores[:-1]) + 1
+    run_start = np.concatenate([[0], change])
+    run_end = np.concatenate([change, [len(grid)]])  # exclusive
+    best = top_windows(scores[run_start], n)
+    first, last = run_start[best], run_end[best]
+
+    # Each refined boundary lies between a grid point inside the run and its
+    # neighbour outside it; grid ends are already exact
+    left = first > 0
+    right = last < len(grid)
+    inside = np.concatenate([grid[first[left]], grid[last[right] - 1]])
+    outside = np.concatenate([grid[first[left] - 1], grid[last[right]]])
+    target = np.concatenate([scores[first[left]], scores[last[right] - 1]])
+    for _ in range(max(0, math.ceil(math.log2(coarse_minutes / resolution_minutes)))):
+        mid = (inside + outside) / 2
+        same = 1 / (1 + global_costs(state_matrix(mid))) == target
+        inside = np.where(same, mid, inside)
+        outside = np.where(same, outside, mid)
 
-    # Filter out any days that failed
-    valid_scores = {d: s for d, s in daily_scores.items() if s is not None}
-    
-    # Find the top 10 optimal windows
-    sorted_days = sorted(valid_scores.items(), key=lambda item: item[1], reverse=True)
-    peaks = sorted_days[:10]
+    window_start = grid[first].copy()
+    window_start[left] = inside[:left.sum()]
+    window_end = np.full(len(best), end_day)
+    window_end[right] = outside[left.sum():]
+    hashes = zodiac_hashes(vecs[first])
+    labels_start, labels_end = day_labels(window_start), day_labels(window_end)
+    return [
+        {"start": labels_start[k], "end": labels_end[k], "score": float(scores[i]),
+         "zodiac_hash": hashes[k].tolist(), "global_cost": float(costs[i])}
+        for k, i in enumerate(first)
+    ]
 
+# Static heatmaps for hosting without the API (see write_shards)
+SHARD_DIR = Path(__file__).resolve().parents[2] / "assets" / "data" / "astrology"
+# Shard scores are rounded to this many decimals; top windows keep full precision
+SHARD_DECIMALS = 6
+
+def shard_path(directory: Path, year: int, resolution: str) -> Path:
+    return Path(directory) / f"heatmap-{year}-{resolution}.json"
+
+def heatmap_shard(year: int, resolution: str = "day", top: int = 10) -> dict:
+    """A year heatmap as compact arrays: scores[i] is the slot starting at start + i * step minutes."""
+    minutes, scores = year_scores(year, resolution)
+    best = top_windows(scores, top)
+    start = np.datetime64(f"{year}-01-01", "m")
+    labels = np.datetime_as_string(start + minutes[best].astype("timedelta64[m]"),
+                                   unit="D" if resolution == "day" else "m").tolist()
     return {
+        "version": CODE_VERSION,
         "year": year,
-        "daily_scores": daily_scores,
-        "top_windows": [{"date": d, "score": s} for d, s in peaks],
+        "resolution": resolution,
+        "start": f"{year}-01-01T00:00Z",
+        "step": RESOLUTIONS[resolution],
+        "scores": np.round(scores, SHARD_DECIMALS).tolist(),
+        "top_windows": [{"date": label, "score": float(scores[i])}
+                        for label, i in zip(labels, best)],
     }
 
+def _write_shard(job: Tuple[str, int, str]) -> Tuple[int, str, int]:
+    import json
+    directory, year, resolution = job
+    body = json.dumps(heatmap_shard(year, resolution), separators=(",", ":"))
+    _write_text(shard_path(directory, year, resolution), body)
+    return year, resolution, len(body)
+
+def write_shards(first_year: int, last_year: int, resolutions: Sequence[str] = ("day",),
+                 directory: Path = SHARD_DIR, workers: int = 0, force: bool = False) -> dict:
+    """Precompute heatmap shards for a range of years, one year per pool task.
+
+    Shards already written by this code version are kept unless force is
+    set. An index.json listing every shard in the directory is rewritten
+    at the end. Returns that index.
+    """
+    import json
+    from concurrent.futures import ProcessPoolExecutor
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    jobs = []
+    for year in range(first_year, last_year + 1):
+        for resolution in resolutions:
+            path = shard_path(directory, year, resolution)
+            if not force and path.exists() and f'"version":"{CODE_VERSION}"' in path.read_text(encoding="utf-8")[:64]:
+                continue
+            jobs.append((str(directory), year, resolution))
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            for year, resolution, size in pool.map(_write_shard, jobs):
+                print(f"{shard_path(directory, year, resolution).name}: {size / 1024:.0f} KB")
+    print(f"{len(jobs)} shards written, {(last_year - first_year + 1) * len(resolutions) - len(jobs)} up to date")
+
+    shards: dict = {}
+    for path in sorted(directory.glob("heatmap-*-*.json")):
+        _, year, resolution = path.stem.split("-", 2)
+        shards.setdefault(resolution, []).append(int(year))
+    index = {"version": CODE_VERSION, "years": shards}
+    _write_text(directory / "index.json", json.dumps(index, separators=(",", ":"), sort_keys=True))
+    return index
+
 if __name__ == "__main__":
     import argparse, json
     parser = argparse.ArgumentParser(description="Astrology OS")
-    parser.add_argument("utc_or_year", help="UTC timestamp or year for heatmap")
+    parser.add_argument("utc_or_year", nargs="?", help="UTC timestamp or year for heatmap")
+    parser.add_argument("--resolution", choices=sorted(RESOLUTIONS), nargs="+", default=["day"], help="heatmap slot length")
+    parser.add_argument("--shards", nargs=2, type=int, metavar=("FIRST", "LAST"),
+                        help="write static heatmap shards for years FIRST..LAST instead")
+    parser.add_argument("--out", default=str(SHARD_DIR), help="shard directory")
+    parser.add_argument("--workers", type=int, default=0, help="process pool size (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="rewrite shards that are already up to date")
     args = parser.parse_args()
-    if len(args.utc_or_year) == 4 and args.utc_or_year.isdigit():
-        print(json.dumps(generate_heatmap(int(args.utc_or_year)), indent=2))
+    if args.shards:
+        write_shards(args.shards[0], args.shards[1], args.resolution, Path(args.out), args.workers, args.force)
+    elif args.utc_or_year is None:
+        parser.error("give a UTC timestamp, a year, or --shards FIRST LAST")
+    elif len(args.utc_or_year) == 4 and args.utc_or_year.isdigit():
+        args.resolution = args.resolution[0]
+        print(json.dumps(generate_heatmap(int(args.utc_or_year), args.resolution), indent=2))
     else:
         ts = _dt.datetime.fromisoformat(args.utc_or_year)
         vec = state_vector(ts)
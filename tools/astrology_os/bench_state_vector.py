@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched state_vectors() against the per-body, per-timestamp loop
+
+--startup instead reports, in a fresh interpreter, how long importing
+astrology_os takes and how long the first (cold) and second state_vector()
+calls take, with and without preload().
+"""
+
+import argparse
+import datetime as _dt
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import astrology_os as ao
+
+
+def loop_state_vector(timestamp):
+    # The original path: 2 scalar observe() calls per body per timestamp
+    t_sf = ao._sky()[1].from_datetime(timestamp)
+    return [val for body in ao.PLANETS for val in ao._longitude_and_rate(body, t_sf)]
+
+
+# Run in a fresh interpreter so nothing is loaded yet
+STARTUP_PROBE = """
+import datetime, json, sys, time
+t0 = time.perf_counter()
+import astrology_os
+out = {"import": time.perf_counter() - t0}
+if sys.argv[2] == "preload":
+    out["preload"] = sum(astrology_os.preload().values())
+ts = datetime.datetime.fromisoformat(sys.argv[1])
+for name in ("first call", "second call"):
+    t0 = time.perf_counter()
+    astrology_os.state_vector(ts)
+    out[name] = time.perf_counter() - t0
+print(json.dumps(out))
+"""
+
+
+def startup(timestamp: str) -> None:
+    for mode in ("lazy", "preload"):
+        proc = subprocess.run([sys.executable, "-c", STARTUP_PROBE, timestamp, mode],
+                              capture_output=True, text=True, check=True)
+        timings = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{mode + ':':<9}" + ", ".join(f"{name} {1e3 * secs:.1f} ms" for name, secs in timings.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="state_vector benchmark")
+    parser.add_argument("--start", default="2025-01-01T00:00:00+00:00", help="first UTC timestamp")
+    parser.add_argument("-n", type=int, default=365, help="number of timestamps")
+    parser.add_argument("--step-hours", type=float, default=24.0, help="spacing between timestamps")
+    parser.add_argument("--startup", action="store_true", help="report import and first-call latency instead")
+    args = parser.parse_args()
+    if args.startup:
+        startup(args.start)
+        return
+
+    start = _dt.datetime.fromisoformat(args.start)
+    stamps = [start + _dt.timedelta(hours=args.step_hours * i) for i in range(args.n)]
+
+    t0 = time.perf_counter()
+    looped = np.array([loop_state_vector(ts) for ts in stamps])
+    t_loop = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batched = ao.state_vectors(stamps)
+    t_batch = time.perf_counter() - t0
+
+    lon_diff = np.abs(looped[:, 0::2] - batched[:, 0::2]).max()
+    rate_diff = np.abs(looped[:, 1::2] - batched[:, 1::2]).max()
+    print(f"{args.n} timestamps, shape {batched.shape}")
+    print(f"per-call loop: {t_loop:.3f}s ({1e3 * t_loop / args.n:.2f} ms/timestamp)")
+    print(f"batched:       {t_batch:.3f}s ({1e3 * t_batch / args.n:.3f} ms/timestamp)")
+    print(f"speedup:       {t_loop / t_batch:.1f}x")
+    print(f"max |diff|:    longitude {lon_diff:.3e} rad, rate {rate_diff:.3e} rad/day")
+
+
+if __name__ == "__main__":
+    main()
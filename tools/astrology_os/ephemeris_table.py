@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Precomputed ephemeris table for Astrology OS
+
+An offline build samples the geocentric ecliptic longitude (J2000 ecliptic,
+as state_vector uses) of all 10 bodies on a fixed UTC grid, together with
+its rate, and stores them in a memory-mapped float32 .npy file with a JSON
+header beside it. Longitudes are unwrapped and stored as residuals from a
+per-body linear trend (kept in float64 in the header), so float32 keeps
+~1e-7 rad of precision over centuries.
+
+Lookups use cubic Hermite interpolation between nodes. Its error grows as
+step**4: with the default 0.5-day step it stays below ~1e-6 rad (0.2
+arcsec) for every body, far inside a 30-degree zodiac sector. The build
+measures the actual error against Skyfield at the midpoints of a sample of
+intervals (the worst case for Hermite) and records it as "max_error_rad".
+
+Times are POSIX days: seconds since 1970-01-01 UTC / 86400.
+
+Build (needs Skyfield and the ephemeris file, once):
+  python3 ephemeris_table.py --start 1950 --end 2100 [--step 0.5] [--ephemeris de440.bsp]
+"""
+
+import json
+import math
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+DEFAULT_STEP = 0.5  # days
+# Central-difference half width for node rates, in days
+RATE_DELTA = 1 / 1440
+FORMAT_VERSION = 1
+
+
+def meta_path(path: Path) -> Path:
+    return Path(path).with_suffix(".json")
+
+
+class EphemerisTable:
+    def __init__(self, path: Path):
+        with meta_path(path).open("r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported table format {self.meta.get('format')}")
+        self.bodies: List[str] = self.meta["bodies"]
+        self.start = self.meta["start_day"]
+        self.step = self.meta["step"]
+        self.lon0 = np.array(self.meta["lon0"])
+        self.mean_rate = np.array(self.meta["mean_rate"])
+        # (nodes, bodies, 2): residual longitude, residual rate; paged in on demand
+        self.nodes = np.load(path, mmap_mode="r")
+        self.end = self.start + self.step * (len(self.nodes) - 1)
+
+    def covers(self, days: np.ndarray) -> bool:
+        days = np.asarray(days)
+        return bool(days.size) and days.min() >= self.start and days.max() <= self.end
+
+    def longitudes(self, days: np.ndarray) -> np.ndarray:
+        """(N, bodies) unwrapped longitudes in radians at the given POSIX days."""
+        x = (np.asarray(days, dtype=float) - self.start) / self.step
+        i = np.clip(np.floor(x).astype(np.int64), 0, len(self.nodes) - 2)
+        u = (x - i)[:, None]
+        p0, p1 = self.nodes[i], self.nodes[i + 1]
+        h = self.step
+        # Cubic Hermite basis on [0, 1]
+        h00 = (1 + 2 * u) * (1 - u) ** 2
+        h10 = u * (1 - u) ** 2
+        h01 = u * u * (3 - 2 * u)
+        h11 = u * u * (u - 1)
+        residual = (h00 * p0[:, :, 0] + h10 * h * p0[:, :, 1]
+                    + h01 * p1[:, :, 0] + h11 * h * p1[:, :, 1])
+        return self.lon0 + self.mean_rate * (np.asarray(days, dtype=float)[:, None] - self.start) + residual
+
+
+def _sample(ts, epem, bodies, ids, days: np.ndarray) -> np.ndarray:
+    """(N, bodies) Skyfield longitudes (wrapped, radians) at POSIX days."""
+    t = ts.utc(1970, 1, 1, 0, 0, days * 86400.0)
+    earth = epem["earth"].at(t)
+    return np.stack([earth.observe(epem[ids[b]]).ecliptic_latlon()[1].radians for b in bodies], axis=1)
+
+
+def build(out: Path, start: str, end: str, step: float = DEFAULT_STEP,
+          ephemeris: str = "de440.bsp", batch: int = 20000) -> dict:
+    from skyfield.api import load
+    from astrology_os import EPHEMERIS_IDS, PLANETS
+
+    ts = load.timescale()
+    epem = load(ephemeris)
+    epoch = np.datetime64("1970-01-01", "D")
+    start = float((np.datetime64(start, "D") - epoch).astype(int))
+    end = float((np.datetime64(end, "D") - epoch).astype(int))
+    days = start + np.arange(int(round((end - start) / step)) + 1) * step
+
+    lon = np.empty((len(days), len(PLANETS)))
+    rate = np.empty_like(lon)
+    for lo in range(0, len(days), batch):
+        d = days[lo:lo + batch]
+        lon[lo:lo + batch] = _sample(ts, epem, PLANETS, EPHEMERIS_IDS, d)
+        ahead = _sample(ts, epem, PLANETS, EPHEMERIS_IDS, d + RATE_DELTA)
+        behind = _sample(ts, epem, PLANETS, EPHEMERIS_IDS, d - RATE_DELTA)
+        # Wrap the differences into (-pi, pi] before dividing
+        span = (ahead - behind + math.pi) % (2 * math.pi) - math.pi
+        rate[lo:lo + batch] = span / (2 * RATE_DELTA)
+
+    lon = np.unwrap(lon, axis=0)
+    lon0 = lon[0].copy()
+    mean_rate = (lon[-1] - lon[0]) / (days[-1] - days[0])
+    nodes = np.empty((len(days), len(PLANETS), 2), dtype=np.float32)
+    nodes[:, :, 0] = lon - lon0 - mean_rate * (days - start)[:, None]
+    nodes[:, :, 1] = rate - mean_rate
+
+    meta = {
+        "format": FORMAT_VERSION, "bodies": PLANETS, "ephemeris": ephemeris,
+        "start_day": start, "step": step, "count": len(days),
+        "lon0": lon0.tolist(), "mean_rate": mean_rate.tolist(),
+    }
+    out = Path(out)
+    np.save(out, nodes)
+    with meta_path(out).open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+    # Hermite error peaks mid-interval: check a spread of midpoints against Skyfield
+    table = EphemerisTable(out)
+    probe = days[:-1][np.linspace(0, len(days) - 2, min(len(days) - 1, batch)).astype(np.int64)] + step / 2
+    truth = _sample(ts, epem, PLANETS, EPHEMERIS_IDS, probe)
+    error = np.abs((table.longitudes(probe) - truth + math.pi) % (2 * math.pi) - math.pi)
+    meta["max_error_rad"] = float(error.max())
+    meta["max_error_by_body"] = dict(zip(PLANETS, error.max(axis=0).tolist()))
+    with meta_path(out).open("w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build the Astrology OS ephemeris table")
+    parser.add_argument("--start", default="1950", help="first UTC date covered (YYYY or YYYY-MM-DD)")
+    parser.add_argument("--end", default="2100", help="last UTC date covered (YYYY or YYYY-MM-DD)")
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP, help="node spacing in days")
+    parser.add_argument("--ephemeris", default="de440.bsp", help="Skyfield ephemeris file")
+    parser.add_argument("--out", default=str(Path(__file__).resolve().with_name("ephemeris_table.npy")))
+    args = parser.parse_args()
+    meta = build(Path(args.out), args.start, args.end, args.step, args.ephemeris)
+    size = Path(args.out).stat().st_size
+    print(f"{args.out}: {meta['count']} nodes x {len(meta['bodies'])} bodies, {size / 1e6:.1f} MB")
+    print(f"max interpolation error: {meta['max_error_rad']:.2e} rad")
+    for body, err in meta["max_error_by_body"].items():
+        print(f"  {body:<8} {err:.2e}")
+
+
+if __name__ == "__main__":
+    main()
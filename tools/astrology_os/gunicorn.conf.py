@@ -0,0 +1,46 @@
+"""
+Production serving for the Astrology OS API
+
+  cd tools/astrology_os && pip install -r requirements.txt
+  gunicorn -c gunicorn.conf.py api:app
+
+Flask's development server (python3 api.py) handles one request at a
+time, so a heatmap computation stalls every other client. Here each
+worker process runs its own threads: a long heatmap ties up one thread
+of one process while window scores keep being served elsewhere.
+
+The app and the ephemeris (table and de440.bsp, both memory-mapped) are
+loaded once in the master before the workers fork, so every worker starts
+warm and shares those pages instead of loading its own copy. Heatmaps are
+shared through the on-disk cache (heatmap_cache.py).
+
+Environment:
+  ASTROLOGY_BIND     address to listen on (default 0.0.0.0:5001)
+  ASTROLOGY_WORKERS  worker processes (default: CPU count)
+  ASTROLOGY_THREADS  threads per worker (default 4)
+  ASTROLOGY_TIMEOUT  seconds a request may run before its worker is replaced (default 120)
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("ASTROLOGY_BIND", "0.0.0.0:5001")
+workers = int(os.environ.get("ASTROLOGY_WORKERS", multiprocessing.cpu_count()))
+worker_class = "gthread"
+threads = int(os.environ.get("ASTROLOGY_THREADS", "4"))
+timeout = int(os.environ.get("ASTROLOGY_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Import api (and with it astrology_os) in the master so workers inherit it
+preload_app = True
+chdir = os.path.dirname(os.path.abspath(__file__))
+accesslog = "-"
+
+
+def on_starting(server):
+    # Runs in the master before the app is loaded and the workers fork
+    import sys
+    sys.path.insert(0, chdir)
+    from astrology_os import preload
+    timings = preload()
+    server.log.info("Preloaded ephemeris: " + ", ".join(f"{name} {secs:.2f}s" for name, secs in timings.items()))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Persistent year-heatmap cache for the Astrology OS API
+
+A heatmap for a given (year, resolution) never changes until the code
+does, so each one is computed once and kept as JSON on disk under
+CACHE_DIR/<code version>/<year>-<resolution>.json, where the code version
+is a hash of astrology_os.py. An in-process LRU sits in front of the disk
+(max_entries=0 turns it off, for callers that keep their own in-memory
+copy), and concurrent requests for the same key share one computation
+(single-flight) instead of each running generate_heatmap.
+
+Warm-up, e.g. before starting the API:
+  python3 heatmap_cache.py 2020 2035 --resolution day hour
+"""
+
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Dict, Tuple
+
+from astrology_os import CODE_VERSION, RESOLUTIONS, generate_heatmap
+
+# Heatmap JSON is written through the site's shared atomic writer
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+from atomic_write import write_text  # noqa: E402
+
+CACHE_DIR = Path(os.environ.get("ASTROLOGY_CACHE_DIR", Path(__file__).resolve().parent / ".cache" / "heatmaps"))
+# Entries kept in memory; a 10min year is a few MB of JSON
+LRU_SIZE = int(os.environ.get("ASTROLOGY_HEATMAP_LRU", "16"))
+
+Key = Tuple[int, str]
+
+
+class HeatmapCache:
+    def __init__(self, directory: Path = CACHE_DIR, max_entries: int = LRU_SIZE):
+        self.directory = Path(directory) / CODE_VERSION
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[Key, str]" = OrderedDict()
+        self._inflight: Dict[Key, Future] = {}
+        self._lock = threading.Lock()
+
+    def path(self, key: Key) -> Path:
+        year, resolution = key
+        return self.directory / f"{year}-{resolution}.json"
+
+    def get(self, year: int, resolution: str = "day") -> str:
+        """Heatmap JSON for year/resolution: memory, then disk, then computed once."""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {sorted(RESOLUTIONS)}")
+        key = (year, resolution)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            body = self._load_or_compute(key)
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            # Published before the in-flight entry goes, so no caller misses both
+            # (with no LRU, a late caller reads the file that was just written)
+            if self.max_entries > 0:
+                self._lru[key] = body
+                while len(self._lru) > self.max_entries:
+                    self._lru.popitem(last=False)
+            del self._inflight[key]
+        future.set_result(body)
+        return body
+
+    def _load_or_compute(self, key: Key) -> str:
+        path = self.path(key)
+        if path.exists():
+            return path.read_text(encoding="utf-8")
+        body = json.dumps(generate_heatmap(*key))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_text(path, body)
+        return body
+
+
+def main():
+    import argparse, time
+    parser = argparse.ArgumentParser(description="Precompute Astrology OS heatmaps")
+    parser.add_argument("first_year", type=int)
+    parser.add_argument("last_year", type=int)
+    parser.add_argument("--resolution", nargs="+", choices=sorted(RESOLUTIONS), default=["day"])
+    args = parser.parse_args()
+    cache = HeatmapCache(max_entries=0)
+    for year in range(args.first_year, args.last_year + 1):
+        for resolution in args.resolution:
+            start = time.perf_counter()
+            cached = cache.path((year, resolution)).exists()
+            cache.get(year, resolution)
+            print(f"{year} {resolution}: {'cached' if cached else f'computed in {time.perf_counter() - start:.2f}s'}")
+    print(f"Cache: {cache.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Local load test for the Astrology OS API
+
+Runs concurrent clients against a running server for a fixed time per
+endpoint and reports requests/sec and latency percentiles. Window-score
+requests use random timestamps, so they measure the compute path; heatmap
+requests cycle through a few years, so after the first pass they measure
+the heatmap cache.
+
+  gunicorn -c gunicorn.conf.py api:app      # or: python3 api.py
+  python3 load_test.py [--url http://127.0.0.1:5001] [--concurrency 16] [--duration 10]
+"""
+
+import argparse
+import datetime as _dt
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Callable, List
+
+
+def window_score_path(rng: random.Random) -> str:
+    start = _dt.datetime(2020, 1, 1, tzinfo=_dt.timezone.utc)
+    ts = start + _dt.timedelta(minutes=rng.randrange(10 * 366 * 1440))
+    return "/window_score?timestamp=" + ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def heatmap_path(rng: random.Random) -> str:
+    return f"/heatmap?year={rng.choice((2024, 2025, 2026))}"
+
+
+ENDPOINTS = {"window_score": window_score_path, "heatmap": heatmap_path}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run(url: str, make_path: Callable[[random.Random], str], concurrency: int, duration: float, timeout: float) -> dict:
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(seed: int) -> None:
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url + make_path(rng), timeout=timeout) as response:
+                    response.read()
+                ok = True
+            except (urllib.error.URLError, OSError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)]
+    for t in clients:
+        t.start()
+    for t in clients:
+        t.join()
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies), "errors": errors[0], "rps": len(latencies) / wall,
+        "p50": percentile(latencies, 0.50), "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99), "max": latencies[-1] if latencies else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Astrology OS API load test")
+    parser.add_argument("--url", default="http://127.0.0.1:5001", help="server base URL")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per endpoint")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--endpoint", nargs="+", choices=sorted(ENDPOINTS), default=list(ENDPOINTS))
+    args = parser.parse_args()
+
+    print(f"{args.url}: {args.concurrency} clients, {args.duration:.0f}s per endpoint")
+    print(f"{'endpoint':<14}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for name in args.endpoint:
+        r = run(args.url, ENDPOINTS[name], args.concurrency, args.duration, args.timeout)
+        print(f"{name:<14}{r['requests']:>9}{r['errors']:>8}{r['rps']:>9.1f}"
+              + "".join(f"{1e3 * r[q]:>9.1f}" for q in ("p50", "p95", "p99", "max")))
+
+
+if __name__ == "__main__":
+    main()
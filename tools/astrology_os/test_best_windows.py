@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+best_windows() against a brute-force scan at one-minute steps
+
+The brute force scores every minute of the range and splits it into runs
+of equal score. best_windows() must return the best runs the coarse grid
+can see, with each boundary within a minute of the scan's.
+
+  python3 -m pytest test_best_windows.py
+  ASTROLOGY_EPHEMERIS_TABLE=/path/to/table.npy python3 -m pytest test_best_windows.py
+"""
+
+import datetime as _dt
+
+import numpy as np
+import pytest
+
+import astrology_os
+from astrology_os import RATE_STEP, best_windows, global_costs, posix_days, range_days
+
+COARSE_MINUTES = 60
+ONE_MINUTE = 1 / 1440
+
+# Synthetic sky: every body moves at a constant rate from its own phase
+FAKE_RATES = np.array([0.0172, 0.23, 0.03, 0.02, 0.009, 0.0015, 0.0006, 0.0002, 0.0001, 0.00007])
+FAKE_PHASE = np.arange(10) * 0.7
+
+def fake_state_matrix(days):
+    days = np.asarray(days, dtype=float)
+    out = np.empty((len(days), 20))
+    out[:, 0::2] = (FAKE_PHASE + np.outer(days, FAKE_RATES)) % (2 * np.pi)
+    out[:, 1::2] = FAKE_RATES
+    return out
+
+def parse_label(label):
+    return posix_days([_dt.datetime.fromisoformat(label.replace("Z", "+00:00"))])[0]
+
+def minute_runs(start, end):
+    """(start day, end day, score) of every equal-score run at one-minute steps,
+    and whether a COARSE_MINUTES grid point falls inside it."""
+    days = range_days(start, end, 1)
+    scores = 1 / (1 + global_costs(astrology_os.state_matrix(days)))
+    change = np.flatnonzero(scores[1:] != scores[:-1]) + 1
+    first = np.concatenate([[0], change])
+    last = np.concatenate([change, [len(days)]])
+    end_day = posix_days([end])[0]
+    runs = []
+    for a, b in zip(first, last):
+        on_grid = (-a) % COARSE_MINUTES < b - a
+        runs.append((days[a], days[b] if b < len(days) else end_day, scores[a], on_grid))
+    return runs
+
+def check_against_scan(start, end, n):
+    windows = best_windows(start, end, n=n, coarse_minutes=COARSE_MINUTES, resolution_minutes=1)
+    runs = minute_runs(start, end)
+    visible = [run for run in runs if run[3]]
+    expected = sorted((run[2] for run in visible), reverse=True)[:n]
+    assert [w["score"] for w in windows] == pytest.approx(expected)
+
+    for w in windows:
+        matches = [run for run in visible if run[2] == pytest.approx(w["score"])
+                   and abs(run[0] - parse_label(w["start"])) < ONE_MINUTE + 1e-9
+                   and abs(run[1] - parse_label(w["end"])) < ONE_MINUTE + 1e-9]
+        assert matches, f"no one-minute run matches {w}"
+    return runs
+
+def test_best_windows_synthetic(monkeypatch):
+    monkeypatch.setattr(astrology_os, "state_matrix", fake_state_matrix)
+    start = _dt.datetime(2025, 3, 1, tzinfo=_dt.timezone.utc)
+    runs = check_against_scan(start, start + _dt.timedelta(days=30), n=5)
+    assert len(runs) > 5
+
+def test_best_windows_ephemeris_table():
+    table = astrology_os._table()
+    if table is None:
+        pytest.skip("no ephemeris table (set ASTROLOGY_EPHEMERIS_TABLE)")
+    epoch = _dt.datetime(1970, 1, 1, tzinfo=_dt.timezone.utc)
+    # Stay inside the table, so every evaluation is served from it
+    first = np.ceil(table.start * 24) / 24
+    last = min(first + 2, table.end - RATE_STEP - COARSE_MINUTES / 1440)
+    if last - first < 0.5:
+        pytest.skip("ephemeris table spans less than half a day")
+    start = epoch + _dt.timedelta(days=float(first))
+    end = epoch + _dt.timedelta(days=float(np.floor(last * 24) / 24))
+    check_against_scan(start, end, n=3)
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Threaded tests for HeatmapCache.get with a stubbed generate_heatmap
+
+  python3 -m pytest test_heatmap_cache.py
+"""
+
+import threading
+import time
+
+import pytest
+
+import heatmap_cache
+from heatmap_cache import HeatmapCache
+
+WAITERS = 8
+
+class StubHeatmap:
+    """Counts calls; each call blocks until release() and then returns or raises."""
+
+    def __init__(self, error=None):
+        self.calls = 0
+        self.error = error
+        self.started = threading.Event()
+        self._release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, year, resolution):
+        with self._lock:
+            self.calls += 1
+        self.started.set()
+        assert self._release.wait(10), "never released"
+        if self.error is not None:
+            raise self.error
+        return {"year": year, "resolution": resolution}
+
+    def release(self):
+        self._release.set()
+
+def concurrent_gets(cache, stub, year=2024):
+    """One owner computes while WAITERS more threads ask for the same key; returns (results, errors)."""
+    results, errors = [], []
+    lock = threading.Lock()
+
+    def client():
+        try:
+            body = cache.get(year, "day")
+        except Exception as e:
+            with lock:
+                errors.append(e)
+        else:
+            with lock:
+                results.append(body)
+
+    owner = threading.Thread(target=client)
+    owner.start()
+    assert stub.started.wait(10)
+    waiters = [threading.Thread(target=client) for _ in range(WAITERS)]
+    for t in waiters:
+        t.start()
+    # Let every waiter reach the in-flight future before the owner finishes
+    time.sleep(0.2)
+    stub.release()
+    for t in [owner] + waiters:
+        t.join(10)
+    return results, errors
+
+def test_single_flight(tmp_path, monkeypatch):
+    stub = StubHeatmap()
+    monkeypatch.setattr(heatmap_cache, "generate_heatmap", stub)
+    cache = HeatmapCache(tmp_path)
+    results, errors = concurrent_gets(cache, stub)
+    assert errors == []
+    assert stub.calls == 1
+    assert len(results) == WAITERS + 1 and len(set(results)) == 1
+    assert cache.path((2024, "day")).read_text(encoding="utf-8") == results[0]
+    assert cache._inflight == {}
+
+def test_waiters_get_owner_exception(tmp_path, monkeypatch):
+    error = RuntimeError("ephemeris unavailable")
+    stub = StubHeatmap(error)
+    monkeypatch.setattr(heatmap_cache, "generate_heatmap", stub)
+    cache = HeatmapCache(tmp_path)
+    results, errors = concurrent_gets(cache, stub)
+    assert results == []
+    assert stub.calls == 1
+    assert len(errors) == WAITERS + 1 and all(e is error for e in errors)
+    # The failed computation is not left in flight or cached: the next get retries
+    assert cache._inflight == {}
+    assert not cache.path((2024, "day")).exists()
+    stub.error = None
+    assert cache.get(2024, "day") == '{"year": 2024, "resolution": "day"}'
+    assert stub.calls == 2
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    stub = StubHeatmap()
+    stub.release()
+    monkeypatch.setattr(heatmap_cache, "generate_heatmap", stub)
+    cache = HeatmapCache(tmp_path, max_entries=2)
+    for year in (2023, 2024, 2025):
+        cache.get(year, "day")
+    assert list(cache._lru) == [(2024, "day"), (2025, "day")]
+    # A hit moves the key to the end, so the next insert evicts the other one
+    cache.get(2024, "day")
+    cache.get(2026, "day")
+    assert list(cache._lru) == [(2024, "day"), (2026, "day")]
+    # Evicted entries come back from disk, not from a new computation
+    assert cache.get(2023, "day") == '{"year": 2023, "resolution": "day"}'
+    assert stub.calls == 4
+    assert list(cache._lru) == [(2026, "day"), (2023, "day")]
+
+def test_no_lru(tmp_path, monkeypatch):
+    stub = StubHeatmap()
+    stub.release()
+    monkeypatch.setattr(heatmap_cache, "generate_heatmap", stub)
+    cache = HeatmapCache(tmp_path, max_entries=0)
+    assert cache.get(2024, "day") == cache.get(2024, "day")
+    assert stub.calls == 1
+    assert len(cache._lru) == 0
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))